@@ -0,0 +1,195 @@
+"""Planification adaptative des rafraîchissements, actif par actif
+
+Le balayage complet (tous les wallets candidats) garde sa période fixe. En
+plus, chaque actif reçoit son propre intervalle de rafraîchissement « chaud »
+(positions de ses wallets du top uniquement + prix mark), calculé à partir de :
+
+    volatilité   variation du long_ratio, du notionnel et du prix mark entre
+                 deux observations, ramenée à la minute et lissée (EWMA)
+    demande      requêtes des clients sur l'actif, une par client et par
+                 fenêtre (DEMAND_WINDOW), avec décroissance exponentielle
+                 (demi-vie DEMAND_HALF_LIFE)
+
+    chaleur     = volatilité + demand_weight × log(1 + demande)
+    intervalle  = max_interval / (1 + gain × chaleur), borné à [min, max]
+
+Un actif dont l'intervalle atteint max_interval est froid : le balayage
+complet suffit et il ne coûte aucune requête en plus. Le coût total (poids
+de l'API par minute, balayage compris, voir governor.py) est ensuite ramené
+sous `budget` en allongeant proportionnellement les intervalles chauds.
+"""
+import math
+import threading
+import time
+
+DEMAND_HALF_LIFE = 120  # s
+DEMAND_WINDOW = 60  # s : un même client compte au plus une fois par actif et par fenêtre
+
+# Variations considérées comme « notables » (valent 1 point de volatilité)
+LONG_RATIO_STEP = 5.0   # points de long_ratio
+NOTIONAL_STEP = 0.10    # 10 % du notionnel total
+PRICE_STEP = 0.01       # 1 % du prix mark
+
+class AssetSchedule:
+    """État de planification d'un actif"""
+
+    __slots__ = ('asset', 'interval', 'next_due', 'last_refresh', 'volatility',
+                 'demand', 'demand_at', 'cost', 'observed')
+
+    def __init__(self, asset, interval, now):
+        self.asset = asset
+        self.interval = interval
+        self.next_due = now + interval
+        self.last_refresh = None
+        self.volatility = 0.0
+        self.demand = 0.0
+        self.demand_at = now
+        self.cost = 1  # poids amont d'un rafraîchissement chaud (wallets du top + prix)
+        self.observed = None  # (instant, long_ratio, notionnel, prix)
+
+    def decayed_demand(self, now):
+        return self.demand * 0.5 ** ((now - self.demand_at) / DEMAND_HALF_LIFE)
+
+class AdaptiveScheduler:
+    """Calcule quels actifs rafraîchir et quand, sous un budget de requêtes"""
+
+    def __init__(self, assets, min_interval, max_interval, budget, sweep_cost,
+                 gain=1.0, demand_weight=1.0, smoothing=0.3, clock=time.monotonic):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget = budget  # poids amont par minute, balayage compris
+        self.sweep_cost = sweep_cost  # poids d'un balayage complet
+        self.gain = gain
+        self.demand_weight = demand_weight
+        self.smoothing = smoothing
+        self.clock = clock
+        now = clock()
+        self._assets = {asset: AssetSchedule(asset, max_interval, now) for asset in assets}
+        self._hits = {}  # (client, actif) -> instant de la dernière demande comptée
+        self._lock = threading.Lock()
+
+    def record_hit(self, asset, weight=1.0, client=None):
+        """Une requête client sur l'actif (ignorée s'il n'est pas suivi)
+
+        Avec `client`, les requêtes répétées du même client dans la fenêtre
+        DEMAND_WINDOW ne comptent qu'une fois. Renvoie True si la requête a
+        été comptée.
+        """
+        with self._lock:
+            state = self._assets.get(asset)
+            if state is None:
+                return False
+            now = self.clock()
+            if client is not None:
+                key = (client, asset)
+                if now - self._hits.get(key, -math.inf) < DEMAND_WINDOW:
+                    return False
+                if len(self._hits) >= 10000:
+                    self._hits = {k: at for k, at in self._hits.items() if now - at < DEMAND_WINDOW}
+                self._hits[key] = now
+            state.demand = state.decayed_demand(now) + weight
+            state.demand_at = now
+            self._plan(now)
+            return True
+
+    def observe(self, asset, data, cost):
+        """Intègre un rafraîchissement de l'actif (balayage ou chaud)
+
+        `data` : dict de l'actif (long_ratio, totaux, mark_price) ;
+        `cost` : poids amont d'un rafraîchissement chaud de l'actif.
+        """
+        with self._lock:
+            state = self._assets.get(asset)
+            if state is None:
+                return
+            now = self.clock()
+            notional = data['total_long_size'] + data['total_short_size']
+            price = data.get('mark_price') or 0.0
+            if state.observed is not None:
+                then, long_ratio, old_notional, old_price = state.observed
+                change = abs(data['long_ratio'] - long_ratio) / LONG_RATIO_STEP
+                if old_notional:
+                    change += abs(notional - old_notional) / old_notional / NOTIONAL_STEP
+                if old_price:
+                    change += abs(price - old_price) / old_price / PRICE_STEP
+                # Variation par minute : deux observations rapprochées ne comptent pas double
+                rate = change / max((now - then) / 60, 1 / 60)
+                state.volatility += self.smoothing * (rate - state.volatility)
+            state.observed = (now, data['long_ratio'], notional, price)
+            state.cost = cost
+            state.last_refresh = now
+            self._plan(now)
+            state.next_due = now + state.interval
+
+    def due(self):
+        """Actifs chauds dont le rafraîchissement est dû, les plus chauds d'abord"""
+        with self._lock:
+            now = self.clock()
+            ready = [state for state in self._assets.values()
+                     if state.interval < self.max_interval and state.next_due <= now]
+            ready.sort(key=lambda state: state.interval)
+            for state in ready:
+                # Réservé : pas de second déclenchement avant la fin de celui-ci
+                state.next_due = now + state.interval
+            return [state.asset for state in ready]
+
+    def next_due_in(self):
+        """Secondes avant le prochain rafraîchissement chaud (None si tout est froid)"""
+        with self._lock:
+            now = self.clock()
+            pending = [state.next_due - now for state in self._assets.values()
+                       if state.interval < self.max_interval]
+            return max(0.0, min(pending)) if pending else None
+
+    def _heat(self, state, now):
+        return state.volatility + self.demand_weight * math.log1p(state.decayed_demand(now))
+
+    def _plan(self, now):
+        """Recalcule les intervalles puis les ramène sous le budget"""
+        for state in self._assets.values():
+            target = self.max_interval / (1 + self.gain * self._heat(state, now))
+            interval = min(self.max_interval, max(self.min_interval, target))
+            if interval < state.interval:
+                # Un actif qui se réchauffe est avancé tout de suite
+                state.next_due = min(state.next_due, (state.last_refresh or now) + interval)
+            state.interval = interval
+
+        available = self.budget - self.sweep_cost * 60 / self.max_interval
+        planned = self._planned_rate()
+        if planned > max(available, 0):
+            scale = planned / available if available > 0 else math.inf
+            for state in self._assets.values():
+                if state.interval < self.max_interval:
+                    state.interval = min(self.max_interval, state.interval * scale)
+
+    def _planned_rate(self):
+        """Poids par minute des rafraîchissements chauds planifiés"""
+        return sum(state.cost * 60 / state.interval for state in self._assets.values()
+                   if state.interval < self.max_interval)
+
+    def state(self):
+        """Vue sérialisable pour /api/schedule"""
+        with self._lock:
+            now = self.clock()
+            return {
+                'budget_per_min': self.budget,
+                'sweep_per_min': round(self.sweep_cost * 60 / self.max_interval, 1),
+                'hot_per_min': round(self._planned_rate(), 1),
+                'min_interval': self.min_interval,
+                'max_interval': self.max_interval,
+                'assets': {
+                    state.asset: {
+                        'interval': round(state.interval, 1),
+                        'hot': state.interval < self.max_interval,
+                        'next_in': round(max(0.0, state.next_due - now), 1)
+                        if state.interval < self.max_interval else None,
+                        'heat': round(self._heat(state, now), 3),
+                        'volatility': round(state.volatility, 3),
+                        'demand': round(state.decayed_demand(now), 2),
+                        'cost': state.cost,
+                        'last_refresh_ago': round(now - state.last_refresh, 1)
+                        if state.last_refresh is not None else None,
+                    }
+                    for state in self._assets.values()
+                },
+            }
@@ -0,0 +1,100 @@
+"""Agrégation en flux des positions : top-K par actif sans tout matérialiser
+
+Les positions arrivent une à une depuis l'ingestion. Chaque actif garde :
+
+    un tas min borné à K entrées   les K plus gros notionnels vus jusqu'ici ;
+                                   la racine est le plus petit, comparé à
+                                   chaque nouvelle position en O(1)
+    des compteurs courants         nombre et notionnel long/short de toutes
+                                   les positions vues, pas seulement du top K
+
+La mémoire reste en O(actifs × K) quel que soit le nombre de wallets
+parcourus, et l'état peut être lu à tout moment pendant le balayage.
+"""
+import heapq
+import itertools
+
+class TopK:
+    """Les K plus gros enregistrements d'un flux, selon `record[2]` (notionnel)"""
+
+    __slots__ = ('k', '_heap', '_order')
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []  # (notionnel, ordre d'arrivée, enregistrement)
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, record):
+        """Garde l'enregistrement s'il fait partie des K plus gros ; O(log K)"""
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (record[2], next(self._order), record))
+        elif record[2] > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (record[2], next(self._order), record))
+
+    def sorted(self):
+        """Enregistrements triés par notionnel décroissant (le tas est conservé)"""
+        return [record for _, _, record in sorted(self._heap, key=lambda item: (-item[0], item[1]))]
+
+class AssetAggregate:
+    """Top K et compteurs courants d'un actif"""
+
+    __slots__ = ('top', 'long_count', 'short_count', 'long_size', 'short_size')
+
+    def __init__(self, k):
+        self.top = TopK(k)
+        self.long_count = 0
+        self.short_count = 0
+        self.long_size = 0.0
+        self.short_size = 0.0
+
+    def add(self, record):
+        if record[1]:
+            self.long_count += 1
+            self.long_size += record[2]
+        else:
+            self.short_count += 1
+            self.short_size += record[2]
+        self.top.push(record)
+
+    def scanned(self):
+        """Compteurs sur toutes les positions vues"""
+        return {
+            'long_count': self.long_count,
+            'short_count': self.short_count,
+            'long_size': self.long_size,
+            'short_size': self.short_size,
+        }
+
+class StreamAggregator:
+    """Consomme un flux (actif, enregistrement) pour un ensemble d'actifs
+
+    Les actifs hors de l'ensemble sont ignorés. `results()` peut être appelé
+    pendant le balayage pour obtenir l'état partiel.
+    """
+
+    def __init__(self, assets, k):
+        self.assets = {asset: AssetAggregate(k) for asset in assets}
+        self.positions = 0
+
+    def add(self, asset, record):
+        aggregate = self.assets.get(asset)
+        if aggregate is None:
+            return False
+        aggregate.add(record)
+        self.positions += 1
+        return True
+
+    def consume(self, stream, on_progress=None, every=500):
+        """Vide le flux ; `on_progress(self)` toutes les `every` positions"""
+        for asset, record in stream:
+            if self.add(asset, record) and on_progress is not None and self.positions % every == 0:
+                on_progress(self)
+        return self
+
+    def results(self):
+        """{actif: (top K trié, compteurs)} dans l'ordre des actifs"""
+        return {asset: (aggregate.top.sorted(), aggregate.scanned())
+                for asset, aggregate in self.assets.items()}
@@ -1,758 +1,1258 @@
-from flask import Flask, render_template_string, jsonify
-from apscheduler.schedulers.background import BackgroundScheduler
-import requests
-import time
-from datetime import datetime
-
-app = Flask(__name__)
-
-# Configuration des actifs à suivre
-ASSETS = ['BTC', 'ETH', 'BNB', 'TAO', 'HYPE']
-TOP_WHALES = 30
-
-# Cache global
-whale_data = {}
-last_update = None
-
-def get_whale_positions(asset):
-    """Récupère les 30 plus grosses positions sur Hyperliquid"""
-    try:
-        url = "https://api.hyperliquid.xyz/info"
-        
-        # Récupérer le carnet d'ordres pour identifier les gros traders
-        payload = {
-            "type": "clearinghouseState",
-            "user": "0x0000000000000000000000000000000000000000"
-        }
-        
-        # Utiliser l'endpoint des positions ouvertes
-        payload_positions = {
-            "type": "metaAndAssetCtxs"
-        }
-        
-        response = requests.post(url, json=payload_positions, timeout=10)
-        meta_data = response.json()
-        
-        # Récupérer les plus gros holders via l'API
-        payload_leaderboard = {
-            "type": "leaderboard",
-            "window": "day"
-        }
-        
-        try:
-            response = requests.post(url, json=payload_leaderboard, timeout=10)
-            leaderboard = response.json()
-        except:
-            leaderboard = []
-        
-        whales = []
-        long_count = 0
-        short_count = 0
-        total_long_size = 0
-        total_short_size = 0
-        
-        # Simuler des données réalistes basées sur les patterns du marché
-        # En production, il faudrait accéder aux vraies positions
-        import random
-        random.seed(hash(asset + str(datetime.now().hour)))
-        
-        for i in range(TOP_WHALES):
-            is_long = random.random() > 0.5
-            size = random.uniform(100000, 5000000)
-            leverage = random.choice([2, 3, 5, 10, 20, 25])
-            pnl = random.uniform(-50000, 150000)
-            entry_price = get_simulated_entry(asset)
-            
-            whale = {
-                'rank': i + 1,
-                'address': f"0x{random.getrandbits(64):016x}...{random.getrandbits(16):04x}",
-                'side': 'LONG' if is_long else 'SHORT',
-                'size': size,
-                'leverage': leverage,
-                'pnl': pnl,
-                'entry_price': entry_price
-            }
-            whales.append(whale)
-            
-            if is_long:
-                long_count += 1
-                total_long_size += size
-            else:
-                short_count += 1
-                total_short_size += size
-        
-        total = long_count + short_count
-        long_ratio = (long_count / total * 100) if total > 0 else 50
-        short_ratio = (short_count / total * 100) if total > 0 else 50
-        
-        # Calculer le sentiment
-        if long_ratio >= 75:
-            sentiment = "TRÈS BULLISH"
-            sentiment_class = "very-bullish"
-            emoji = "🚀"
-        elif long_ratio >= 60:
-            sentiment = "BULLISH"
-            sentiment_class = "bullish"
-            emoji = "📈"
-        elif long_ratio >= 45:
-            sentiment = "NEUTRE"
-            sentiment_class = "neutral"
-            emoji = "➖"
-        elif long_ratio >= 30:
-            sentiment = "BEARISH"
-            sentiment_class = "bearish"
-            emoji = "📉"
-        else:
-            sentiment = "TRÈS BEARISH"
-            sentiment_class = "very-bearish"
-            emoji = "💀"
-        
-        return {
-            'asset': asset,
-            'whales': whales,
-            'long_count': long_count,
-            'short_count': short_count,
-            'long_ratio': round(long_ratio, 1),
-            'short_ratio': round(short_ratio, 1),
-            'total_long_size': total_long_size,
-            'total_short_size': total_short_size,
-            'sentiment': sentiment,
-            'sentiment_class': sentiment_class,
-            'emoji': emoji
-        }
-        
-    except Exception as e:
-        print(f"Erreur pour {asset}: {e}")
-        return None
-
-def get_simulated_entry(asset):
-    prices = {
-        'BTC': 104500,
-        'ETH': 3850,
-        'BNB': 720,
-        'TAO': 580,
-        'HYPE': 35
-    }
-    import random
-    base = prices.get(asset, 100)
-    return base * random.uniform(0.95, 1.05)
-
-def update_all_data():
-    """Met à jour les données pour tous les actifs"""
-    global whale_data, last_update
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Mise à jour des données...")
-    
-    for asset in ASSETS:
-        data = get_whale_positions(asset)
-        if data:
-            whale_data[asset] = data
-        time.sleep(0.3)
-    
-    last_update = datetime.now()
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Mise à jour terminée!")
-
-# Template HTML moderne et compact
-HTML_TEMPLATE = '''
-<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>🐋 Whale Tracker Pro</title>
-    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap" rel="stylesheet">
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Inter', sans-serif;
-            background: #0a0a0f;
-            color: #e2e8f0;
-            min-height: 100vh;
-        }
-        
-        /* Header compact */
-        .header {
-            background: linear-gradient(135deg, #12121a 0%, #1a1a2e 100%);
-            border-bottom: 1px solid rgba(255,255,255,0.05);
-            padding: 12px 24px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            position: sticky;
-            top: 0;
-            z-index: 100;
-            backdrop-filter: blur(10px);
-        }
-        
-        .logo {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            font-size: 18px;
-            font-weight: 700;
-        }
-        
-        .logo-icon {
-            font-size: 24px;
-        }
-        
-        .status-bar {
-            display: flex;
-            align-items: center;
-            gap: 16px;
-            font-size: 12px;
-        }
-        
-        .status-dot {
-            width: 8px;
-            height: 8px;
-            background: #10b981;
-            border-radius: 50%;
-            animation: pulse 2s infinite;
-        }
-        
-        @keyframes pulse {
-            0%, 100% { opacity: 1; }
-            50% { opacity: 0.5; }
-        }
-        
-        .timer {
-            background: rgba(255,255,255,0.05);
-            padding: 6px 12px;
-            border-radius: 6px;
-            font-family: monospace;
-            color: #94a3b8;
-        }
-        
-        /* Container principal */
-        .main {
-            padding: 20px;
-            max-width: 1600px;
-            margin: 0 auto;
-        }
-        
-        /* Grille des indicateurs */
-        .indicators-grid {
-            display: grid;
-            grid-template-columns: repeat(5, 1fr);
-            gap: 12px;
-            margin-bottom: 20px;
-        }
-        
-        .indicator-card {
-            background: linear-gradient(145deg, #14141f 0%, #1a1a28 100%);
-            border-radius: 12px;
-            padding: 16px;
-            border: 1px solid rgba(255,255,255,0.05);
-            transition: all 0.3s ease;
-            cursor: pointer;
-        }
-        
-        .indicator-card:hover {
-            transform: translateY(-2px);
-            border-color: rgba(255,255,255,0.1);
-        }
-        
-        .indicator-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 12px;
-        }
-        
-        .asset-name {
-            font-size: 16px;
-            font-weight: 700;
-            display: flex;
-            align-items: center;
-            gap: 6px;
-        }
-        
-        .asset-icon {
-            width: 24px;
-            height: 24px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 12px;
-            font-weight: 700;
-        }
-        
-        .asset-icon.btc { background: linear-gradient(135deg, #f7931a, #ffab00); }
-        .asset-icon.eth { background: linear-gradient(135deg, #627eea, #8c9eff); }
-        .asset-icon.bnb { background: linear-gradient(135deg, #f3ba2f, #ffd54f); }
-        .asset-icon.tao { background: linear-gradient(135deg, #000, #333); color: #fff; }
-        .asset-icon.hype { background: linear-gradient(135deg, #00ff88, #00cc6a); }
-        
-        .sentiment-badge {
-            font-size: 10px;
-            font-weight: 600;
-            padding: 4px 8px;
-            border-radius: 4px;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }
-        
-        .sentiment-badge.very-bullish { background: rgba(16, 185, 129, 0.2); color: #10b981; }
-        .sentiment-badge.bullish { background: rgba(34, 197, 94, 0.2); color: #22c55e; }
-        .sentiment-badge.neutral { background: rgba(148, 163, 184, 0.2); color: #94a3b8; }
-        .sentiment-badge.bearish { background: rgba(249, 115, 22, 0.2); color: #f97316; }
-        .sentiment-badge.very-bearish { background: rgba(239, 68, 68, 0.2); color: #ef4444; }
-        
-        /* Barre de ratio */
-        .ratio-bar-container {
-            margin: 12px 0;
-        }
-        
-        .ratio-labels {
-            display: flex;
-            justify-content: space-between;
-            font-size: 11px;
-            margin-bottom: 4px;
-        }
-        
-        .long-label { color: #10b981; }
-        .short-label { color: #ef4444; }
-        
-        .ratio-bar {
-            height: 6px;
-            background: #ef4444;
-            border-radius: 3px;
-            overflow: hidden;
-        }
-        
-        .ratio-fill {
-            height: 100%;
-            background: linear-gradient(90deg, #10b981, #22c55e);
-            border-radius: 3px;
-            transition: width 0.5s ease;
-        }
-        
-        /* Stats compactes */
-        .stats-row {
-            display: flex;
-            justify-content: space-between;
-            font-size: 11px;
-            color: #64748b;
-        }
-        
-        .stat-value {
-            font-weight: 600;
-            color: #e2e8f0;
-        }
-        
-        /* Section détaillée */
-        .details-section {
-            background: linear-gradient(145deg, #14141f 0%, #1a1a28 100%);
-            border-radius: 16px;
-            border: 1px solid rgba(255,255,255,0.05);
-            overflow: hidden;
-        }
-        
-        .details-header {
-            padding: 16px 20px;
-            border-bottom: 1px solid rgba(255,255,255,0.05);
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        
-        .details-title {
-            font-size: 14px;
-            font-weight: 600;
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
-        
-        .tabs {
-            display: flex;
-            gap: 4px;
-        }
-        
-        .tab {
-            padding: 6px 12px;
-            font-size: 12px;
-            font-weight: 500;
-            border-radius: 6px;
-            cursor: pointer;
-            transition: all 0.2s;
-            background: transparent;
-            border: none;
-            color: #64748b;
-        }
-        
-        .tab:hover { color: #e2e8f0; }
-        .tab.active { background: rgba(99, 102, 241, 0.2); color: #818cf8; }
-        
-        /* Table compacte */
-        .whale-table {
-            width: 100%;
-            font-size: 12px;
-        }
-        
-        .whale-table th {
-            text-align: left;
-            padding: 10px 16px;
-            font-weight: 500;
-            color: #64748b;
-            background: rgba(0,0,0,0.2);
-            font-size: 10px;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }
-        
-        .whale-table td {
-            padding: 10px 16px;
-            border-bottom: 1px solid rgba(255,255,255,0.03);
-        }
-        
-        .whale-table tr:hover {
-            background: rgba(255,255,255,0.02);
-        }
-        
-        .rank {
-            width: 24px;
-            height: 24px;
-            border-radius: 6px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-weight: 700;
-            font-size: 10px;
-            background: rgba(255,255,255,0.05);
-        }
-        
-        .rank.top3 { background: linear-gradient(135deg, #fbbf24, #f59e0b); color: #000; }
-        
-        .address {
-            font-family: monospace;
-            color: #94a3b8;
-        }
-        
-        .side-badge {
-            padding: 3px 8px;
-            border-radius: 4px;
-            font-weight: 600;
-            font-size: 10px;
-        }
-        
-        .side-badge.long { background: rgba(16, 185, 129, 0.15); color: #10b981; }
-        .side-badge.short { background: rgba(239, 68, 68, 0.15); color: #ef4444; }
-        
-        .pnl.positive { color: #10b981; }
-        .pnl.negative { color: #ef4444; }
-        
-        .leverage {
-            background: rgba(99, 102, 241, 0.15);
-            color: #818cf8;
-            padding: 2px 6px;
-            border-radius: 4px;
-            font-size: 10px;
-            font-weight: 600;
-        }
-        
-        /* Summary bar */
-        .summary-bar {
-            display: grid;
-            grid-template-columns: repeat(4, 1fr);
-            gap: 12px;
-            margin-bottom: 20px;
-        }
-        
-        .summary-card {
-            background: linear-gradient(145deg, #14141f 0%, #1a1a28 100%);
-            border-radius: 10px;
-            padding: 14px 16px;
-            border: 1px solid rgba(255,255,255,0.05);
-        }
-        
-        .summary-label {
-            font-size: 10px;
-            color: #64748b;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-            margin-bottom: 4px;
-        }
-        
-        .summary-value {
-            font-size: 20px;
-            font-weight: 700;
-        }
-        
-        .summary-value.bullish { color: #10b981; }
-        .summary-value.bearish { color: #ef4444; }
-        .summary-value.neutral { color: #94a3b8; }
-        
-        /* Responsive */
-        @media (max-width: 1200px) {
-            .indicators-grid { grid-template-columns: repeat(3, 1fr); }
-        }
-        
-        @media (max-width: 768px) {
-            .indicators-grid { grid-template-columns: repeat(2, 1fr); }
-            .summary-bar { grid-template-columns: repeat(2, 1fr); }
-        }
-        
-        /* Scrollbar */
-        ::-webkit-scrollbar { width: 6px; }
-        ::-webkit-scrollbar-track { background: #0a0a0f; }
-        ::-webkit-scrollbar-thumb { background: #2d2d3d; border-radius: 3px; }
-        
-        .table-container {
-            max-height: 400px;
-            overflow-y: auto;
-        }
-    </style>
-</head>
-<body>
-    <header class="header">
-        <div class="logo">
-            <span class="logo-icon">🐋</span>
-            <span>Whale Tracker</span>
-            <span style="font-size: 10px; color: #64748b; font-weight: 400;">PRO</span>
-        </div>
-        <div class="status-bar">
-            <div class="status-dot"></div>
-            <span style="color: #10b981;">Live</span>
-            <span style="color: #64748b;">•</span>
-            <span style="color: #64748b;">Top 30 Whales</span>
-            <div class="timer" id="timer">05:00</div>
-        </div>
-    </header>
-    
-    <main class="main">
-        <!-- Summary global -->
-        <div class="summary-bar">
-            <div class="summary-card">
-                <div class="summary-label">🎯 Sentiment Global</div>
-                <div class="summary-value" id="global-sentiment">-</div>
-            </div>
-            <div class="summary-card">
-                <div class="summary-label">📊 Ratio Long Global</div>
-                <div class="summary-value bullish" id="global-long">-</div>
-            </div>
-            <div class="summary-card">
-                <div class="summary-label">🐋 Whales Analysées</div>
-                <div class="summary-value neutral">{{ whale_count }}</div>
-            </div>
-            <div class="summary-card">
-                <div class="summary-label">🕐 Dernière MAJ</div>
-                <div class="summary-value neutral" style="font-size: 14px;">{{ last_update }}</div>
-            </div>
-        </div>
-        
-        <!-- Indicateurs par actif -->
-        <div class="indicators-grid">
-            {% for asset, data in whale_data.items() %}
-            <div class="indicator-card" onclick="showDetails('{{ asset }}')">
-                <div class="indicator-header">
-                    <div class="asset-name">
-                        <div class="asset-icon {{ asset.lower() }}">{{ asset[0] }}</div>
-                        {{ asset }}
-                    </div>
-                    <span class="sentiment-badge {{ data.sentiment_class }}">
-                        {{ data.emoji }} {{ data.sentiment }}
-                    </span>
-                </div>
-                
-                <div class="ratio-bar-container">
-                    <div class="ratio-labels">
-                        <span class="long-label">Long {{ data.long_ratio }}%</span>
-                        <span class="short-label">Short {{ data.short_ratio }}%</span>
-                    </div>
-                    <div class="ratio-bar">
-                        <div class="ratio-fill" style="width: {{ data.long_ratio }}%"></div>
-                    </div>
-                </div>
-                
-                <div class="stats-row">
-                    <span>🟢 {{ data.long_count }}</span>
-                    <span>🔴 {{ data.short_count }}</span>
-                    <span class="stat-value">${{ "%.1f"|format(data.total_long_size / 1000000) }}M</span>
-                </div>
-            </div>
-            {% endfor %}
-        </div>
-        
-        <!-- Section détaillée -->
-        <div class="details-section">
-            <div class="details-header">
-                <div class="details-title">
-                    <span>📋</span>
-                    Positions des Whales
-                </div>
-                <div class="tabs">
-                    {% for asset in whale_data.keys() %}
-                    <button class="tab {% if loop.first %}active{% endif %}" onclick="showDetails('{{ asset }}')">
-                        {{ asset }}
-                    </button>
-                    {% endfor %}
-                </div>
-            </div>
-            
-            <div class="table-container">
-                <table class="whale-table">
-                    <thead>
-                        <tr>
-                            <th>#</th>
-                            <th>Adresse</th>
-                            <th>Position</th>
-                            <th>Taille</th>
-                            <th>Levier</th>
-                            <th>PnL</th>
-                            <th>Entrée</th>
-                        </tr>
-                    </thead>
-                    <tbody id="whale-tbody">
-                        {% for asset, data in whale_data.items() %}
-                            {% if loop.first %}
-                                {% for whale in data.whales %}
-                                <tr>
-                                    <td><span class="rank {% if whale.rank <= 3 %}top3{% endif %}">{{ whale.rank }}</span></td>
-                                    <td class="address">{{ whale.address }}</td>
-                                    <td><span class="side-badge {{ whale.side.lower() }}">{{ whale.side }}</span></td>
-                                    <td>${{ "{:,.0f}".format(whale.size) }}</td>
-                                    <td><span class="leverage">{{ whale.leverage }}x</span></td>
-                                    <td class="pnl {% if whale.pnl >= 0 %}positive{% else %}negative{% endif %}">
-                                        {% if whale.pnl >= 0 %}+{% endif %}${{ "{:,.0f}".format(whale.pnl) }}
-                                    </td>
-                                    <td>${{ "{:,.2f}".format(whale.entry_price) }}</td>
-                                </tr>
-                                {% endfor %}
-                            {% endif %}
-                        {% endfor %}
-                    </tbody>
-                </table>
-            </div>
-        </div>
-    </main>
-    
-    <script>
-        // Données des whales
-        const whaleData = {{ whale_data_json | safe }};
-        
-        // Timer
-        let seconds = 300;
-        function updateTimer() {
-            const mins = Math.floor(seconds / 60);
-            const secs = seconds % 60;
-            document.getElementById('timer').textContent = 
-                `${mins.toString().padStart(2, '0')}:${secs.toString().padStart(2, '0')}`;
-            
-            if (seconds <= 0) {
-                location.reload();
-            }
-            seconds--;
-        }
-        setInterval(updateTimer, 1000);
-        
-        // Calcul sentiment global
-        function calculateGlobalSentiment() {
-            let totalLong = 0;
-            let total = 0;
-            
-            Object.values(whaleData).forEach(data => {
-                totalLong += data.long_count;
-                total += data.long_count + data.short_count;
-            });
-            
-            const ratio = (totalLong / total * 100).toFixed(1);
-            document.getElementById('global-long').textContent = ratio + '%';
-            
-            let sentiment = 'NEUTRE';
-            if (ratio >= 65) sentiment = '🚀 BULLISH';
-            else if (ratio >= 55) sentiment = '📈 HAUSSIER';
-            else if (ratio <= 35) sentiment = '💀 BEARISH';
-            else if (ratio <= 45) sentiment = '📉 BAISSIER';
-            else sentiment = '➖ NEUTRE';
-            
-            document.getElementById('global-sentiment').textContent = sentiment;
-        }
-        calculateGlobalSentiment();
-        
-        // Afficher les détails
-        function showDetails(asset) {
-            // Mettre à jour les tabs
-            document.querySelectorAll('.tab').forEach(tab => {
-                tab.classList.remove('active');
-                if (tab.textContent.trim() === asset) {
-                    tab.classList.add('active');
-                }
-            });
-            
-            // Mettre à jour la table
-            const data = whaleData[asset];
-            if (!data) return;
-            
-            const tbody = document.getElementById('whale-tbody');
-            tbody.innerHTML = data.whales.map(whale => `
-                <tr>
-                    <td><span class="rank ${whale.rank <= 3 ? 'top3' : ''}">${whale.rank}</span></td>
-                    <td class="address">${whale.address}</td>
-                    <td><span class="side-badge ${whale.side.toLowerCase()}">${whale.side}</span></td>
-                    <td>$${whale.size.toLocaleString('en-US', {maximumFractionDigits: 0})}</td>
-                    <td><span class="leverage">${whale.leverage}x</span></td>
-                    <td class="pnl ${whale.pnl >= 0 ? 'positive' : 'negative'}">
-                        ${whale.pnl >= 0 ? '+' : ''}$${whale.pnl.toLocaleString('en-US', {maximumFractionDigits: 0})}
-                    </td>
-                    <td>$${whale.entry_price.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2})}</td>
-                </tr>
-            `).join('');
-        }
-        
-        // Auto-refresh
-        setTimeout(() => location.reload(), 300000);
-    </script>
-</body>
-</html>
-'''
-
-@app.route('/')
-def index():
-    import json
-    return render_template_string(
-        HTML_TEMPLATE,
-        whale_data=whale_data,
-        whale_data_json=json.dumps(whale_data),
-        last_update=last_update.strftime('%H:%M:%S') if last_update else 'N/A',
-        whale_count=TOP_WHALES * len(ASSETS)
-    )
-
-@app.route('/api/data')
-def api_data():
-    return jsonify({
-        'data': whale_data,
-        'last_update': last_update.strftime('%H:%M:%S') if last_update else None
-    })
-
-@app.route('/api/refresh')
-def api_refresh():
-    update_all_data()
-    return jsonify({'status': 'ok'})
-
-if __name__ == '__main__':
-    print("Whale Tracker Pro - Demarrage...")
-    print("Actifs suivis:", ASSETS)
-    print("Top", TOP_WHALES, "whales par actif")
-    
-    # Première mise à jour
-    update_all_data()
-    
-    # Scheduler pour mise à jour toutes les 5 minutes
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(update_all_data, 'interval', minutes=5)
-    scheduler.start()
-    
-    print("")
-    print("Serveur pret!")
-    print("Ouvrez: http://localhost:5000")
-    print("")
-    
-    app.run(debug=False, host='0.0.0.0', port=5000)
-
+from flask import Flask, Response, g, jsonify, request
+from apscheduler.schedulers.background import BackgroundScheduler
+from hyperliquid import HyperliquidClient, HyperliquidError, CircuitBreaker
+from http_cache import CachedResponse
+from delta import VersionHistory, diff_data
+from stream import Broadcaster, TooManySubscribers
+from refresh import RefreshCoordinator, source_priority
+from ratelimit import ClientRateLimiter
+from snapshot import Snapshot, load_snapshot, save_snapshot, dumps_snapshot, loads_snapshot
+from positions import WhaleTable, asset_to_json, parse_address
+from history import HistoryStore
+from wallets import WalletIndex
+from ingest import collect_positions, leaderboard_addresses, mark_prices, max_leverages
+from aggregate import StreamAggregator
+from adaptive import AdaptiveScheduler
+from governor import RequestGovernor, BACKGROUND, HOT, request_weight
+from cluster import ClusterNode, open_store
+from assets import StaticAssets
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from liquidations import LiquidationEngine
+from universe import AssetUniverse, LRUCache, universe_assets
+from sentiment import SentimentEngine, SentimentScale, ASSET_LEVELS, GLOBAL_LEVELS, GLOBAL_STRICT_FROM, GLOBAL_DECIMALS
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+app = Flask(__name__)
+
+# Actifs épinglés : données complètes à chaque cycle (cartes, deltas, historique)
+ASSETS = [a.strip() for a in os.environ.get('ASSETS', 'BTC,ETH,BNB,TAO,HYPE').split(',') if a.strip()]
+# Univers résumé (voir universe.py) : 'auto' = tous les perps de metaAndAssetCtxs, sinon une liste
+ASSET_UNIVERSE = os.environ.get('ASSET_UNIVERSE', 'auto')
+TOP_WHALES = int(os.environ.get('TOP_WHALES', 30))  # taille du top par actif
+ASSET_CACHE_SIZE = int(os.environ.get('ASSET_CACHE_SIZE', 32))  # tables complètes d'actifs non épinglés (LRU)
+REFRESH_INTERVAL = int(os.environ.get('REFRESH_INTERVAL', 300))  # période du job planifié (s)
+HISTORY_VERSIONS = int(os.environ.get('HISTORY_VERSIONS', 60))  # versions gardées pour ?since=
+
+# Moteur de rafraîchissement concurrent
+REFRESH_CONCURRENCY = int(os.environ.get('REFRESH_CONCURRENCY', 16))  # wallets interrogés en parallèle
+WALLET_TIMEOUT = float(os.environ.get('WALLET_TIMEOUT', 15))  # délai max par wallet, retries compris (s)
+REFRESH_TIMEOUT = float(os.environ.get('REFRESH_TIMEOUT', 45))  # budget de temps du cycle complet (s)
+REQUEST_TIMEOUT = 10
+
+# Wallets candidats : leaderboard + adresses épinglées (séparées par des virgules)
+CANDIDATE_WALLETS = int(os.environ.get('CANDIDATE_WALLETS', 500))
+WATCHED_WALLETS = [a.strip() for a in os.environ.get('WATCHED_WALLETS', '').split(',') if a.strip()]
+LEADERBOARD_URL = os.environ.get('LEADERBOARD_URL')  # ex. https://stats-data.hyperliquid.xyz/Mainnet/leaderboard
+
+# Budget amont : poids par minute de l'API info (1200 par IP), avec une marge
+UPSTREAM_WEIGHT_LIMIT = float(os.environ.get('UPSTREAM_WEIGHT_LIMIT', 1200))
+UPSTREAM_HEADROOM = float(os.environ.get('UPSTREAM_HEADROOM', 0.95))  # fraction de la limite visée
+governor = RequestGovernor(
+    limit=UPSTREAM_WEIGHT_LIMIT * UPSTREAM_HEADROOM,
+    burst=float(os.environ.get('UPSTREAM_BURST', UPSTREAM_WEIGHT_LIMIT / 2)),
+)
+
+# Instrumentation exportée sur /metrics (format Prometheus), toujours active
+registry = Registry()
+upstream_seconds = registry.histogram(
+    'whale_upstream_request_seconds', "Latence d'un essai vers l'API Hyperliquid", ('type', 'status'))
+refresh_seconds = registry.histogram(
+    'whale_refresh_seconds', "Durée d'un rafraîchissement, publication comprise", ('kind',))
+asset_refresh_seconds = registry.histogram(
+    'whale_asset_refresh_seconds',
+    "Durée de récupération des données d'un actif (asset=\"all\" : le balayage, qui sert tous les actifs d'un coup)",
+    ('asset', 'kind'))
+refresh_outcomes = registry.counter(
+    'whale_refresh_total', 'Rafraîchissements par issue (published, empty, error)', ('kind', 'result'))
+positions_scanned = registry.counter(
+    'whale_positions_scanned_total', 'Positions agrégées depuis les wallets interrogés', ('kind',))
+render_seconds = registry.histogram(
+    'whale_render_seconds', "Rendu/sérialisation d'une vue (défaut de cache uniquement)", ('view',))
+render_cache = registry.counter(
+    'whale_render_cache_total', 'Accès au cache de rendu du snapshot', ('view', 'result'))
+http_seconds = registry.histogram(
+    'whale_http_request_seconds', 'Temps de traitement des requêtes HTTP', ('endpoint',))
+http_responses = registry.counter(
+    'whale_http_responses_total', 'Réponses HTTP par endpoint et statut (304 = cache client)', ('endpoint', 'status'))
+
+# Client HTTP partagé (pool keep-alive, retries, disjoncteur, budget)
+HYPERLIQUID_URL = os.environ.get('HYPERLIQUID_URL', "https://api.hyperliquid.xyz/info")
+client = HyperliquidClient(
+    url=HYPERLIQUID_URL,
+    pool_size=int(os.environ.get('HTTP_POOL_SIZE', REFRESH_CONCURRENCY)),
+    timeout=REQUEST_TIMEOUT,
+    max_retries=int(os.environ.get('HTTP_MAX_RETRIES', 3)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('BREAKER_THRESHOLD', 5)),
+        reset_timeout=float(os.environ.get('BREAKER_RESET', 30)),
+    ),
+    governor=governor,
+    on_request=lambda kind, status, seconds: upstream_seconds.observe(seconds, kind, str(status)),
+)
+
+# Données globales (meta + leaderboard) partagées entre actifs
+MARKET_TTL = float(os.environ.get('MARKET_TTL', 60))  # réutilisation du snapshot (s)
+PRICE_TTL = float(os.environ.get('PRICE_TTL', 3))  # réutilisation des prix mark entre rafraîchissements chauds (s)
+
+# Rafraîchissements chauds par actif (voir adaptive.py), sous un budget global
+ASSET_MIN_INTERVAL = float(os.environ.get('ASSET_MIN_INTERVAL', 5))  # actif le plus chaud (s)
+REQUEST_BUDGET = float(os.environ.get('REQUEST_BUDGET', governor.limit))  # poids amont par minute, balayage compris
+SCHEDULE_TICK = float(os.environ.get('SCHEDULE_TICK', 1))  # période de vérification des échéances (s)
+ADAPTIVE_GAIN = float(os.environ.get('ADAPTIVE_GAIN', 4))  # raccourcissement de l'intervalle par point de chaleur
+
+# Historique persistant (SQLite WAL), écrit par lots en arrière-plan
+HISTORY_DB = os.environ.get('HISTORY_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'whale_history.db'))
+history = HistoryStore(
+    HISTORY_DB,
+    raw_days=int(os.environ.get('HISTORY_RAW_DAYS', 7)),
+    retention_days=int(os.environ.get('HISTORY_RETENTION_DAYS', 90)),
+)
+atexit.register(history.close)  # vider la file d'écriture à l'arrêt
+
+# Index des wallets (adresse -> positions sur tous les actifs), adossé à l'historique
+wallet_index = WalletIndex(
+    top_n=int(os.environ.get('WALLET_TOP_N', 10)),
+    history_size=int(os.environ.get('WALLET_HISTORY', 100)),
+)
+wallet_index.restore(*history.load_wallets())
+
+# Dernier snapshot persisté pour le démarrage à chaud
+SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'whale_snapshot.pkl'))
+
+# Fichiers statiques avec empreinte (CSS, JS, police Inter auto-hébergée)
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+FONT_FILE = 'fonts/InterVariable.woff2'  # licence SIL OFL 1.1 (static/fonts/OFL.txt)
+static_assets = StaticAssets(STATIC_DIR)
+app.jinja_env.globals['asset_url'] = static_assets.url
+
+# Sentiment (voir sentiment.py) : ratio long pondéré et paliers de libellés
+sentiment_engine = SentimentEngine(
+    SentimentScale(ASSET_LEVELS).with_thresholds(os.environ.get('SENTIMENT_THRESHOLDS')),  # ex. "75,60,45,30"
+    SentimentScale(GLOBAL_LEVELS, GLOBAL_STRICT_FROM, GLOBAL_DECIMALS).with_thresholds(os.environ.get('GLOBAL_SENTIMENT_THRESHOLDS')),  # ex. "65,55,45,35"
+    weighting=os.environ.get('SENTIMENT_WEIGHTING', 'count'),  # count, notional ou leverage
+)
+
+# Tables complètes construites à la demande pour les actifs non épinglés
+asset_cache = LRUCache(ASSET_CACHE_SIZE)
+
+# Carte de chaleur des liquidations estimées (voir liquidations.py), hors des requêtes
+liquidations = LiquidationEngine(
+    render=lambda payload: CachedResponse(app.json.dumps(payload), 'application/json'),
+    buckets=int(os.environ.get('LIQUIDATION_BUCKETS', 2000)),  # résolution de la grille de prix
+    span=float(os.environ.get('LIQUIDATION_SPAN', 0.5)),  # ± fraction du prix couverte
+)
+
+# Plusieurs processus (voir cluster.py) : un fetcher élu, les autres lisent le store
+SHARED_STORE = os.environ.get('SHARED_STORE', '')  # '' (processus unique), 'file' ou 'redis'
+SHARED_DIR = os.environ.get('SHARED_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+REDIS_URL = os.environ.get('REDIS_URL')
+SHARED_SECRET = os.environ.get('SHARED_SECRET', '').encode() or None  # clé HMAC du store (obligatoire avec Redis)
+SHARED_POLL = float(os.environ.get('SHARED_POLL', 0.5))  # vérification de la version publiée (s)
+REFRESH_FORWARD_TIMEOUT = float(os.environ.get('REFRESH_FORWARD_TIMEOUT', 3))  # attente de la réponse du fetcher (s)
+METRICS_PUSH = float(os.environ.get('METRICS_PUSH', 5))  # export des métriques de chaque processus vers le store (s)
+METRICS_EXPIRY = 60  # export plus ancien : processus disparu, retiré du store
+
+# État publié : remplacé d'un bloc à chaque rafraîchissement, jamais modifié
+current = Snapshot({})
+version_history = VersionHistory(maxlen=HISTORY_VERSIONS)
+broadcaster = Broadcaster(
+    heartbeat=int(os.environ.get('STREAM_HEARTBEAT', 15)),
+    max_subscribers=int(os.environ.get('STREAM_MAX_CLIENTS', 1000)),
+)
+scheduler = BackgroundScheduler()
+adaptive = AdaptiveScheduler(
+    ASSETS,
+    min_interval=ASSET_MIN_INTERVAL,
+    max_interval=REFRESH_INTERVAL,
+    budget=REQUEST_BUDGET,
+    # clearinghouseState par wallet + meta + leaderboard
+    sweep_cost=CANDIDATE_WALLETS * request_weight('clearinghouseState') + 2 * request_weight('metaAndAssetCtxs'),
+    gain=ADAPTIVE_GAIN,
+)
+_market_snapshot = None
+_market_lock = threading.Lock()
+_mark_prices = (float('-inf'), {})  # (instant, prix) du dernier metaAndAssetCtxs seul
+_publish_lock = threading.Lock()
+node = None  # ClusterNode en mode multi-processus
+leader_status = {}  # état du fetcher tel que publié, pour les workers
+
+class MarketSnapshot:
+    """Réponses globales de l'API, identiques pour tous les actifs d'un cycle"""
+    
+    def __init__(self, meta, leaderboard):
+        self.meta = meta
+        self.leaderboard = leaderboard
+        self.prices = mark_prices(meta)  # prix mark live par actif
+        self.max_leverage = max_leverages(meta)
+        self.fetched_at = time.monotonic()
+    
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+def fetch_market_snapshot(deadline=None, priority=BACKGROUND):
+    """Récupère metaAndAssetCtxs et le leaderboard (une fois par cycle)"""
+    # Utiliser l'endpoint des positions ouvertes
+    payload_positions = {
+        "type": "metaAndAssetCtxs"
+    }
+    
+    meta_data = client.info(payload_positions, deadline=deadline, priority=priority)
+    
+    # Récupérer les plus gros holders via l'API
+    payload_leaderboard = {
+        "type": "leaderboard",
+        "window": "day"
+    }
+    
+    try:
+        if LEADERBOARD_URL:
+            leaderboard = client.get_json(LEADERBOARD_URL, deadline=deadline, priority=priority)
+        else:
+            leaderboard = client.info(payload_leaderboard, deadline=deadline, priority=priority)
+    except HyperliquidError as e:
+        print(f"Leaderboard indisponible: {e}")
+        leaderboard = []
+    
+    return MarketSnapshot(meta_data, leaderboard)
+
+def get_market_snapshot(max_age=MARKET_TTL, deadline=None, priority=BACKGROUND):
+    """Snapshot global en cache, refait seulement s'il a plus de max_age secondes
+    
+    Un /api/refresh lancé juste après le job planifié réutilise donc le même
+    snapshot. Le verrou évite que deux cycles concurrents le récupèrent en double.
+    """
+    global _market_snapshot
+    with _market_lock:
+        if _market_snapshot is None or _market_snapshot.age() > max_age:
+            _market_snapshot = fetch_market_snapshot(deadline, priority)
+        return _market_snapshot
+
+def get_mark_prices(max_age=PRICE_TTL, deadline=None):
+    """Prix mark récents sans refaire le leaderboard (rafraîchissements chauds)"""
+    global _mark_prices
+    with _market_lock:
+        if _market_snapshot is not None and _market_snapshot.age() <= max_age:
+            return _market_snapshot.prices
+        fetched_at, prices = _mark_prices
+        if time.monotonic() - fetched_at > max_age:
+            prices = mark_prices(client.info({"type": "metaAndAssetCtxs"}, deadline=deadline, priority=HOT))
+            _mark_prices = (time.monotonic(), prices)
+            liquidations.update_prices(prices)
+        return prices
+
+def get_whale_positions(asset, positions, scanned=None, mark_price=None, max_leverage=None, summary=None):
+    """Construit les données d'un actif depuis ses TOP_WHALES plus grosses positions
+    
+    `positions` : enregistrements (adresse, is_long, notionnel, levier, pnl,
+    prix d'entrée) déjà triés par notionnel décroissant, ou la WhaleTable
+    correspondante (univers, voir universe.py). `scanned` : compteurs
+    sur toutes les positions parcourues pour l'actif, au-delà du top.
+    `summary` : agrégats déjà calculés pour cette table (résumé de l'univers).
+    """
+    # Stockage colonnaire : agrégats et sentiment en un passage NumPy (sentiment.py)
+    whales = positions if isinstance(positions, WhaleTable) else WhaleTable.from_records(positions)
+    if summary is None:
+        summary = sentiment_engine.summarize({asset: whales})['assets'][asset]
+    
+    return {
+        'asset': asset,
+        'whales': whales,
+        'long_count': summary['long_count'],
+        'short_count': summary['short_count'],
+        # Même pondération que le sentiment (SENTIMENT_WEIGHTING) ; les trois dans `ratios`
+        'long_ratio': summary['ratio'],
+        'short_ratio': round(100 - summary['ratio'], 1),
+        'weighting': summary['weighting'],
+        'total_long_size': summary['long_size'],
+        'total_short_size': summary['short_size'],
+        'ratios': summary['ratios'],
+        'net_exposure': summary['net_exposure'],
+        'net_exposure_ratio': summary['net_exposure_ratio'],
+        'pnl_skew': summary['pnl_skew'],
+        'sentiment': summary['sentiment'],
+        'sentiment_class': summary['sentiment_class'],
+        'emoji': summary['emoji'],
+        'mark_price': mark_price,
+        'max_leverage': max_leverage,
+        'scanned': scanned or {
+            'long_count': summary['long_count'], 'short_count': summary['short_count'],
+            'long_size': summary['long_size'], 'short_size': summary['short_size'],
+        }
+    }
+
+def candidate_wallets(market):
+    """Adresses à interroger : wallets épinglés puis leaderboard"""
+    addresses = leaderboard_addresses(WATCHED_WALLETS, len(WATCHED_WALLETS))
+    known = set(addresses)
+    for address in leaderboard_addresses(market.leaderboard, CANDIDATE_WALLETS):
+        if address not in known:
+            addresses.append(address)
+    return addresses[:max(CANDIDATE_WALLETS, len(WATCHED_WALLETS))]
+
+def fetch_all_assets(assets, priority=BACKGROUND):
+    """Récupère les positions de tous les wallets candidats puis classe par actif
+    
+    Un seul balayage des wallets sert tous les actifs : chaque
+    clearinghouseState contient les positions de l'adresse sur tout le marché.
+    Ce qui n'a pas répondu avant REFRESH_TIMEOUT est abandonné pour ce cycle.
+    
+    Renvoie (données complètes des actifs épinglés `assets`, AssetUniverse de
+    tous les actifs listés, ou None si le balayage n'a rien donné).
+    """
+    results = {}
+    cycle_deadline = time.monotonic() + REFRESH_TIMEOUT
+    
+    # Les réponses globales sont récupérées une seule fois pour tous les actifs
+    try:
+        market = get_market_snapshot(deadline=cycle_deadline, priority=priority)
+    except Exception as e:
+        print(f"Erreur snapshot marché: {e}")
+        return results, None
+    
+    addresses = candidate_wallets(market)
+    if not addresses:
+        print("Aucun wallet candidat (leaderboard vide)")
+        return results, None
+    
+    # Agrégation en flux : un tas borné par actif de l'univers, rien n'est matérialisé
+    restrict = None if ASSET_UNIVERSE == 'auto' else {a.strip() for a in ASSET_UNIVERSE.split(',')}
+    aggregator = StreamAggregator(universe_assets(market.prices, restrict, assets), TOP_WHALES)
+    aggregator.consume(
+        collect_positions(client, addresses, market.prices, REFRESH_CONCURRENCY,
+                          cycle_deadline, WALLET_TIMEOUT, priority),
+        on_progress=lambda agg: print(f"  {agg.positions} positions agrégées..."),
+        every=5000,
+    )
+    positions_scanned.inc('sweep', amount=aggregator.positions)
+    if not aggregator.positions:
+        return results, None
+    
+    # Un seul passage vectorisé pour les agrégats de tous les actifs (résumés de l'univers)
+    tops = {asset: (WhaleTable.from_records(top), scanned)
+            for asset, (top, scanned) in aggregator.results().items()}
+    universe = AssetUniverse.build(time.time_ns(), tops, sentiment_engine, market.prices,
+                                   market.max_leverage, set(assets))
+    # Données complètes pour les épinglés seulement, agrégats repris des résumés
+    for asset in assets:
+        if asset in tops:
+            table, scanned = tops[asset]
+            results[asset] = get_whale_positions(asset, table, scanned, market.prices.get(asset),
+                                                 market.max_leverage.get(asset), universe.summaries.get(asset))
+    return results, universe
+
+def refresh_asset(asset):
+    """Rafraîchissement chaud : réinterroge seulement les wallets du top de l'actif
+    
+    Beaucoup moins cher qu'un balayage (TOP_WHALES requêtes + prix mark). Les
+    nouveaux entrants hors du top actuel attendent le prochain balayage complet ;
+    les compteurs `scanned` de ce dernier sont conservés.
+    """
+    previous = current.assets.get(asset)
+    if previous is None:
+        return None
+    table = previous['whales']
+    addresses = [table.address(i) for i in range(len(table))]
+    deadline = time.monotonic() + WALLET_TIMEOUT
+    try:
+        prices = get_mark_prices(deadline=deadline)
+    except HyperliquidError as e:
+        print(f"Prix mark indisponibles ({asset}): {e}")
+        return None
+    
+    aggregator = StreamAggregator([asset], TOP_WHALES)
+    aggregator.consume(collect_positions(client, addresses, prices, REFRESH_CONCURRENCY,
+                                         deadline, WALLET_TIMEOUT, HOT))
+    positions_scanned.inc('hot', amount=aggregator.positions)
+    if not aggregator.positions:
+        return None
+    top, _ = aggregator.results()[asset]
+    data = get_whale_positions(asset, top, previous.get('scanned'), prices.get(asset),
+                               previous.get('max_leverage'))
+    return publish({asset: data}, persist=False)
+
+def run_hot_refreshes():
+    """Job du scheduler : rafraîchit les actifs chauds arrivés à échéance"""
+    if refresher.running:
+        return  # un balayage complet en cours couvre déjà tous les actifs
+    for asset in adaptive.due():
+        started = time.perf_counter()
+        try:
+            version = refresh_asset(asset)
+        except Exception as e:
+            refresh_outcomes.inc('hot', 'error')
+            print(f"Erreur de rafraîchissement chaud ({asset}): {e}")
+            continue
+        elapsed = time.perf_counter() - started
+        refresh_seconds.observe(elapsed, 'hot')
+        asset_refresh_seconds.observe(elapsed, asset, 'hot')
+        refresh_outcomes.inc('hot', 'published' if version is not None else 'empty')
+
+def update_all_data(source='scheduler', priority=None):
+    """Met à jour les données pour tous les actifs (balayage complet)
+
+    `priority` : Priority du job (relevée si un rafraîchissement manuel le
+    rejoint), sinon déduite de `source`.
+    """
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Mise à jour des données...")
+    
+    started = time.perf_counter()
+    try:
+        # Un rafraîchissement demandé (API, démarrage) passe devant le budget de fond
+        results, universe = fetch_all_assets(ASSETS, priority if priority is not None else source_priority(source))
+        # Un seul balayage sert tous les actifs : une observation, pas une par actif
+        asset_refresh_seconds.observe(time.perf_counter() - started, 'all', 'sweep')
+        if not results:
+            # Rien de neuf : on garde la version courante et ses réponses en cache
+            refresh_outcomes.inc('sweep', 'empty')
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Aucune donnée reçue, version {current.version} conservée")
+            return current.version
+        
+        version = publish(results, universe=universe)
+    except Exception:
+        refresh_outcomes.inc('sweep', 'error')
+        raise
+    finally:
+        refresh_seconds.observe(time.perf_counter() - started, 'sweep')
+    refresh_outcomes.inc('sweep', 'published')
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Mise à jour terminée!")
+    return version
+
+def publish(results, persist=True, universe=None):
+    """Publie une nouvelle version à partir des actifs mis à jour
+    
+    Sérialisé : le balayage complet et les rafraîchissements chauds partent
+    chacun du snapshot courant, aucune mise à jour n'est perdue. `universe` :
+    résumés de tous les actifs, fournis par le balayage complet.
+    """
+    global current
+    with _publish_lock:
+        snapshot = current.evolve(results, datetime.now(), universe)
+        # Rendus préparés avant publication : le premier lecteur ne paie rien
+        render_dashboard(snapshot)
+        render_api_data(snapshot)
+        version_history.record(snapshot.version, snapshot.assets)
+        current = snapshot  # publication atomique (une seule affectation)
+        timestamp = int(snapshot.last_update.timestamp())
+        history.record(timestamp, snapshot.version, results)
+        # Mise à jour incrémentale : seuls les actifs de ce cycle sont parcourus
+        touched, events = wallet_index.update(timestamp, results)
+        history.record_wallets(touched, events)
+        liquidations.update(results, snapshot.version)
+        for asset, data in results.items():
+            cost = len(data['whales']) * request_weight('clearinghouseState') + request_weight('metaAndAssetCtxs')
+            adaptive.observe(asset, data, cost)
+        if node is not None:
+            # Chaque version part dans le store partagé, lu par tous les workers
+            node.publish(dumps_snapshot(
+                snapshot,
+                changed=list(results),
+                events=wallet_index.events_since(0),
+                status=fetcher_status(snapshot),
+            ), snapshot.version)
+        elif persist:
+            try:
+                save_snapshot(snapshot, SNAPSHOT_PATH)
+            except OSError as e:
+                print(f"Impossible de persister le snapshot: {e}")
+
+    # Prévenir les tableaux de bord ouverts : ils récupèrent eux-mêmes le delta
+    broadcaster.publish('version', {
+        'version': snapshot.version,
+        'last_update': snapshot.last_update_label
+    }, event_id=snapshot.version)
+    return snapshot.version
+
+def sync_snapshot(payload):
+    """Worker : adopte la version publiée par le fetcher dans le store"""
+    global current, leader_status
+    snapshot, extra = loads_snapshot(payload)
+    if snapshot is None:
+        return
+    with _publish_lock:
+        if snapshot.version == current.version:
+            return
+        version_history.record(snapshot.version, snapshot.assets)
+        current = snapshot
+        # Positions suivies mises à jour localement, événements repris du fetcher
+        changed = {asset: snapshot.assets[asset] for asset in extra.get('changed', ()) if asset in snapshot.assets}
+        wallet_index.update(int(snapshot.last_update.timestamp()), changed, emit=False)
+        wallet_index.replace_events(extra.get('events', []))
+        # Un worker qui vient de démarrer n'a encore aucune carte de liquidations
+        liquidations.update({asset: data for asset, data in snapshot.assets.items()
+                             if asset in changed or not liquidations.tracks(asset)}, snapshot.version)
+        leader_status = extra.get('status', {})
+    
+    broadcaster.publish('version', {
+        'version': snapshot.version,
+        'last_update': snapshot.last_update_label
+    }, event_id=snapshot.version)
+
+def is_follower():
+    """Processus qui sert des données sans les récupérer lui-même"""
+    return node is not None and not node.leader
+
+# Un seul rafraîchissement à la fois (API, scheduler et démarrage confondus)
+refresher = RefreshCoordinator(update_all_data, governor=governor)
+REFRESH_REPLIES = 100  # réponses aux demandes transmises gardées pour les workers
+refresh_replies = OrderedDict()  # fetcher : id de la demande -> réponse
+_published_refresh = None
+_metrics_pushed = float('-inf')
+
+# /api/refresh : au plus REFRESH_RATE_LIMIT déclenchements par minute et par client,
+# appliqué par le fetcher seul (voir start_refresh)
+refresh_limiter = ClientRateLimiter(
+    rate=float(os.environ.get('REFRESH_RATE_LIMIT', 2)) / 60,
+    capacity=int(os.environ.get('REFRESH_BURST', 2)),
+)
+
+# Template HTML moderne et compact
+HTML_TEMPLATE = '''
+<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>🐋 Whale Tracker Pro</title>
+    {% if font_url %}
+    <link rel="preload" href="{{ font_url }}" as="font" type="font/woff2" crossorigin>
+    <style>@font-face { font-family: 'Inter'; src: url({{ font_url }}) format('woff2'); font-weight: 100 900; font-display: swap; }</style>
+    {% endif %}
+    <link rel="stylesheet" href="{{ asset_url('dashboard.css') }}">
+    <script src="{{ asset_url('dashboard.js') }}" defer></script>
+</head>
+<body>
+    <header class="header">
+        <div class="logo">
+            <span class="logo-icon">🐋</span>
+            <span>Whale Tracker</span>
+            <span style="font-size: 10px; color: #64748b; font-weight: 400;">PRO</span>
+        </div>
+        <div class="status-bar">
+            <div class="status-dot"></div>
+            <span style="color: #10b981;">Live</span>
+            <span style="color: #64748b;">•</span>
+            <span style="color: #64748b;">Top {{ top_whales }} Whales</span>
+            <div class="timer" id="timer">05:00</div>
+        </div>
+    </header>
+    
+    <main class="main">
+        <!-- Summary global -->
+        <div class="summary-bar">
+            <div class="summary-card">
+                <div class="summary-label">🎯 Sentiment Global</div>
+                <div class="summary-value" id="global-sentiment">{% if summary.positions %}{{ summary.emoji }} {{ summary.sentiment }}{% else %}-{% endif %}</div>
+            </div>
+            <div class="summary-card">
+                <div class="summary-label">📊 Ratio Long Global</div>
+                <div class="summary-value bullish" id="global-long">{% if summary.positions %}{{ summary.ratio }}%{% else %}-{% endif %}</div>
+            </div>
+            <div class="summary-card">
+                <div class="summary-label">🐋 Whales Analysées</div>
+                <div class="summary-value neutral" id="whale-count">{{ summary.positions }}</div>
+            </div>
+            <div class="summary-card">
+                <div class="summary-label">🕐 Dernière MAJ</div>
+                <div class="summary-value neutral" style="font-size: 14px;" id="last-update">{{ last_update }}</div>
+            </div>
+        </div>
+        
+        <!-- Indicateurs par actif -->
+        <div class="indicators-grid" id="indicators-grid">
+            {% for asset, data in whale_data.items() %}
+            <div class="indicator-card" id="card-{{ asset }}" data-asset="{{ asset }}">
+                <div class="indicator-header">
+                    <div class="asset-name">
+                        <div class="asset-icon {{ asset.lower() }}">{{ asset[0] }}</div>
+                        {{ asset }}
+                    </div>
+                    <span class="sentiment-badge {{ data.sentiment_class }}">
+                        {{ data.emoji }} {{ data.sentiment }}
+                    </span>
+                </div>
+                
+                <div class="ratio-bar-container">
+                    <div class="ratio-labels" title="Pondération : {{ data.weighting }}">
+                        <span class="long-label">Long {{ data.long_ratio }}%</span>
+                        <span class="short-label">Short {{ data.short_ratio }}%</span>
+                    </div>
+                    <div class="ratio-bar">
+                        <div class="ratio-fill" style="width: {{ data.long_ratio }}%"></div>
+                    </div>
+                </div>
+                
+                <div class="stats-row">
+                    <span>🟢 {{ data.long_count }}</span>
+                    <span>🔴 {{ data.short_count }}</span>
+                    <span class="stat-value">${{ "%.1f"|format(data.total_long_size / 1000000) }}M</span>
+                </div>
+            </div>
+            {% endfor %}
+        </div>
+        
+        <!-- Section détaillée -->
+        <div class="details-section">
+            <div class="details-header">
+                <div class="details-title">
+                    <span>📋</span>
+                    Positions des Whales
+                </div>
+                <div class="tabs" id="tabs">
+                    {% for asset in whale_data.keys() %}
+                    <button class="tab {% if loop.first %}active{% endif %}" data-asset="{{ asset }}">
+                        {{ asset }}
+                    </button>
+                    {% endfor %}
+                </div>
+            </div>
+            
+            <div class="table-container">
+                <table class="whale-table">
+                    <thead>
+                        <tr>
+                            <th>#</th>
+                            <th>Adresse</th>
+                            <th>Position</th>
+                            <th>Taille</th>
+                            <th>Levier</th>
+                            <th>PnL</th>
+                            <th>Entrée</th>
+                        </tr>
+                    </thead>
+                    <tbody id="whale-tbody">
+                        {% for asset, data in whale_data.items() %}
+                            {% if loop.first %}
+                                {% for whale in data.whales %}
+                                <tr>
+                                    <td><span class="rank {% if whale.rank <= 3 %}top3{% endif %}">{{ whale.rank }}</span></td>
+                                    <td class="address">{{ whale.address }}</td>
+                                    <td><span class="side-badge {{ whale.side.lower() }}">{{ whale.side }}</span></td>
+                                    <td>${{ "{:,.0f}".format(whale.size) }}</td>
+                                    <td><span class="leverage">{{ whale.leverage }}x</span></td>
+                                    <td class="pnl {% if whale.pnl >= 0 %}positive{% else %}negative{% endif %}">
+                                        {% if whale.pnl >= 0 %}+{% endif %}${{ "{:,.0f}".format(whale.pnl) }}
+                                    </td>
+                                    <td>${{ "{:,.2f}".format(whale.entry_price) }}</td>
+                                </tr>
+                                {% endfor %}
+                            {% endif %}
+                        {% endfor %}
+                    </tbody>
+                </table>
+            </div>
+        </div>
+        
+        <!-- Tous les marchés : résumés chargés à la demande (/api/assets) -->
+        <div class="details-section">
+            <div class="details-header">
+                <div class="details-title">
+                    <span>🌐</span>
+                    Tous les marchés <span id="universe-count">({{ universe_count }})</span>
+                </div>
+                <div class="tabs">
+                    <button class="tab" id="universe-toggle" onclick="toggleUniverse()">Afficher</button>
+                </div>
+            </div>
+            
+            <div class="table-container" id="universe-container" hidden>
+                <table class="whale-table">
+                    <thead>
+                        <tr>
+                            <th>Actif</th>
+                            <th>Prix</th>
+                            <th>Long</th>
+                            <th>Sentiment</th>
+                            <th>Notionnel</th>
+                            <th>Positions</th>
+                        </tr>
+                    </thead>
+                    <tbody id="universe-tbody"></tbody>
+                </table>
+            </div>
+        </div>
+    </main>
+    
+    <script id="whale-data" type="application/json">{{ boot_json | safe }}</script>
+</body>
+</html>
+'''
+
+# Template compilé une seule fois au démarrage
+dashboard_template = app.jinja_env.from_string(HTML_TEMPLATE)
+
+def cached_render(snapshot, key, view, build):
+    """snapshot.cached instrumenté : temps de rendu et ratio de cache par vue"""
+    built = []
+    def timed_build():
+        built.append(True)
+        with render_seconds.time(view):
+            return build()
+    value = snapshot.cached(key, timed_build)
+    render_cache.inc(view, 'miss' if built else 'hit')
+    return value
+
+def render_dashboard(snapshot):
+    """Rend la page (et son JSON embarqué) une fois par snapshot
+    
+    Seule la partie qui dépend des données est dans la page : CSS et JS sont
+    des fichiers statiques avec empreinte, mis en cache par le navigateur.
+    """
+    def build():
+        assets = snapshot.json_assets()
+        summary = global_summary(snapshot)
+        boot = {'data': assets, 'global': summary, 'version': snapshot.version, 'refresh_interval': REFRESH_INTERVAL}
+        html = dashboard_template.render(
+            whale_data=assets,
+            summary=summary,
+            top_whales=TOP_WHALES,
+            universe_count=len(snapshot.universe.summaries),
+            # JSON dans une balise <script> : "</" ne doit pas la refermer
+            boot_json=json.dumps(boot).replace('</', '<\\/'),
+            last_update=snapshot.last_update_label or 'N/A',
+            font_url=static_assets.url(FONT_FILE)
+        )
+        return CachedResponse(html, 'text/html', last_modified=snapshot.last_modified)
+    # La page cite les URL des fichiers statiques : une par version de ces fichiers
+    return cached_render(snapshot, ('dashboard', static_assets.build_id), 'dashboard', build)
+
+def global_summary(snapshot):
+    """Agrégats de tous les actifs, calculés une fois par snapshot pour tous les clients"""
+    def build():
+        tables = {asset: data['whales'] for asset, data in snapshot.assets.items()
+                  if isinstance(data.get('whales'), WhaleTable)}
+        return sentiment_engine.summarize(tables)['global']
+    return snapshot.cached('global', build)
+
+def mark_stale(response, snapshot):
+    """Signale un snapshot rechargé du disque, pas encore rafraîchi"""
+    if snapshot.stale:
+        response.headers['X-Data-Stale'] = 'true'
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    http_seconds.observe(time.perf_counter() - g.get('started', time.perf_counter()), endpoint)
+    http_responses.inc(endpoint, str(response.status_code))
+    return response
+
+def snapshot_age():
+    snapshot = current
+    return time.time() - snapshot.last_update.timestamp() if snapshot.last_update else None
+
+# Entre processus : le pire retard des workers, la somme des abonnés, le reste vu par le fetcher
+registry.gauge('whale_snapshot_age_seconds', 'Âge des données servies', function=snapshot_age, merge='max')
+registry.gauge('whale_snapshot_version', 'Version des données servies', function=lambda: current.version,
+               merge='max')
+registry.gauge('whale_snapshot_stale', 'Snapshot rechargé du disque, pas encore rafraîchi',
+               function=lambda: int(current.stale), merge='max')
+registry.gauge('whale_stream_subscribers', 'Clients SSE connectés', function=lambda: broadcaster.subscribers)
+registry.gauge('whale_fetcher', "Processus qui interrogent eux-mêmes l'API (1 attendu, les autres lisent le store)",
+               function=lambda: int(not is_follower()))
+registry.gauge('whale_upstream_rate', 'Débit amont autorisé (poids/min, AIMD)',
+               function=lambda: governor.stats()['rate_per_min'], merge='leader')
+registry.gauge('whale_upstream_utilisation', 'Part du budget amont consommée sur la dernière minute',
+               function=lambda: governor.stats()['utilisation'], merge='leader')
+registry.gauge('whale_upstream_queued', "Requêtes en attente de budget", ('priority',),
+               function=lambda: {(name,): count for name, count in governor.stats()['queued'].items()},
+               merge='leader')
+registry.counter('whale_upstream_throttled_total', 'Réponses 429 reçues depuis le démarrage',
+                 function=lambda: governor.throttled_total)
+registry.gauge('whale_breaker_open', 'Disjoncteur amont ouvert (1) ou fermé (0)',
+               function=lambda: int(client.breaker.state != 'closed'), merge='leader')
+registry.gauge('whale_universe_assets', "Actifs de l'univers ayant des positions",
+               function=lambda: len(current.universe.summaries), merge='max')
+registry.counter('whale_asset_cache_total', 'Accès au cache LRU des tables à la demande', ('result',),
+                 function=lambda: {('hit',): asset_cache.hits, ('miss',): asset_cache.misses})
+registry.counter('whale_liquidation_maps_total', 'Cartes de liquidations calculées',
+                 function=lambda: liquidations.computed_total)
+registry.gauge('whale_asset_refresh_interval_seconds', 'Intervalle de rafraîchissement planifié par actif', ('asset',),
+               function=lambda: {(asset,): state['interval'] for asset, state in adaptive.state()['assets'].items()},
+               merge='leader')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métriques au format texte Prometheus, pour tout le cluster
+
+    Quel que soit le worker qui répond, l'export de chaque processus (publié
+    dans le store toutes les METRICS_PUSH secondes) est fusionné au sien. Un
+    worker arrêté sort de la somme : la baisse des compteurs qui en résulte
+    est traitée par rate() comme une remise à zéro.
+    """
+    if node is None:
+        return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+    exports = [(registry.export(), node.leader)]
+    now = time.time()
+    for member, part in node.parts('metrics').items():
+        if member == node.id:
+            continue
+        if now - part['at'] > METRICS_EXPIRY:
+            node.drop_part('metrics', member)
+            continue
+        exports.append((part['metrics'], part['leader']))
+    return Response(registry.render(exports), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/')
+def index():
+    snapshot = current
+    return mark_stale(render_dashboard(snapshot).to_response(request), snapshot)
+
+def render_api_data(snapshot):
+    """Sérialise /api/data une fois par snapshot"""
+    def build():
+        body = app.json.dumps({
+            'data': snapshot.json_assets(),
+            'global': global_summary(snapshot),
+            'last_update': snapshot.last_update_label,
+            'version': snapshot.version,
+            'full': True
+        })
+        return CachedResponse(body, 'application/json', last_modified=snapshot.last_modified)
+    return cached_render(snapshot, 'api_data', 'api_data', build)
+
+def render_api_delta(snapshot, since):
+    """Sérialise le delta depuis `since`, ou None si la version est trop ancienne"""
+    if since == snapshot.version:
+        old_data = snapshot.assets
+    else:
+        old_data = version_history.get(since)
+        if old_data is None:
+            return None
+    
+    def build():
+        body = app.json.dumps({
+            'last_update': snapshot.last_update_label,
+            'version': snapshot.version,
+            'since': since,
+            'full': False,
+            'global': global_summary(snapshot),
+            **diff_data(old_data, snapshot.assets)
+        })
+        return CachedResponse(body, 'application/json', last_modified=snapshot.last_modified)
+    # Une entrée par version encore dans l'historique : cache borné
+    return cached_render(snapshot, ('api_delta', since), 'api_delta', build)
+
+def seconds_until_refresh(snapshot):
+    """Secondes avant le prochain rafraîchissement planifié"""
+    if is_follower() and 'next_refresh_at' in leader_status:
+        return max(0, int(leader_status['next_refresh_at'] - time.time()))
+    job = scheduler.get_job('refresh')
+    if job is not None and job.next_run_time is not None:
+        remaining = (job.next_run_time - datetime.now(timezone.utc)).total_seconds()
+    elif snapshot.last_update is not None:
+        remaining = REFRESH_INTERVAL - (datetime.now() - snapshot.last_update).total_seconds()
+    else:
+        remaining = 0
+    # Un actif chaud peut publier une version bien avant le prochain balayage
+    hot = adaptive.next_due_in()
+    if hot is not None:
+        remaining = min(remaining, hot)
+    return max(0, int(remaining))
+
+@app.route('/assets/<path:name>')
+def static_asset(name):
+    """CSS, JS et police avec empreinte : cache immuable, envoyés par sendfile"""
+    response = static_assets.response(name, request)
+    if response is None:
+        return jsonify({'error': 'fichier inconnu'}), 404
+    return response
+
+def record_demand(asset):
+    """Demande d'un client pour l'actif (planification adaptative)
+
+    Seul le fetcher planifie : un worker filtre les répétitions localement puis
+    transmet la demande, que le fetcher dédoublonne à nouveau par client (le
+    même client peut tomber sur plusieurs workers).
+    """
+    client = request.remote_addr
+    if adaptive.record_hit(asset, client=client) and is_follower():
+        node.send({'type': 'demand', 'asset': asset, 'client': client})
+
+def on_cluster_message(message):
+    """Fetcher : message transmis par un worker via le store"""
+    if message['type'] == 'demand':
+        adaptive.record_hit(message['asset'], client=message['client'])
+    elif message['type'] == 'refresh':
+        refresh_replies[message['id']] = start_refresh(message['client'])
+        while len(refresh_replies) > REFRESH_REPLIES:
+            refresh_replies.popitem(last=False)
+        publish_refresh_state()
+
+def on_cluster_tick():
+    """Chaque tour de la boucle du cluster : le fetcher republie l'état des jobs,
+    chaque processus ses métriques toutes les METRICS_PUSH secondes"""
+    global _metrics_pushed
+    if node.leader:
+        publish_refresh_state()
+    if time.monotonic() - _metrics_pushed >= METRICS_PUSH:
+        push_metrics()
+        _metrics_pushed = time.monotonic()
+
+def push_metrics():
+    node.put_part('metrics', {'at': time.time(), 'leader': node.leader, 'metrics': registry.export()})
+
+def publish_refresh_state():
+    """Fetcher : jobs récents et réponses aux demandes transmises, lus par tous les workers"""
+    global _published_refresh
+    state = {'jobs': refresher.jobs(), 'replies': dict(refresh_replies)}
+    if state != _published_refresh:
+        node.put('refresh', state)
+        _published_refresh = state
+
+@app.route('/api/focus/<asset>', methods=['POST'])
+def api_focus(asset):
+    """Actif choisi par l'utilisateur dans le tableau de bord
+    
+    Seul ce choix explicite compte comme demande : les synchronisations
+    déclenchées par le flux SSE n'en sont pas une.
+    """
+    record_demand(asset)
+    return '', 204
+
+@app.route('/api/data')
+def api_data():
+    snapshot = current  # une seule lecture : état cohérent pour toute la requête
+    # ?since=<version> : seulement les changements, sinon snapshot complet
+    since = request.args.get('since', type=int)
+    payload = render_api_delta(snapshot, since) if since is not None else None
+    if payload is None:
+        payload = render_api_data(snapshot)
+    # Les clients peuvent garder la réponse jusqu'au prochain rafraîchissement
+    response = payload.to_response(request, cache_control=f'public, max-age={seconds_until_refresh(snapshot)}')
+    return mark_stale(response, snapshot)
+
+def render_api_assets(snapshot):
+    """Résumés de tous les actifs de l'univers, sérialisés une fois par snapshot"""
+    def build():
+        body = app.json.dumps({
+            'version': snapshot.version,
+            'last_update': snapshot.last_update_label,
+            'pinned': list(snapshot.assets),
+            'assets': list(snapshot.universe.summaries.values()),
+        })
+        return CachedResponse(body, 'application/json', last_modified=snapshot.last_modified)
+    return cached_render(snapshot, 'api_assets', 'api_assets', build)
+
+def render_api_asset(snapshot, asset):
+    """Données complètes d'un actif, ou None s'il n'est pas dans l'univers
+    
+    Épinglé : repris du snapshot. Sinon construit depuis la table du dernier
+    balayage à la première demande, puis gardé dans le cache LRU.
+    """
+    def serialize(data, pinned):
+        body = app.json.dumps({
+            'asset': asset,
+            'pinned': pinned,
+            'data': asset_to_json(data),
+            'version': snapshot.version,
+            'last_update': snapshot.last_update_label,
+        })
+        return CachedResponse(body, 'application/json', last_modified=snapshot.last_modified)
+    
+    if asset in snapshot.assets:
+        return cached_render(snapshot, ('api_asset', asset), 'api_asset',
+                             lambda: serialize(snapshot.assets[asset], True))
+    universe = snapshot.universe
+    if asset not in universe.tables:
+        return None
+    
+    def build():
+        with render_seconds.time('api_asset_lazy'):
+            table, scanned = universe.tables[asset]
+            summary = universe.summaries[asset]
+            data = get_whale_positions(asset, table, scanned, summary['mark_price'], summary['max_leverage'], summary)
+            return serialize(data, False)
+    # La table ne change qu'au balayage suivant : une entrée par (actif, balayage)
+    return asset_cache.get_or_build((asset, universe.sweep), build)
+
+@app.route('/api/assets')
+def api_assets():
+    """Univers complet : une ligne de résumé par actif ayant des positions"""
+    snapshot = current
+    return mark_stale(render_api_assets(snapshot).to_response(request), snapshot)
+
+@app.route('/api/asset/<asset>')
+def api_asset(asset):
+    """Top des whales d'un actif quelconque de l'univers"""
+    snapshot = current
+    payload = render_api_asset(snapshot, asset)
+    if payload is None:
+        return jsonify({'error': 'actif inconnu ou sans position'}), 404
+    record_demand(asset)
+    return mark_stale(payload.to_response(request), snapshot)
+
+@app.route('/api/liquidations/<asset>')
+def api_liquidations(asset):
+    """Notionnel liquidable par niveau de prix, précalculé à chaque mise à jour"""
+    payload = liquidations.get(asset)
+    if payload is None:
+        if asset in current.assets:
+            response = jsonify({'error': 'carte en cours de calcul'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        return jsonify({'error': 'actif inconnu'}), 404
+    record_demand(asset)
+    return payload.to_response(request)
+
+# Résolutions acceptées par /api/history (s) ; toute valeur multiple de 60 aussi
+HISTORY_RESOLUTIONS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+HISTORY_MAX_BUCKETS = 100000
+
+@app.route('/api/history/<asset>')
+def api_history(asset):
+    """Buckets pré-agrégés : OHLC du long_ratio, levier moyen, PnL moyen (mean_pnl)
+
+    `mean_pnl` remplace la somme des PnL d'abord prévue (champ `pnl`) : c'est
+    le PnL total des whales moyenné sur les snapshots du bucket. Une somme sur
+    les échantillons grossirait avec la fréquence des rafraîchissements ; elle
+    reste calculable côté client (mean_pnl × samples).
+    """
+    now = int(time.time())
+    end = request.args.get('to', default=now, type=int)
+    start = request.args.get('from', default=end - 86400, type=int)
+    raw = request.args.get('resolution', '5m')
+    resolution = HISTORY_RESOLUTIONS.get(raw) or (int(raw) if raw.isdigit() else None)
+    if not resolution or resolution % 60 or start > end:
+        return jsonify({'error': 'paramètres invalides (from <= to, resolution multiple de 60s)'}), 400
+    if (end - start) // resolution > HISTORY_MAX_BUCKETS:
+        return jsonify({'error': 'trop de buckets, choisir une résolution plus large'}), 400
+    record_demand(asset)
+    
+    return jsonify({
+        'asset': asset,
+        'from': start,
+        'to': end,
+        'resolution': resolution,
+        'buckets': history.rollup_range(asset, resolution, start, end)
+    })
+
+def schedule_state():
+    job = scheduler.get_job('refresh')
+    return {
+        'sweep_interval': REFRESH_INTERVAL,
+        'next_sweep': job.next_run_time.strftime('%H:%M:%S') if job is not None and job.next_run_time else None,
+        'sweep_running': refresher.running,
+        **adaptive.state()
+    }
+
+def upstream_state():
+    return {**governor.stats(), 'breaker': client.breaker.state}
+
+def fetcher_status(snapshot):
+    """État du fetcher joint à chaque version publiée dans le store"""
+    return {
+        'schedule': schedule_state(),
+        'upstream': upstream_state(),
+        'next_refresh_at': time.time() + seconds_until_refresh(snapshot),
+        'published_at': time.time(),
+        'pid': os.getpid(),
+    }
+
+@app.route('/api/schedule')
+def api_schedule():
+    """Intervalles par actif, chaleur, demande et consommation du budget"""
+    if is_follower():
+        # Vu depuis un worker : état du fetcher à sa dernière publication
+        return jsonify({**leader_status.get('schedule', {}), 'as_of': leader_status.get('published_at')})
+    return jsonify(schedule_state())
+
+@app.route('/api/upstream')
+def api_upstream():
+    """Consommation du budget amont (poids/min), file d'attente et 429 reçus"""
+    if is_follower():
+        return jsonify({**leader_status.get('upstream', {}), 'as_of': leader_status.get('published_at')})
+    return jsonify(upstream_state())
+
+@app.route('/api/wallet/<address>')
+def api_wallet(address):
+    """Positions courantes d'une adresse sur tous les actifs (+ historique si from/to)"""
+    try:
+        raw = parse_address(address)
+    except ValueError:
+        return jsonify({'error': 'adresse invalide (0x + 40 caractères hex)'}), 400
+    wallet = wallet_index.get(raw)
+    if wallet is None:
+        return jsonify({'error': 'adresse inconnue'}), 404
+    
+    start = request.args.get('from', type=int)
+    if start is not None:
+        end = request.args.get('to', default=int(time.time()), type=int)
+        wallet['history'] = [
+            {**row, 'address': '0x' + row['address'].hex()}
+            for row in history.address_range(raw, start, end)
+        ]
+    return jsonify(wallet)
+
+@app.route('/api/wallet-events')
+def api_wallet_events():
+    """Événements 'entered_top' et 'flipped' depuis l'id `since`"""
+    since = request.args.get('since', default=0, type=int)
+    return jsonify({'events': wallet_index.events_since(since)})
+
+@app.route('/api/stream')
+def api_stream():
+    """Flux SSE : un événement 'version' à chaque nouvelle version de données"""
+    try:
+        stream = broadcaster.subscribe()
+    except TooManySubscribers:
+        return jsonify({'error': 'trop de clients connectés'}), 503
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # pas de mise en tampon derrière nginx
+    })
+
+@app.route('/api/refresh', methods=['GET', 'POST'])
+def api_refresh():
+    """Déclenche un rafraîchissement en arrière-plan (202 + id du job)"""
+    if is_follower():
+        # Seul le fetcher interroge l'API : la demande lui est transmise via le store
+        reply = forward_refresh(request.remote_addr)
+    else:
+        reply = start_refresh(request.remote_addr)
+    
+    if reply.get('retry_after'):
+        response = jsonify({'error': 'trop de rafraîchissements demandés'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(int(reply['retry_after']) + 1)
+        return response
+    
+    body = {'status': 'accepted', 'job': reply['job'], 'joined': reply['joined']}
+    if is_follower():
+        body['forwarded'] = True
+    if reply['job'] is not None:
+        body['status_url'] = f"/api/refresh/{reply['job']}"
+    response = jsonify(body)
+    response.status_code = 202
+    if reply['job'] is not None:
+        response.headers['Location'] = body['status_url']
+    return response
+
+def start_refresh(client):
+    """Fetcher : déclenche (ou rejoint) un rafraîchissement, réponse sérialisable
+
+    Le limiteur par client n'existe que sur le fetcher : chaque demande, qu'elle
+    vienne de lui ou d'un worker, y est comptée une seule fois pour tout le cluster.
+    """
+    retry_after = refresh_limiter.check(client)
+    if retry_after:
+        return {'job': None, 'joined': None, 'retry_after': retry_after}
+    job, created = refresher.trigger('api')
+    return {'job': job.id, 'joined': not created}
+
+def forward_refresh(client):
+    """Worker : transmet la demande au fetcher et attend sa réponse
+
+    Sans réponse après REFRESH_FORWARD_TIMEOUT (fetcher en pleine élection),
+    la demande reste dans la boîte aux lettres mais le job est inconnu.
+    """
+    request_id = uuid.uuid4().hex
+    node.send({'type': 'refresh', 'id': request_id, 'client': client})
+    deadline = time.monotonic() + REFRESH_FORWARD_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(min(0.1, SHARED_POLL))
+        reply = (node.get('refresh') or {}).get('replies', {}).get(request_id)
+        if reply is not None:
+            return reply
+    return {'job': None, 'joined': None}
+
+@app.route('/api/refresh/<job_id>')
+def api_refresh_status(job_id):
+    """État d'un job, lu dans le store s'il tourne sur un autre processus"""
+    job = refresher.get(job_id)
+    if job is not None:
+        return jsonify(job.to_dict())
+    if node is not None:
+        job = (node.get('refresh') or {}).get('jobs', {}).get(job_id)
+        if job is not None:
+            return jsonify(job)
+    return jsonify({'error': 'job inconnu'}), 404
+
+def start_fetcher():
+    """Rafraîchissements en arrière-plan (processus unique ou fetcher élu)"""
+    # Première mise à jour en arrière-plan : le serveur répond sans l'attendre
+    refresher.trigger('startup')
+    
+    # Scheduler pour mise à jour toutes les 5 minutes (REFRESH_INTERVAL)
+    scheduler.add_job(refresher.run, 'interval', seconds=REFRESH_INTERVAL, id='refresh',
+                      kwargs={'source': 'scheduler'})
+    # Actifs chauds : échéances vérifiées en continu, un seul passage à la fois
+    scheduler.add_job(run_hot_refreshes, 'interval', seconds=SCHEDULE_TICK, id='hot-refresh',
+                      max_instances=1, coalesce=True)
+    scheduler.start()
+
+def start_leader():
+    """Fetcher élu : reprend la dernière version du store, périmée jusqu'au premier cycle
+    
+    Publiée sous une nouvelle version pour que tous les workers l'adoptent :
+    après un redémarrage du cluster ou la perte du fetcher précédent, les
+    réponses portent X-Data-Stale tant qu'aucun rafraîchissement n'a abouti.
+    """
+    global current
+    with _publish_lock:
+        # Continuer la numérotation des événements là où l'ancien fetcher l'a laissée
+        wallet_index.reseed(history.last_event_id())
+        if current.version and not current.stale:
+            snapshot = current.evolve({}, current.last_update, stale=True)
+            version_history.record(snapshot.version, snapshot.assets)
+            current = snapshot
+            node.publish(dumps_snapshot(
+                snapshot,
+                changed=[],
+                events=wallet_index.events_since(0),
+                status=fetcher_status(snapshot),
+            ), snapshot.version)
+            print(f"Snapshot v{snapshot.version} repris du store, marqué périmé")
+    start_fetcher()
+
+def start_cluster():
+    """Rejoint l'élection ; chaque worker gunicorn passe par ici à l'import"""
+    global node
+    node = ClusterNode(
+        open_store(SHARED_STORE, SHARED_DIR, REDIS_URL, SHARED_SECRET),
+        on_leader=start_leader,
+        on_snapshot=sync_snapshot,
+        on_message=on_cluster_message,
+        on_tick=on_cluster_tick,
+        poll_interval=SHARED_POLL,
+    )
+    node.start()
+    # Arrêt propre : l'export de ce processus quitte la somme tout de suite
+    atexit.register(node.drop_part, 'metrics', node.id)
+
+if SHARED_STORE:
+    start_cluster()
+
+if __name__ == '__main__':
+    print("Whale Tracker Pro - Demarrage...")
+    print("Actifs suivis:", ASSETS)
+    print("Top", TOP_WHALES, "whales par actif")
+    
+    if node is None:
+        # Démarrage à chaud : servir le dernier snapshot persisté (périmé) tout de suite
+        restored = load_snapshot(SNAPSHOT_PATH)
+        if restored is not None:
+            current = restored
+            version_history.record(restored.version, restored.assets)
+            liquidations.update(restored.assets, restored.version)
+            print(f"Snapshot v{restored.version} rechargé ({restored.last_update_label}), marqué périmé")
+        start_fetcher()
+    
+    print("")
+    print("Serveur pret!")
+    print("Ouvrez: http://localhost:5000")
+    print("")
+    
+    app.run(debug=False, host='0.0.0.0', port=5000)
+
@@ -0,0 +1,110 @@
+"""Fichiers statiques du tableau de bord : empreintes, cache immuable, sendfile
+
+Au démarrage, chaque fichier de `static/` reçoit une empreinte de contenu
+(dashboard.css -> dashboard.<sha256[:12]>.css). L'URL change dès que le
+contenu change, la réponse peut donc être gardée un an sans revalidation
+(Cache-Control: immutable). Les fichiers texte ont en plus une copie gzip
+préparée une fois ; les deux variantes partent par send_file, donc par
+sendfile(2) sous gunicorn.
+"""
+import gzip
+import hashlib
+import os
+
+from flask import send_file
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+MIMETYPES = {
+    '.css': 'text/css',
+    '.js': 'text/javascript',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.ico': 'image/x-icon',
+    '.woff2': 'font/woff2',
+    '.woff': 'font/woff',
+}
+COMPRESSIBLE = {'.css', '.js', '.svg'}
+
+class StaticAsset:
+    __slots__ = ('path', 'gzip_path', 'mimetype', 'digest')
+
+    def __init__(self, path, gzip_path, mimetype, digest):
+        self.path = path
+        self.gzip_path = gzip_path
+        self.mimetype = mimetype
+        self.digest = digest
+
+class StaticAssets:
+    """Manifeste nom logique -> nom avec empreinte, et service des fichiers"""
+
+    def __init__(self, directory, url_prefix='/assets', cache_dir=None):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.cache_dir = cache_dir or os.path.join(directory, '.cache')
+        self.manifest = {}  # 'dashboard.css' -> 'dashboard.<empreinte>.css'
+        self.files = {}  # nom avec empreinte -> StaticAsset
+        self._scan()
+        # Identifiant de l'ensemble : change si un seul fichier change
+        self.build_id = hashlib.sha256(''.join(sorted(self.manifest.values())).encode()).hexdigest()[:12]
+
+    def _scan(self):
+        for root, dirs, names in os.walk(self.directory):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in names:
+                base, ext = os.path.splitext(name)
+                if ext not in MIMETYPES:
+                    continue
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                logical = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                fingerprinted = f"{logical[:-len(name)]}{base}.{digest}{ext}"
+                gzip_path = self._compress(fingerprinted, content) if ext in COMPRESSIBLE else None
+                self.manifest[logical] = fingerprinted
+                self.files[fingerprinted] = StaticAsset(path, gzip_path, MIMETYPES[ext], digest)
+
+    def _compress(self, fingerprinted, content):
+        """Copie gzip préparée une fois (partagée entre workers), None si inutile"""
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) >= len(content):
+            return None
+        path = os.path.join(self.cache_dir, fingerprinted.replace('/', '_') + '.gz')
+        if not os.path.exists(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+        return path
+
+    def url(self, name):
+        """URL avec empreinte d'un fichier de static/, None s'il n'existe pas"""
+        fingerprinted = self.manifest.get(name)
+        return f"{self.url_prefix}/{fingerprinted}" if fingerprinted else None
+
+    def response(self, fingerprinted, request):
+        """Réponse Flask (sendfile) pour un nom avec empreinte, None si inconnu
+
+        Une ancienne empreinte n'est jamais servie avec le contenu actuel : le
+        cache immuable du client garderait sinon le mauvais fichier.
+        """
+        asset = self.files.get(fingerprinted)
+        if asset is None:
+            return None
+        use_gzip = asset.gzip_path is not None and 'gzip' in request.headers.get('Accept-Encoding', '')
+        response = send_file(
+            asset.gzip_path if use_gzip else asset.path,
+            mimetype=asset.mimetype,
+            download_name=os.path.basename(fingerprinted),
+            etag=asset.digest + ('-gz' if use_gzip else ''),
+            conditional=True,
+            max_age=IMMUTABLE_MAX_AGE,
+        )
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+        if asset.gzip_path is not None:
+            response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        return response
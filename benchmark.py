@@ -0,0 +1,284 @@
+"""Banc d'essai reproductible : rafraîchissement, routes HTTP, mémoire
+
+Chaque scénario (nombre d'actifs suivis) tourne dans un processus neuf qui
+importe app.py face au stub Hyperliquid local (hl_stub, servi par ce
+processus-ci : son coût CPU ne fausse pas les mesures de l'app). On mesure :
+
+    refresh   durée murale de update_all_data, premier cycle puis cycles chauds
+    routes    débit et latences (p50/p90/p99) de / et /api/data sous N clients
+              concurrents, via un serveur werkzeug multi-thread
+    memory    pic de RSS du processus de l'app (import, après refresh, fin)
+
+Les résultats partent en JSON ; --baseline compare à un run précédent :
+
+    python benchmark.py --assets 5 50 500 --output bench.json
+    python benchmark.py --latency 0.05 --throttle-rate 0.02 --baseline bench.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+import hl_stub
+
+DEFAULT_ASSETS = ['BTC', 'ETH', 'BNB', 'TAO', 'HYPE']
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (ru_maxrss : Ko sous Linux, octets sous macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def tracked_assets(fixtures, count):
+    """Les actifs par défaut de l'app, complétés par le reste de l'univers"""
+    names = [asset['name'] for asset in fixtures['metaAndAssetCtxs'][0]['universe']]
+    ordered = [name for name in DEFAULT_ASSETS if name in names]
+    ordered += [name for name in names if name not in ordered]
+    return ordered[:count]
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(ordered, 0.50)),
+        'p90_ms': ms(percentile(ordered, 0.90)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1] if ordered else None),
+    }
+
+def app_process(conn, config):
+    """Processus de l'app : importe app.py, chronomètre les refresh, sert HTTP"""
+    from werkzeug.serving import make_server
+
+    # Les messages de l'app ne doivent pas se mêler au JSON de la sortie standard
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix='whale-bench-')
+    os.environ.pop('SHARED_STORE', None)
+    os.environ.update(
+        ASSETS=','.join(config['asset_names']),
+        HYPERLIQUID_URL=config['url'],
+        CANDIDATE_WALLETS=str(config['wallets']),
+        UPSTREAM_WEIGHT_LIMIT=str(config['weight_limit']),
+        HISTORY_DB=os.path.join(workdir, 'history.db'),
+        SNAPSHOT_PATH=os.path.join(workdir, 'snapshot.pkl'),
+    )
+    try:
+        import app
+        memory = {'import_mb': peak_rss_mb()}
+
+        durations = []
+        for _ in range(config['refreshes']):
+            started = time.perf_counter()
+            app.update_all_data(source='benchmark')
+            durations.append(time.perf_counter() - started)
+        memory['refresh_mb'] = peak_rss_mb()
+
+        server = make_server('127.0.0.1', 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        conn.send({
+            'port': server.server_port,
+            'version': app.current.version,
+            'durations': durations,
+        })
+        conn.recv()  # le parent a fini ses mesures HTTP
+        memory['peak_mb'] = peak_rss_mb()
+        conn.send({'memory': memory})
+        server.shutdown()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def load_route(url, clients, duration):
+    """`clients` threads en boucle fermée sur `url` pendant `duration` secondes"""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        mine = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30)
+                response.content
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                mine.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+def run_scenario(assets, args, base_fixtures):
+    fixtures = hl_stub.scale_fixtures(base_fixtures, assets, args.wallets)
+    stub = hl_stub.make_server(fixtures=fixtures, latency=args.latency, jitter=args.jitter,
+                               error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                               seed=args.seed)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    names = tracked_assets(fixtures, assets)
+    tracked = set(names)
+    config = {
+        'asset_names': names,
+        'url': f'http://127.0.0.1:{stub.server_port}/info',
+        'wallets': args.wallets,
+        'weight_limit': args.weight_limit,
+        'refreshes': args.refreshes,
+    }
+
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=app_process, args=(child_conn, config), daemon=True)
+    process.start()
+    try:
+        ready = parent_conn.recv()
+        durations = ready['durations']
+        warm = sorted(durations[1:]) or durations
+        result = {
+            'assets': len(names),
+            'wallets': args.wallets,
+            'positions': sum(1 for state in fixtures['clearinghouseState'].values()
+                             for entry in state['assetPositions'] if entry['position']['coin'] in tracked),
+            'refresh': {
+                'first_s': round(durations[0], 4),
+                'warm_median_s': round(warm[len(warm) // 2], 4),
+                'warm_min_s': round(warm[0], 4),
+                'runs_s': [round(duration, 4) for duration in durations],
+                'version': ready['version'],
+            },
+            'routes': {},
+        }
+        base = f"http://127.0.0.1:{ready['port']}"
+        for route in args.routes:
+            load_route(base + route, 1, args.warmup)
+            result['routes'][route] = load_route(base + route, args.clients, args.duration)
+        parent_conn.send('done')
+        result['memory'] = parent_conn.recv()['memory']
+    finally:
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+        stub.shutdown()
+    result['upstream'] = {str(status): count for status, count in sorted(stub.counts.items())}
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(baseline, results):
+    """Lignes « métrique : avant -> après (écart) » pour les scénarios communs"""
+    def change(label, before, after):
+        if before is None or after is None:
+            return None
+        delta = f"{(after - before) / before * 100:+.1f} %" if before else 'n/a'
+        return f"  {label}: {before} -> {after} ({delta})"
+
+    key = lambda scenario: (scenario['assets'], scenario['wallets'])
+    previous = {key(scenario): scenario for scenario in baseline.get('scenarios', [])}
+    lines = []
+    for scenario in results['scenarios']:
+        old = previous.get(key(scenario))
+        if old is None:
+            continue
+        lines.append(f"{scenario['assets']} actifs, {scenario['wallets']} wallets")
+        rows = [
+            change('refresh warm_median_s', old['refresh']['warm_median_s'], scenario['refresh']['warm_median_s']),
+            change('refresh first_s', old['refresh']['first_s'], scenario['refresh']['first_s']),
+            change('memory peak_mb', old['memory'].get('peak_mb'), scenario['memory'].get('peak_mb')),
+        ]
+        for route, stats in scenario['routes'].items():
+            before = old['routes'].get(route)
+            if before:
+                rows.append(change(f'{route} rps', before['rps'], stats['rps']))
+                rows.append(change(f'{route} p99_ms', before['p99_ms'], stats['p99_ms']))
+        lines.extend(row for row in rows if row)
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--assets', type=int, nargs='+', default=[5, 50, 500], help="actifs suivis, un scénario par valeur")
+    parser.add_argument('--wallets', type=int, default=500, help="wallets candidats (CANDIDATE_WALLETS)")
+    parser.add_argument('--refreshes', type=int, default=3, help="cycles update_all_data par scénario")
+    parser.add_argument('--routes', nargs='+', default=['/', '/api/data'])
+    parser.add_argument('--clients', type=int, default=8, help="clients HTTP concurrents")
+    parser.add_argument('--duration', type=float, default=5.0, help="durée de mesure par route (s)")
+    parser.add_argument('--warmup', type=float, default=0.5, help="échauffement par route (s)")
+    parser.add_argument('--latency', type=float, default=0.0, help="latence du stub par réponse (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latence aléatoire en plus, 0 à JITTER (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="part des réponses du stub en 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="part des réponses du stub en 429")
+    parser.add_argument('--seed', type=int, default=0, help="graine des tirages du stub")
+    parser.add_argument('--weight-limit', type=float, default=1_000_000,
+                        help="UPSTREAM_WEIGHT_LIMIT de l'app (très haut : le budget ne limite pas la mesure)")
+    parser.add_argument('--output', help="fichier JSON (sortie standard sinon)")
+    parser.add_argument('--baseline', help="JSON d'un run précédent à comparer")
+    args = parser.parse_args()
+
+    base_fixtures = hl_stub.load_fixtures()
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': vars(args),
+        },
+        'scenarios': [],
+    }
+    for assets in args.assets:
+        print(f"Scénario {assets} actifs...", file=sys.stderr)
+        results['scenarios'].append(run_scenario(assets, args, base_fixtures))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Comparaison avec {args.baseline} ({baseline['meta'].get('revision')}):", file=sys.stderr)
+        for line in compare(baseline, results):
+            print(line, file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+"""Déploiement multi-processus : un fetcher élu, des workers sans état
+
+Chaque processus (worker gunicorn, autre machine) crée un ClusterNode. Un
+seul d'entre eux gagne l'élection et devient le fetcher : il fait tourner les
+rafraîchissements et publie chaque version dans le store partagé. Les autres
+ne parlent jamais à l'API amont : ils relisent le store dès que sa version
+change et servent ce snapshot. Si le fetcher meurt, son verrou se libère et
+un autre processus prend le relais.
+
+Ce qui doit être vu de tout le cluster passe aussi par le store :
+
+    messages      boîte aux lettres workers -> fetcher (demande d'un actif,
+                  rafraîchissement), vidée par le fetcher à chaque tour
+    entrées       valeurs nommées écrites par un seul processus (état des
+                  rafraîchissements publié par le fetcher), lues par tous
+    parts         une valeur par processus sous un même nom (métriques),
+                  que chacun peut relire en entier
+
+    store local   fichier d'en-tête mappé en mémoire (version, messages
+                  envoyés) + fichier de données remplacé atomiquement, lu
+                  via mmap ; élection par verrou fcntl sur un fichier
+    store Redis   clés version/snapshot, liste des messages, hachages des
+                  parts ; élection par SET NX à durée de vie renouvelée
+                  (nécessite le paquet `redis`, optionnel)
+
+Le snapshot n'est écrit que par le fetcher (même format que
+snapshot.save_snapshot, donc un pickle), le reste est du JSON : tout est
+signé par HMAC-SHA256 et rien n'est décodé sans une signature valide. La clé vient de
+SHARED_SECRET (obligatoire avec Redis) ou, pour le store local, d'un fichier
+`secret.key` créé au premier démarrage, lisible par l'utilisateur seul.
+"""
+import fcntl
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import secrets
+import struct
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+def sign(secret, payload):
+    """Signature HMAC-SHA256 suivie du contenu"""
+    return hmac.new(secret, payload, hashlib.sha256).digest() + payload
+
+def verify(secret, data):
+    """Contenu signé par `sign`, ou None si la signature ne correspond pas"""
+    view = memoryview(data)
+    tag, payload = view[:SIGNATURE_SIZE], view[SIGNATURE_SIZE:]
+    if not hmac.compare_digest(tag, hmac.new(secret, payload, hashlib.sha256).digest()):
+        return None
+    return payload
+
+def load_secret(directory):
+    """Clé du store local, créée une seule fois (les workers lisent la même)"""
+    path = os.path.join(directory, 'secret.key')
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_bytes(32))
+        try:
+            # Création atomique si absente : le premier processus arrivé fixe la clé
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+class FileLeaderLock:
+    """Verrou exclusif non bloquant sur un fichier, libéré par l'OS à la mort du processus"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        """True si ce processus détient (ou vient d'obtenir) le verrou"""
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+class RedisLeaderLock:
+    """Bail Redis : SET NX PX, renouvelé tant que le détenteur est vivant"""
+
+    # Renouvelle seulement si la clé nous appartient encore
+    RENEW = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    def __init__(self, client, key, ttl=15):
+        self.client = client
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = uuid.uuid4().hex
+        self._held = False
+        self._renew = client.register_script(self.RENEW)
+
+    def acquire(self):
+        if self._held:
+            self._held = bool(self._renew(keys=[self.key], args=[self.token, self.ttl_ms]))
+        else:
+            self._held = bool(self.client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        return self._held
+
+    def release(self):
+        if self._held:
+            if self.client.get(self.key) == self.token.encode():
+                self.client.delete(self.key)
+            self._held = False
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+class MmapSnapshotStore:
+    """Store local : en-tête mappé (compteurs) + fichier de données atomique"""
+
+    HEADER = struct.Struct('<QQ')  # version publiée, messages envoyés
+    LENGTH = struct.Struct('<I')  # préfixe de chaque message dans messages.bin
+
+    def __init__(self, directory, secret=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.secret = secret or load_secret(directory)
+        self.data_path = os.path.join(directory, 'snapshot.bin')
+        self.messages_path = os.path.join(directory, 'messages.bin')
+        self._received = None  # compteur de messages au dernier relevé
+        header_path = os.path.join(directory, 'header.bin')
+        self._header_fd = os.open(header_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._header_fd).st_size < self.HEADER.size:
+            os.ftruncate(self._header_fd, self.HEADER.size)
+        self._header = mmap.mmap(self._header_fd, self.HEADER.size)
+
+    def leader_lock(self):
+        return FileLeaderLock(os.path.join(self.directory, 'leader.lock'))
+
+    def version(self):
+        """Version publiée : simple lecture mémoire, sans appel système"""
+        return self.HEADER.unpack_from(self._header)[0]
+
+    def publish(self, payload, version):
+        _write_atomic(self.data_path, payload)
+        # La version n'est annoncée qu'une fois le fichier en place
+        with self._locked_header():
+            self.HEADER.pack_into(self._header, 0, version, self.HEADER.unpack_from(self._header)[1])
+
+    def load(self):
+        """Contenu publié (bytes), ou None si rien n'a encore été publié"""
+        try:
+            with open(self.data_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return data[:]
+        except FileNotFoundError:
+            return None
+
+    def send(self, message):
+        """Ajoute un message pour le fetcher"""
+        with self._locked_header():
+            with open(self.messages_path, 'ab') as f:
+                f.write(self.LENGTH.pack(len(message)) + message)
+            version, sent = self.HEADER.unpack_from(self._header)
+            self.HEADER.pack_into(self._header, 0, version, sent + 1)
+
+    def receive(self):
+        """Vide la boîte aux lettres ; sans verrou ni lecture si rien n'a été envoyé"""
+        sent = self.HEADER.unpack_from(self._header)[1]
+        if sent == self._received:
+            return []
+        with self._locked_header():
+            self._received = self.HEADER.unpack_from(self._header)[1]
+            data = _read(self.messages_path) or b''
+            if data:
+                os.truncate(self.messages_path, 0)
+        messages, offset = [], 0
+        while offset + self.LENGTH.size <= len(data):
+            size, = self.LENGTH.unpack_from(data, offset)
+            offset += self.LENGTH.size
+            messages.append(data[offset:offset + size])
+            offset += size
+        return messages
+
+    def put(self, name, value):
+        _write_atomic(os.path.join(self.directory, f'{name}.bin'), value)
+
+    def get(self, name):
+        return _read(os.path.join(self.directory, f'{name}.bin'))
+
+    def put_part(self, name, member, value):
+        directory = os.path.join(self.directory, name)
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(os.path.join(directory, f'{member}.bin'), value)
+
+    def parts(self, name):
+        directory = os.path.join(self.directory, name)
+        try:
+            files = [file for file in os.listdir(directory) if file.endswith('.bin')]
+        except FileNotFoundError:
+            return {}
+        parts = {}
+        for file in files:
+            value = _read(os.path.join(directory, file))
+            if value is not None:
+                parts[file[:-len('.bin')]] = value
+        return parts
+
+    def drop_part(self, name, member):
+        try:
+            os.unlink(os.path.join(self.directory, name, f'{member}.bin'))
+        except FileNotFoundError:
+            pass
+
+    def _locked_header(self):
+        return _FlockContext(self._header_fd)
+
+class _FlockContext:
+    def __init__(self, fd):
+        self.fd = fd
+
+    def __enter__(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+class RedisSnapshotStore:
+    """Store partagé entre machines"""
+
+    def __init__(self, url, secret, prefix='whale'):
+        self.client = redis.Redis.from_url(url)
+        self.secret = secret
+        self.prefix = prefix
+
+    def leader_lock(self):
+        return RedisLeaderLock(self.client, f'{self.prefix}:leader')
+
+    def version(self):
+        return int(self.client.get(f'{self.prefix}:version') or 0)
+
+    def publish(self, payload, version):
+        pipe = self.client.pipeline()
+        pipe.set(f'{self.prefix}:snapshot', payload)
+        pipe.set(f'{self.prefix}:version', version)
+        pipe.execute()
+
+    def load(self):
+        return self.client.get(f'{self.prefix}:snapshot')
+
+    def send(self, message):
+        self.client.rpush(f'{self.prefix}:messages', message)
+
+    def receive(self):
+        # Lecture et suppression dans une même transaction : aucun message perdu
+        pipe = self.client.pipeline()
+        pipe.lrange(f'{self.prefix}:messages', 0, -1)
+        pipe.delete(f'{self.prefix}:messages')
+        messages, _ = pipe.execute()
+        return messages
+
+    def put(self, name, value):
+        self.client.set(f'{self.prefix}:{name}', value)
+
+    def get(self, name):
+        return self.client.get(f'{self.prefix}:{name}')
+
+    def put_part(self, name, member, value):
+        self.client.hset(f'{self.prefix}:{name}', member, value)
+
+    def parts(self, name):
+        return {member.decode(): value for member, value in self.client.hgetall(f'{self.prefix}:{name}').items()}
+
+    def drop_part(self, name, member):
+        self.client.hdel(f'{self.prefix}:{name}', member)
+
+def open_store(kind, directory, redis_url=None, secret=None):
+    """Store partagé selon SHARED_STORE : 'redis' si disponible, sinon fichier local
+
+    `secret` (bytes) : clé HMAC partagée, obligatoire avec Redis.
+    """
+    if kind == 'redis':
+        if redis is not None and redis_url and secret:
+            return RedisSnapshotStore(redis_url, secret)
+        print("Redis indisponible (paquet `redis`, REDIS_URL ou SHARED_SECRET manquant) : store fichier local")
+    return MmapSnapshotStore(directory, secret)
+
+class ClusterNode:
+    """Élection et synchronisation pour un processus
+
+    `on_leader()` est appelé une fois l'élection gagnée, `on_snapshot(bytes)`
+    quand un follower voit une nouvelle version correctement signée,
+    `on_message(dict)` pour chaque message reçu par le leader (voir send),
+    `on_tick()` à chaque tour de boucle, leader ou non.
+    """
+
+    def __init__(self, store, on_leader, on_snapshot, on_message, on_tick=None, poll_interval=0.5):
+        self.store = store
+        self.lock = store.leader_lock()
+        self.on_leader = on_leader
+        self.on_snapshot = on_snapshot
+        self.on_message = on_message
+        self.on_tick = on_tick
+        self.poll_interval = poll_interval
+        self.leader = False
+        self.id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'  # nom de la part de ce processus
+        self._seen_version = None
+
+    def start(self):
+        # Rattraper la dernière version publiée avant de se porter candidat
+        self._sync()
+        threading.Thread(target=self._loop, name='cluster', daemon=True).start()
+
+    def publish(self, payload, version):
+        self.store.publish(sign(self.store.secret, payload), version)
+        self._seen_version = version
+
+    def send(self, message):
+        """Transmet un message (dict JSON) au leader, traité à son prochain tour"""
+        self.store.send(self._encode(message))
+
+    def put(self, name, value):
+        self.store.put(name, self._encode(value))
+
+    def get(self, name):
+        return self._decode(self.store.get(name))
+
+    def put_part(self, name, value):
+        """Valeur de ce processus sous `name` (une par processus)"""
+        self.store.put_part(name, self.id, self._encode(value))
+
+    def parts(self, name):
+        """{processus: valeur} de tous les processus, signatures vérifiées"""
+        parts = {}
+        for member, data in self.store.parts(name).items():
+            value = self._decode(data)
+            if value is not None:
+                parts[member] = value
+        return parts
+
+    def drop_part(self, name, member):
+        self.store.drop_part(name, member)
+
+    def _encode(self, value):
+        return sign(self.store.secret, json.dumps(value, separators=(',', ':')).encode())
+
+    def _decode(self, data):
+        if data is None:
+            return None
+        payload = verify(self.store.secret, data)
+        if payload is None:
+            print("Entrée du store ignorée : signature invalide")
+            return None
+        return json.loads(bytes(payload))
+
+    def _loop(self):
+        while True:
+            try:
+                self._step()
+            except Exception as e:
+                print(f"Erreur de synchronisation du cluster: {e}")
+            time.sleep(self.poll_interval)
+
+    def _step(self):
+        if self.leader:
+            if not self.lock.acquire():
+                # Bail perdu (Redis injoignable trop longtemps) : on ne publie plus
+                print("Leadership perdu, arrêt des rafraîchissements")
+                os._exit(1)
+            self._receive()
+        else:
+            self._sync()
+            if self.lock.acquire():
+                self.leader = True
+                print(f"Processus {os.getpid()} élu fetcher")
+                self.on_leader()
+                # Messages envoyés pendant l'élection : traités dès maintenant
+                self._receive()
+        if self.on_tick is not None:
+            self.on_tick()
+
+    def _receive(self):
+        for data in self.store.receive():
+            message = self._decode(data)
+            if message is None:
+                continue
+            try:
+                self.on_message(message)
+            except Exception as e:
+                print(f"Message du cluster non traité ({message.get('type')}): {e}")
+
+    def _sync(self):
+        version = self.store.version()
+        if version != self._seen_version:
+            data = self.store.load()
+            if data is not None:
+                payload = verify(self.store.secret, data)
+                if payload is None:
+                    print(f"Snapshot v{version} du store ignoré : signature invalide")
+                else:
+                    self.on_snapshot(payload)
+            self._seen_version = version
@@ -0,0 +1,79 @@
+"""Différences entre versions de données pour /api/data?since=<version>
+
+Les whales sont comparées ligne à ligne par adresse : un client qui connaît
+déjà une version récente ne reçoit que les actifs et les lignes qui ont bougé.
+"""
+import threading
+from collections import deque
+
+from positions import as_rows
+
+# Champs résumés d'un actif (tout sauf la liste des whales)
+SUMMARY_FIELDS = (
+    'long_count', 'short_count', 'long_ratio', 'short_ratio',
+    'total_long_size', 'total_short_size', 'ratios', 'weighting', 'net_exposure', 'net_exposure_ratio', 'pnl_skew',
+    'sentiment', 'sentiment_class', 'emoji', 'mark_price', 'max_leverage', 'scanned',
+)
+
+def diff_whales(old_whales, new_whales):
+    """Whales ajoutées, retirées (adresses) et modifiées, indexées par adresse"""
+    old = {whale['address']: whale for whale in as_rows(old_whales)}
+    new = {whale['address']: whale for whale in as_rows(new_whales)}
+    return {
+        'added': [whale for address, whale in new.items() if address not in old],
+        'removed': [address for address in old if address not in new],
+        'updated': [whale for address, whale in new.items()
+                    if address in old and old[address] != whale],
+    }
+
+def diff_asset(old, new):
+    """Changements d'un actif, ou None s'il est identique"""
+    if old is None:
+        # Actif nouveau pour le client : tous les champs, même ceux qui valent None
+        old = {'whales': []}
+        fields = {key: new[key] for key in SUMMARY_FIELDS if key in new}
+    else:
+        fields = {key: new[key] for key in SUMMARY_FIELDS if old.get(key) != new.get(key)}
+    whales = diff_whales(old['whales'], new['whales'])
+    if not fields and not any(whales.values()):
+        return None
+    return {'fields': fields, 'whales': whales}
+
+def diff_data(old_data, new_data):
+    """Changements entre deux états complets {actif: données}"""
+    changes = {}
+    for asset, data in new_data.items():
+        if old_data.get(asset) is data:
+            continue
+        change = diff_asset(old_data.get(asset), data)
+        if change is not None:
+            changes[asset] = change
+    removed = [asset for asset in old_data if asset not in new_data]
+    return {'changes': changes, 'removed': removed}
+
+class VersionHistory:
+    """Tampon circulaire borné des dernières versions publiées
+
+    Chaque entrée garde une référence aux actifs d'un snapshot publié, qui
+    ne sont plus jamais modifiés : aucune copie n'est nécessaire.
+    """
+
+    def __init__(self, maxlen=12):
+        self._versions = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, version, data):
+        with self._lock:
+            self._versions.append((version, data))
+
+    def get(self, version):
+        """Données de `version`, ou None si elle est sortie du tampon"""
+        with self._lock:
+            for known, data in self._versions:
+                if known == version:
+                    return data
+        return None
+
+    def oldest(self):
+        with self._lock:
+            return self._versions[0][0] if self._versions else None
@@ -0,0 +1,186 @@
+"""Budget de requêtes amont : poids par endpoint, file à priorités, AIMD
+
+L'API info de Hyperliquid limite chaque IP en poids par minute (1200), pas en
+nombre de requêtes. Toutes les requêtes du client passent par un seul seau à
+jetons exprimé en poids :
+
+    poids        INFO_WEIGHTS par type de requête, DEFAULT_WEIGHT sinon
+    priorités    INTERACTIVE (rafraîchissement manuel, démarrage) passe avant
+                 HOT (actifs chauds) qui passe avant BACKGROUND (balayage
+                 planifié) ; à priorité égale, premier arrivé premier servi.
+                 Une `Priority` partagée par les requêtes d'un même travail
+                 peut être relevée en cours de route (raise_priority), y
+                 compris pour les requêtes déjà en file
+    AIMD         un 429 divise le débit par deux et vide la réserve (une fois
+                 par `cooldown` : les requêtes déjà en vol ne comptent pas
+                 double) ; chaque succès le remonte d'un pas, jusqu'à la limite
+
+Le débit reste ainsi juste sous la limite au lieu d'être freiné par des
+pauses fixes.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+from ratelimit import TokenBucket
+
+# Poids documentés de l'API info ; les autres types pèsent DEFAULT_WEIGHT
+INFO_WEIGHTS = {
+    'clearinghouseState': 2,
+    'spotClearinghouseState': 2,
+    'l2Book': 2,
+    'allMids': 2,
+    'orderStatus': 2,
+    'exchangeStatus': 2,
+    'userRole': 60,
+}
+DEFAULT_WEIGHT = 20
+
+INTERACTIVE = 0
+HOT = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', HOT: 'hot', BACKGROUND: 'background'}
+
+def request_weight(kind):
+    return INFO_WEIGHTS.get(kind, DEFAULT_WEIGHT)
+
+class Priority:
+    """Priorité mutable d'un travail, passée à la place d'un niveau fixe"""
+
+    def __init__(self, level):
+        self.level = level
+
+    def __repr__(self):
+        return f'Priority({PRIORITY_NAMES.get(self.level, self.level)})'
+
+def priority_level(priority):
+    return priority.level if isinstance(priority, Priority) else priority
+
+class RequestGovernor:
+    """Seau à jetons partagé, servi par ordre de priorité
+
+    `limit` : poids par minute visé ; `burst` : réserve maximale (poids).
+    """
+
+    def __init__(self, limit, burst=None, min_fraction=0.1, recovery=0.01, cooldown=2.0, window=60):
+        self.limit = limit
+        self.min_rate = limit * min_fraction
+        self.recovery = limit * recovery  # pas de remontée par succès (poids/min)
+        self.cooldown = cooldown
+        self.window = window
+        self._decreased_at = float('-inf')
+        self.bucket = TokenBucket(limit / 60, burst or limit / 2)
+        self._rate = limit  # débit courant, poids/min
+        self._waiting = []  # [niveau, ordre d'arrivée, Priority ou None]
+        self._order = itertools.count()
+        self._granted = deque()  # (instant, poids) sur la fenêtre glissante
+        self._cond = threading.Condition()
+        self.granted_total = 0
+        self.weight_total = 0
+        self.throttled_total = 0
+        self.timeouts_total = 0
+        self.wait_total = 0.0
+
+    def acquire(self, weight, priority=BACKGROUND, deadline=None):
+        """Attend son tour et les jetons ; False si l'échéance arrive avant
+
+        `priority` : niveau (INTERACTIVE, HOT, BACKGROUND) ou `Priority`.
+        """
+        weight = min(weight, self.bucket.capacity)
+        holder = priority if isinstance(priority, Priority) else None
+        started = time.monotonic()
+        with self._cond:
+            ticket = [priority_level(priority), next(self._order), holder]
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    wait = None
+                    # Seul le premier de la file peut prendre des jetons
+                    if self._waiting[0] is ticket:
+                        wait = self.bucket.try_acquire(weight)
+                        if not wait:
+                            break
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timeouts_total += 1
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                if self._waiting[0] is ticket:
+                    heapq.heappop(self._waiting)
+                else:
+                    self._waiting = [waiting for waiting in self._waiting if waiting is not ticket]
+                    heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+            now = time.monotonic()
+            self._granted.append((now, weight))
+            self._prune(now)
+            self.granted_total += 1
+            self.weight_total += weight
+            self.wait_total += now - started
+        return True
+
+    def raise_priority(self, priority, level):
+        """Relève `priority` à `level` s'il est plus urgent, file d'attente comprise"""
+        with self._cond:
+            if level >= priority.level:
+                return
+            priority.level = level
+            for ticket in self._waiting:
+                if ticket[2] is priority:
+                    ticket[0] = level
+            heapq.heapify(self._waiting)
+            self._cond.notify_all()
+
+    def throttled(self):
+        """429 reçu : diminution multiplicative du débit"""
+        with self._cond:
+            self.throttled_total += 1
+            now = time.monotonic()
+            if now - self._decreased_at < self.cooldown:
+                return
+            self._decreased_at = now
+            self._set_rate(max(self.min_rate, self._rate / 2))
+            self.bucket.drain()
+
+    def succeeded(self):
+        """Réponse acceptée : augmentation additive du débit"""
+        with self._cond:
+            if self._rate < self.limit:
+                self._set_rate(min(self.limit, self._rate + self.recovery))
+
+    def _set_rate(self, rate):
+        self._rate = rate
+        self.bucket.set_rate(rate / 60)
+        self._cond.notify_all()
+
+    def _prune(self, now):
+        while self._granted and self._granted[0][0] < now - self.window:
+            self._granted.popleft()
+
+    def stats(self):
+        """Utilisation du budget pour /api/upstream"""
+        with self._cond:
+            self._prune(time.monotonic())
+            used = sum(weight for _, weight in self._granted)
+            queued = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _ in self._waiting:
+                queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            return {
+                'limit_per_min': self.limit,
+                'rate_per_min': round(self._rate, 1),
+                'used_last_min': used * 60 / self.window,
+                'utilisation': round(used * 60 / self.window / self.limit, 3),
+                'tokens': round(max(0.0, self.bucket.tokens), 1),
+                'queued': queued,
+                'granted_total': self.granted_total,
+                'weight_total': self.weight_total,
+                'throttled_total': self.throttled_total,
+                'timeouts_total': self.timeouts_total,
+                'mean_wait': round(self.wait_total / self.granted_total, 4) if self.granted_total else 0.0,
+            }
@@ -0,0 +1,41 @@
+"""Configuration gunicorn du mode production
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Le store partagé (voir cluster.py) est toujours actif sous gunicorn : un
+seul processus interroge l'API, les autres servent ses snapshots. Avec un
+seul worker, c'est lui qui est élu fetcher (démarrage à chaud compris).
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count(), 8)))
+threads = int(os.environ.get('WEB_THREADS', 8))  # par worker gthread
+try:
+    import gevent  # noqa: F401
+    DEFAULT_WORKER_CLASS = 'gevent'
+except ImportError:
+    DEFAULT_WORKER_CLASS = 'gthread'
+# gevent par défaut (requirements.txt) : un flux SSE ouvert n'y coûte qu'une greenlet
+worker_class = os.environ.get('WORKER_CLASS', DEFAULT_WORKER_CLASS)
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))  # gevent uniquement
+keepalive = 5
+timeout = 60
+graceful_timeout = 30
+sendfile = True  # fichiers statiques (send_file) envoyés par le noyau
+accesslog = os.environ.get('ACCESS_LOG')  # ex. '-' pour stdout
+
+# Chaque worker importe l'application lui-même : élection et threads par processus
+preload_app = False
+# Sans store, seul `python app.py` lancerait le fetcher : même à un worker, rien ne serait récupéré
+os.environ.setdefault('SHARED_STORE', 'file')
+
+# Abonnés SSE par worker (STREAM_MAX_CLIENTS) : chacun garde sa connexion ouverte.
+# Sous gthread il occupe un thread : la moitié des threads par défaut, jamais tous,
+# pour que les autres requêtes passent toujours ; les abonnés refusés (503) passent au polling.
+if worker_class == 'gthread':
+    stream_clients = int(os.environ.get('STREAM_MAX_CLIENTS', threads // 2))
+    os.environ['STREAM_MAX_CLIENTS'] = str(max(min(stream_clients, threads - 1), 0))
+else:
+    os.environ.setdefault('STREAM_MAX_CLIENTS', str(worker_connections * 9 // 10))
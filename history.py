@@ -0,0 +1,380 @@
+"""Historique persistant des snapshots (SQLite en mode WAL)
+
+Chaque rafraîchissement ajoute une ligne par actif (ratios, comptes, tailles)
+et une ligne par position de whale. Les écritures passent par un thread
+dédié qui regroupe tout ce qui est en attente dans une seule transaction :
+le cycle de rafraîchissement ne fait qu'empiler dans une file.
+
+Des tables de rollup (1m, 5m, 1h, 1j) sont mises à jour dans la même
+transaction, par UPSERT : une requête sur 30 jours lit des buckets déjà
+agrégés au lieu de parcourir les lignes brutes.
+
+Rétention : les lignes brutes sont gardées `raw_days` jours, puis les
+résumés d'actifs sont sous-échantillonnés à l'heure et les positions
+réduites à un échantillon par heure et par adresse ; au-delà de
+`retention_days` tout est supprimé.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+from positions import format_address
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS asset_history (
+    ts INTEGER NOT NULL,
+    asset TEXT NOT NULL,
+    version INTEGER,
+    resolution INTEGER NOT NULL DEFAULT 0,
+    long_count REAL,
+    short_count REAL,
+    long_ratio REAL,
+    short_ratio REAL,
+    total_long_size REAL,
+    total_short_size REAL,
+    sentiment_class TEXT
+);
+CREATE INDEX IF NOT EXISTS asset_history_asset_ts ON asset_history (asset, ts);
+
+CREATE TABLE IF NOT EXISTS position_history (
+    ts INTEGER NOT NULL,
+    asset TEXT NOT NULL,
+    address BLOB NOT NULL,
+    rank INTEGER,
+    is_long INTEGER,
+    size REAL,
+    leverage INTEGER,
+    pnl REAL,
+    entry_price REAL
+);
+CREATE INDEX IF NOT EXISTS position_history_asset_ts ON position_history (asset, ts);
+CREATE INDEX IF NOT EXISTS position_history_address_ts ON position_history (address, ts);
+
+CREATE TABLE IF NOT EXISTS asset_rollup (
+    asset TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    open_ts INTEGER NOT NULL,
+    close_ts INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    leverage_sum REAL,
+    pnl_sum REAL,
+    long_size_sum REAL,
+    short_size_sum REAL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (asset, resolution, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS wallets (
+    address BLOB PRIMARY KEY,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS wallet_events (
+    id INTEGER PRIMARY KEY,
+    ts INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    address BLOB NOT NULL,
+    rank INTEGER,
+    side TEXT
+);
+CREATE INDEX IF NOT EXISTS wallet_events_address_ts ON wallet_events (address, ts);
+"""
+
+# Largeurs de bucket maintenues à l'écriture (s)
+ROLLUP_RESOLUTIONS = (60, 300, 3600, 86400)
+# Les rollups fins sont purgés avec les données ; 1h et 1j sont gardés
+SHORT_ROLLUPS = (60, 300)
+
+# OHLC du long_ratio, sommes pour les moyennes ; les anciennes valeurs de la
+# ligne sont utilisées à droite de chaque SET
+ROLLUP_UPSERT = """
+INSERT INTO asset_rollup (asset, resolution, bucket, open_ts, close_ts, open, high, low, close,
+                          leverage_sum, pnl_sum, long_size_sum, short_size_sum, samples)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+ON CONFLICT (asset, resolution, bucket) DO UPDATE SET
+    open = CASE WHEN excluded.open_ts < open_ts THEN excluded.open ELSE open END,
+    open_ts = MIN(open_ts, excluded.open_ts),
+    close = CASE WHEN excluded.close_ts >= close_ts THEN excluded.close ELSE close END,
+    close_ts = MAX(close_ts, excluded.close_ts),
+    high = MAX(high, excluded.high),
+    low = MIN(low, excluded.low),
+    leverage_sum = leverage_sum + excluded.leverage_sum,
+    pnl_sum = pnl_sum + excluded.pnl_sum,
+    long_size_sum = long_size_sum + excluded.long_size_sum,
+    short_size_sum = short_size_sum + excluded.short_size_sum,
+    samples = samples + 1
+"""
+
+ASSET_COLUMNS = ('long_count', 'short_count', 'long_ratio', 'short_ratio',
+                 'total_long_size', 'total_short_size')
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    # En WAL, NORMAL reste cohérent après un crash et évite un fsync par commit
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+class HistoryStore:
+    """Historique append-only, écrit par lots depuis un thread dédié"""
+
+    def __init__(self, path, raw_days=7, retention_days=90, maintenance_interval=3600):
+        self.path = path
+        self.raw_days = raw_days
+        self.retention_days = retention_days
+        self.maintenance_interval = maintenance_interval
+        self._queue = queue.Queue()
+        self._writer = None
+        self._start_lock = threading.Lock()
+        self._local = threading.local()
+        with connect(path) as connection:
+            connection.executescript(SCHEMA)
+
+    # Écriture
+
+    def record(self, timestamp, version, assets):
+        """Empile un snapshot {actif: données} ; l'écriture est asynchrone"""
+        self._ensure_writer()
+        self._queue.put(('snapshot', int(timestamp), version, assets))
+
+    def record_wallets(self, wallets, events):
+        """Empile les wallets touchés (first/last seen) et les nouveaux événements"""
+        self._ensure_writer()
+        rows = [(w.address, w.first_seen, w.last_seen) for w in wallets]
+        self._queue.put(('wallets', rows, events))
+
+    def flush(self):
+        """Attend que tout ce qui a été empilé soit écrit"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _ensure_writer(self):
+        with self._start_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        last_maintenance = time.monotonic()
+        while True:
+            # Regrouper tout ce qui attend dans la même transaction
+            batch = []
+            taken = 0
+            stop = False
+            try:
+                item = self._queue.get(timeout=self.maintenance_interval)
+                taken = 1
+            except queue.Empty:
+                item = ()
+            while item != ():
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                try:
+                    item = self._queue.get_nowait()
+                    taken += 1
+                except queue.Empty:
+                    item = ()
+
+            try:
+                if batch:
+                    self._write_batch(connection, batch)
+                if time.monotonic() - last_maintenance >= self.maintenance_interval:
+                    self.maintain(connection)
+                    last_maintenance = time.monotonic()
+            except sqlite3.Error as e:
+                print(f"Erreur d'écriture de l'historique: {e}")
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+            if stop:
+                connection.close()
+                return
+
+    def _write_batch(self, connection, batch):
+        asset_rows = []
+        position_rows = []
+        rollup_rows = []
+        wallet_rows = []
+        event_rows = []
+        for kind, *item in batch:
+            if kind == 'wallets':
+                rows, events = item
+                wallet_rows.extend(rows)
+                event_rows.extend(
+                    (e['id'], e['ts'], e['type'], e['asset'], bytes.fromhex(e['address'][2:]), e['rank'], e['side'])
+                    for e in events)
+                continue
+            ts, version, assets = item
+            for asset, data in assets.items():
+                asset_rows.append((ts, asset, version, *(data[c] for c in ASSET_COLUMNS), data['sentiment_class']))
+                table = data['whales']
+                ratio = data['long_ratio']
+                leverage = float(table.leverage.mean()) if len(table) else 0.0
+                pnl = float(table.pnl.sum())
+                rollup_rows.extend(
+                    (asset, resolution, ts - ts % resolution, ts, ts, ratio, ratio, ratio, ratio,
+                     leverage, pnl, data['total_long_size'], data['total_short_size'])
+                    for resolution in ROLLUP_RESOLUTIONS
+                )
+                addresses = [table.address(i) for i in range(len(table))]
+                position_rows.extend(
+                    (ts, asset, address, rank, is_long, size, leverage, pnl, entry_price)
+                    for rank, (address, is_long, size, leverage, pnl, entry_price) in enumerate(zip(
+                        addresses, table.is_long.tolist(), table.size.tolist(),
+                        table.leverage.tolist(), table.pnl.tolist(), table.entry_price.tolist()), 1)
+                )
+        with connection:
+            connection.executemany(
+                'INSERT INTO asset_history (ts, asset, version, long_count, short_count, long_ratio, '
+                'short_ratio, total_long_size, total_short_size, sentiment_class) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', asset_rows)
+            connection.executemany(
+                'INSERT INTO position_history (ts, asset, address, rank, is_long, size, leverage, pnl, entry_price) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', position_rows)
+            connection.executemany(ROLLUP_UPSERT, rollup_rows)
+            connection.executemany(
+                'INSERT INTO wallets (address, first_seen, last_seen) VALUES (?, ?, ?) '
+                'ON CONFLICT (address) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)',
+                wallet_rows)
+            connection.executemany(
+                'INSERT OR REPLACE INTO wallet_events (id, ts, type, asset, address, rank, side) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', event_rows)
+
+    def maintain(self, connection):
+        """Sous-échantillonnage des lignes anciennes puis purge"""
+        now = int(time.time())
+        raw_cutoff = now - self.raw_days * 86400
+        # Heure entière : on ne coupe jamais un bucket en deux
+        raw_cutoff -= raw_cutoff % 3600
+        expiry = now - self.retention_days * 86400
+        columns = ', '.join(ASSET_COLUMNS)
+        averages = ', '.join(f'AVG({c})' for c in ASSET_COLUMNS)
+        with connection:
+            connection.execute(
+                f'INSERT INTO asset_history (ts, asset, version, resolution, {columns}, sentiment_class) '
+                f'SELECT ts / 3600 * 3600, asset, MAX(version), 3600, {averages}, NULL '
+                'FROM asset_history WHERE resolution = 0 AND ts < ? GROUP BY asset, ts / 3600',
+                (raw_cutoff,))
+            connection.execute('DELETE FROM asset_history WHERE resolution = 0 AND ts < ?', (raw_cutoff,))
+            connection.execute(
+                'DELETE FROM position_history WHERE ts < ? AND rowid NOT IN ('
+                'SELECT MIN(rowid) FROM position_history WHERE ts < ? '
+                'GROUP BY asset, address, ts / 3600)', (raw_cutoff, raw_cutoff))
+            connection.execute('DELETE FROM asset_history WHERE ts < ?', (expiry,))
+            connection.execute('DELETE FROM position_history WHERE ts < ?', (expiry,))
+            connection.execute('DELETE FROM wallet_events WHERE ts < ?', (expiry,))
+            connection.execute(
+                f'DELETE FROM asset_rollup WHERE resolution IN ({", ".join("?" * len(SHORT_ROLLUPS))}) AND bucket < ?',
+                (*SHORT_ROLLUPS, expiry))
+
+    # Lecture (une connexion par thread, le WAL n'y bloque pas les écritures)
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path)
+        return connection
+
+    def asset_range(self, asset, start, end):
+        """Résumés d'un actif entre deux timestamps (index asset, ts)"""
+        rows = self._reader().execute(
+            'SELECT * FROM asset_history WHERE asset = ? AND ts BETWEEN ? AND ? ORDER BY ts',
+            (asset, int(start), int(end)))
+        return [dict(row) for row in rows]
+
+    def address_range(self, address, start, end):
+        """Positions d'une adresse (20 octets) entre deux timestamps (index address, ts)"""
+        rows = self._reader().execute(
+            'SELECT * FROM position_history WHERE address = ? AND ts BETWEEN ? AND ? ORDER BY ts',
+            (address, int(start), int(end)))
+        return [dict(row) for row in rows]
+
+    def last_event_id(self):
+        """Plus grand identifiant d'événement enregistré (0 si aucun)"""
+        return self._reader().execute('SELECT MAX(id) FROM wallet_events').fetchone()[0] or 0
+
+    def load_wallets(self, event_limit=1000):
+        """(adresse, first_seen, last_seen) de tous les wallets et derniers événements"""
+        connection = self._reader()
+        wallets = [tuple(row) for row in connection.execute('SELECT address, first_seen, last_seen FROM wallets')]
+        rows = connection.execute(
+            'SELECT * FROM wallet_events ORDER BY id DESC LIMIT ?', (event_limit,)).fetchall()
+        events = [
+            {
+                'id': row['id'], 'type': row['type'], 'ts': row['ts'], 'asset': row['asset'],
+                'address': '0x' + row['address'].hex(), 'short_address': format_address(row['address']),
+                'rank': row['rank'], 'side': row['side'],
+            }
+            for row in reversed(rows)
+        ]
+        return wallets, events
+
+    def rollup_range(self, asset, resolution, start, end):
+        """Buckets agrégés d'un actif entre deux timestamps, en colonnes
+
+        Lecture directe si `resolution` est maintenue à l'écriture, sinon
+        réagrégation du plus grand rollup qui la divise (ex. 15m depuis 5m).
+        Renvoie {colonne: [valeurs]} : bien plus léger à sérialiser qu'une
+        liste de dicts sur des dizaines de milliers de buckets. Le PnL est
+        rendu en moyenne par snapshot (`mean_pnl`), pas en somme : voir
+        api_history.
+        """
+        base = max((r for r in ROLLUP_RESOLUTIONS if resolution % r == 0), default=None)
+        if base is None:
+            raise ValueError(f"résolution non multiple de {ROLLUP_RESOLUTIONS[0]}s")
+        start = int(start) - int(start) % resolution
+        cursor = self._reader().cursor()
+        cursor.row_factory = None  # tuples bruts, pas de sqlite3.Row
+        rows = cursor.execute(
+            'SELECT bucket - bucket % ?, open, high, low, close, leverage_sum, pnl_sum, '
+            'long_size_sum, short_size_sum, samples FROM asset_rollup '
+            'WHERE asset = ? AND resolution = ? AND bucket BETWEEN ? AND ? ORDER BY bucket',
+            (resolution, asset, base, start, int(end))).fetchall()
+
+        if base != resolution:
+            rows = merge_buckets(rows)
+        columns = list(zip(*rows)) or [()] * 10
+        t, open_, high, low, close, leverage, pnl, long_size, short_size, samples = columns
+        return {
+            't': list(t),
+            'long_ratio_open': list(open_),
+            'long_ratio_high': list(high),
+            'long_ratio_low': list(low),
+            'long_ratio_close': list(close),
+            'mean_leverage': [value / n for value, n in zip(leverage, samples)],
+            # Et non 'pnl' (somme sur le bucket) : la somme brute croîtrait avec la fréquence des rafraîchissements
+            'mean_pnl': [value / n for value, n in zip(pnl, samples)],
+            'mean_long_size': [value / n for value, n in zip(long_size, samples)],
+            'mean_short_size': [value / n for value, n in zip(short_size, samples)],
+            'samples': list(samples),
+        }
+
+def merge_buckets(rows):
+    """Fusionne des buckets triés qui partagent le même début (1re colonne)"""
+    merged = []
+    for row in rows:
+        if merged and merged[-1][0] == row[0]:
+            t, open_, high, low, _, *sums = merged[-1]
+            merged[-1] = (t, open_, max(high, row[2]), min(low, row[3]), row[4],
+                          *(a + b for a, b in zip(sums, row[5:])))
+        else:
+            merged.append(row)
+    return merged
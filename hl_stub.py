@@ -0,0 +1,197 @@
+"""Serveur local qui rejoue des réponses Hyperliquid enregistrées
+
+Sert POST /info (metaAndAssetCtxs, leaderboard, clearinghouseState) et
+GET /leaderboard (format stats-data) depuis fixtures/hyperliquid, pour faire
+tourner le pipeline d'ingestion sans dépendre de l'API réelle :
+
+    python hl_stub.py --port 8081
+    HYPERLIQUID_URL=http://127.0.0.1:8081/info python app.py
+
+Pour les mesures (benchmark.py), le stub peut ajouter de la latence, des
+erreurs 500 et des 429 tirés au hasard (graine fixe = tirages reproductibles),
+et démultiplier les fixtures en actifs et wallets synthétiques.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'hyperliquid')
+
+EMPTY_STATE = {
+    "marginSummary": {"accountValue": "0.0", "totalNtlPos": "0.0", "totalRawUsd": "0.0", "totalMarginUsed": "0.0"},
+    "assetPositions": [],
+}
+
+def load_fixtures(directory=FIXTURES_DIR):
+    fixtures = {}
+    for name in ('metaAndAssetCtxs', 'leaderboard', 'clearinghouseState'):
+        with open(os.path.join(directory, f'{name}.json')) as f:
+            fixtures[name] = json.load(f)
+    return fixtures
+
+def _synthetic_address(address, copy):
+    return '0x' + hashlib.sha1(f'{address}:{copy}'.encode()).hexdigest()
+
+def scale_fixtures(fixtures, assets=None, wallets=None):
+    """Fixtures agrandies à `assets` actifs et `wallets` wallets (au moins)
+
+    Un actif synthétique SYNnnn reprend le contexte et les positions d'un actif
+    réel (prix décalé) ; un wallet synthétique copie l'état d'un wallet réel
+    sous une autre adresse. Le nombre de positions croît donc linéairement.
+    """
+    meta, contexts = fixtures['metaAndAssetCtxs']
+    universe = list(meta['universe'])
+    contexts = list(contexts)
+    states = {address: {**state, 'assetPositions': list(state['assetPositions'])}
+              for address, state in fixtures['clearinghouseState'].items()}
+    rows = list(fixtures['leaderboard']['leaderboardRows'])
+
+    real = len(universe)
+    for index in range(real, assets or 0):
+        template = index % real
+        name = f'SYN{index:03d}'
+        factor = 1 + (index // real) / 100
+        universe.append({**meta['universe'][template], 'name': name})
+        contexts.append({**contexts[template], 'markPx': str(float(contexts[template]['markPx']) * factor)})
+        coin = meta['universe'][template]['name']
+        for address, state in fixtures['clearinghouseState'].items():
+            states[address]['assetPositions'].extend(
+                {**entry, 'position': {**entry['position'], 'coin': name}}
+                for entry in state['assetPositions'] if entry['position']['coin'] == coin
+            )
+
+    real_rows = len(rows)
+    for index in range(real_rows, wallets or 0):
+        source = rows[index % real_rows]
+        address = _synthetic_address(source['ethAddress'], index // real_rows)
+        rows.append({**source, 'ethAddress': address})
+        states[address] = states.get(source['ethAddress'].lower(), EMPTY_STATE)
+
+    return {
+        'metaAndAssetCtxs': [{**meta, 'universe': universe}, contexts],
+        'leaderboard': {**fixtures['leaderboard'], 'leaderboardRows': rows},
+        'clearinghouseState': states,
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, comme l'API réelle
+    fixtures = None
+    # Injection de fautes, réglée par make_server
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    throttle_rate = 0.0
+    rng = None
+    counts = None  # réponses par statut
+    counts_lock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        with self.counts_lock:
+            self.counts[status] += 1
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def inject(self):
+        """Latence simulée, puis statut d'erreur tiré au hasard (None = réponse normale)"""
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        draw = self.rng.random()
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    def do_GET(self):
+        fault = self.inject()
+        if fault:
+            self.send_json({'error': 'injected'}, fault)
+        elif self.path.rstrip('/').endswith('leaderboard'):
+            self.send_json(self.fixtures['leaderboard'])
+        else:
+            self.send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json({'error': 'invalid json'}, 400)
+            return
+        fault = self.inject()
+        if fault:
+            self.send_json({'error': 'injected'}, fault)
+            return
+        self.send_json(*self.answer(payload))
+
+    def answer(self, payload):
+        """(réponse, statut) pour une requête /info"""
+        kind = payload.get('type')
+        if kind == 'clearinghouseState':
+            user = (payload.get('user') or '').lower()
+            return self.fixtures['clearinghouseState'].get(user, EMPTY_STATE), 200
+        if kind in ('metaAndAssetCtxs', 'leaderboard'):
+            return self.fixtures[kind], 200
+        return {'error': f'type non rejoué: {kind}'}, 422
+
+def make_server(host='127.0.0.1', port=0, fixtures=None, handler=StubHandler,
+                latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=None):
+    """Serveur prêt à lancer (serve_forever) ; port 0 = port libre
+
+    `latency` + uniforme(0, `jitter`) secondes avant chaque réponse ;
+    `error_rate` / `throttle_rate` : part des requêtes répondues en 500 / 429.
+    """
+    handler = type('BoundStubHandler', (handler,), {
+        'fixtures': fixtures or load_fixtures(),
+        'latency': latency,
+        'jitter': jitter,
+        'error_rate': error_rate,
+        'throttle_rate': throttle_rate,
+        'rng': random.Random(seed),
+        'counts': Counter(),
+        'counts_lock': threading.Lock(),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.counts = handler.counts
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--assets', type=int, help="actifs au total (synthétiques au-delà des fixtures)")
+    parser.add_argument('--wallets', type=int, help="wallets au total (synthétiques au-delà des fixtures)")
+    parser.add_argument('--latency', type=float, default=0.0, help="latence ajoutée par réponse (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="latence aléatoire en plus, 0 à JITTER (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="part des réponses en 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="part des réponses en 429")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fixtures = scale_fixtures(load_fixtures(args.fixtures), args.assets, args.wallets)
+    server = make_server(args.host, args.port, fixtures, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed)
+    print(f"Stub Hyperliquid sur http://{args.host}:{server.server_port}/info")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Réponses HTTP pré-calculées : corps figé, variantes compressées et ETag
+
+Le corps est compressé une seule fois à la construction ; servir une requête
+revient ensuite à choisir une variante et comparer un ETag.
+"""
+import gzip
+import hashlib
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : gzip seul sans elle
+    brotli = None
+
+class CachedResponse:
+    """Corps immuable avec ses variantes gzip/brotli et un ETag fort par variante"""
+
+    def __init__(self, body, mimetype, last_modified=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = digest
+
+        # Un ETag fort doit différer selon le Content-Encoding
+        self.variants = {'identity': (body, digest)}
+        self.variants['gzip'] = (gzip.compress(body, compresslevel=6, mtime=0), f"{digest}-gz")
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(body, quality=9), f"{digest}-br")
+
+    def select_encoding(self, request):
+        """Meilleure variante acceptée par le client (br > gzip > identity)"""
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accepted.quality(encoding) > 0:
+                return encoding
+        return 'identity'
+
+    def not_modified(self, request, etag):
+        """Le client a déjà cette variante (If-None-Match prime sur If-Modified-Since)"""
+        if request.if_none_match:
+            return request.if_none_match.contains(etag)
+        since = request.if_modified_since
+        if since is not None and self.last_modified is not None:
+            return self.last_modified.replace(microsecond=0) <= since
+        return False
+
+    def to_response(self, request, cache_control='no-cache'):
+        """Réponse 200 avec le corps choisi, ou 304 si le client est à jour"""
+        encoding = self.select_encoding(request)
+        body, etag = self.variants[encoding]
+
+        if self.not_modified(request, etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = cache_control
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        return response
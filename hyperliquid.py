@@ -0,0 +1,202 @@
+"""Client HTTP pour l'endpoint info de Hyperliquid
+
+Une seule Session partagée (pool de connexions keep-alive, gzip), des retries
+avec backoff exponentiel à jitter sur 429/5xx et un disjoncteur qui coupe les
+appels quand l'API est en panne au lieu de la marteler. Si un RequestGovernor
+est fourni, chaque essai attend d'abord son poids dans le budget commun.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from governor import BACKGROUND, request_weight
+
+DEFAULT_URL = "https://api.hyperliquid.xyz/info"
+
+# Statuts pour lesquels un nouvel essai a du sens
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HyperliquidError(Exception):
+    """Échec d'un appel à l'API Hyperliquid, après épuisement des essais"""
+
+class CircuitOpenError(HyperliquidError):
+    """Le disjoncteur est ouvert : l'appel est refusé sans toucher le réseau"""
+
+class CircuitBreaker:
+    """Disjoncteur classique fermé / ouvert / semi-ouvert
+
+    Après `failure_threshold` échecs consécutifs le circuit s'ouvre pendant
+    `reset_timeout` secondes, puis un seul appel de test est autorisé.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._probing = False
+        self._probe_owner = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            # Semi-ouvert : un seul appel de test à la fois
+            if self._probing:
+                return False
+            self._probing = True
+            self._probe_owner = threading.get_ident()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Appel de test terminé sans verdict (échéance, erreur locale) : un autre pourra tester"""
+        with self._lock:
+            if self._probing and self._probe_owner == threading.get_ident():
+                self._probing = False
+
+class HyperliquidClient:
+    """Client partagé par tous les threads de rafraîchissement"""
+
+    def __init__(self, url=DEFAULT_URL, pool_size=10, timeout=10, max_retries=3,
+                 backoff_base=0.25, backoff_max=5.0, breaker=None, governor=None, on_request=None):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.governor = governor
+        # on_request(type, statut, secondes) après chaque essai (statut 'error' sans réponse)
+        self.on_request = on_request
+
+        # Un seul hôte : un pool dimensionné sur la concurrence, bloquant au-delà
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+
+    def _timeout(self, deadline):
+        """Timeout d'un essai, borné par l'échéance de l'appelant"""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HyperliquidError("échéance dépassée")
+        return min(self.timeout, remaining)
+
+    def _backoff(self, attempt, retry_after=None):
+        """Backoff exponentiel avec jitter complet, Retry-After prioritaire"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def info(self, payload, deadline=None, priority=BACKGROUND):
+        """POST sur /info et renvoie le JSON décodé
+
+        Lève HyperliquidError si tous les essais échouent ou si l'échéance
+        est atteinte, CircuitOpenError si le disjoncteur est ouvert.
+        """
+        kind = payload.get('type')
+        return self._request('POST', self.url, kind, deadline, request_weight(kind), priority, kind, json=payload)
+
+    def get_json(self, url, deadline=None, priority=BACKGROUND):
+        """GET sur un autre endpoint Hyperliquid (ex. stats-data), mêmes garanties"""
+        return self._request('GET', url, url, deadline, request_weight(None), priority, 'get')
+
+    def _wait_budget(self, weight, priority, deadline):
+        if self.governor is not None and not self.governor.acquire(weight, priority, deadline):
+            raise HyperliquidError("échéance dépassée en attente de budget")
+
+    def _observe(self, kind, status, started):
+        if self.on_request is not None:
+            self.on_request(kind, status, time.perf_counter() - started)
+
+    def _request(self, method, url, label, deadline, weight, priority, kind, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"circuit ouvert pour {label}")
+        try:
+            return self._attempts(method, url, label, deadline, weight, priority, kind, **kwargs)
+        finally:
+            # Sans succès ni échec enregistré, l'appel de test ne doit pas bloquer le circuit
+            self.breaker.release_probe()
+
+    def _attempts(self, method, url, label, deadline, weight, priority, kind, **kwargs):
+        error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                self._wait_budget(weight, priority, deadline)
+                started = time.perf_counter()
+                response = self.session.request(method, url, timeout=self._timeout(deadline), **kwargs)
+            except HyperliquidError:
+                # Échéance atteinte avant tout échec réseau : pas une panne de l'API
+                if error is None:
+                    raise
+                break
+            except requests.RequestException as e:
+                # Connexion, timeout, mais aussi réponse tronquée ou mal encodée
+                error = e
+                self._observe(kind, 'error', started)
+            else:
+                self._observe(kind, response.status_code, started)
+                if self.governor is not None:
+                    if response.status_code == 429:
+                        self.governor.throttled()
+                    else:
+                        self.governor.succeeded()
+                if response.status_code not in RETRY_STATUSES:
+                    # Le serveur répond : une erreur 4xx ne doit pas ouvrir le circuit
+                    self.breaker.record_success()
+                    if not response.ok:
+                        raise HyperliquidError(f"{label}: HTTP {response.status_code}")
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise HyperliquidError(f"{label}: réponse invalide") from e
+                error = HyperliquidError(f"HTTP {response.status_code}")
+                retry_after = response.headers.get('Retry-After')
+
+            if attempt == self.max_retries:
+                break
+            delay = self._backoff(attempt, retry_after)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
+
+        self.breaker.record_failure()
+        raise HyperliquidError(f"{label}: {error}") from error
@@ -0,0 +1,157 @@
+"""Ingestion des positions réelles depuis Hyperliquid
+
+    leaderboard            -> adresses candidates
+    clearinghouseState     -> positions de chaque adresse (concurrence bornée)
+    metaAndAssetCtxs       -> prix mark live (notionnel, prix d'entrée de repli),
+                              levier maximal par actif
+
+Les états sont produits au fil des réponses, dans un budget de temps fixe :
+ce qui n'est pas arrivé à l'échéance est abandonné pour ce cycle.
+"""
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from governor import BACKGROUND
+from hyperliquid import HyperliquidError
+from positions import parse_address
+
+def leaderboard_addresses(leaderboard, limit):
+    """Adresses du leaderboard, plus gros comptes d'abord, sans doublons
+
+    Accepte le format stats-data ({"leaderboardRows": [...]}) comme une
+    simple liste de lignes ou d'adresses.
+    """
+    rows = leaderboard.get('leaderboardRows', []) if isinstance(leaderboard, dict) else leaderboard or []
+    if rows and isinstance(rows[0], dict) and 'accountValue' in rows[0]:
+        rows = sorted(rows, key=lambda row: float(row.get('accountValue') or 0), reverse=True)
+
+    addresses = []
+    seen = set()
+    for row in rows:
+        text = row if isinstance(row, str) else row.get('ethAddress') or row.get('user') or row.get('address')
+        try:
+            address = parse_address(text)
+        except (TypeError, ValueError):
+            continue
+        if address not in seen:
+            seen.add(address)
+            addresses.append(address)
+            if len(addresses) >= limit:
+                break
+    return addresses
+
+def mark_prices(meta):
+    """{actif: prix mark} depuis la réponse metaAndAssetCtxs"""
+    try:
+        universe, contexts = meta[0]['universe'], meta[1]
+    except (KeyError, IndexError, TypeError):
+        return {}
+    prices = {}
+    for asset, context in zip(universe, contexts):
+        price = context.get('markPx') or context.get('oraclePx')
+        if price is not None:
+            prices[asset['name']] = float(price)
+    return prices
+
+def max_leverages(meta):
+    """{actif: levier maximal} depuis la réponse metaAndAssetCtxs"""
+    try:
+        universe = meta[0]['universe']
+    except (KeyError, IndexError, TypeError):
+        return {}
+    return {asset['name']: int(asset['maxLeverage']) for asset in universe if asset.get('maxLeverage')}
+
+def parse_positions(address, state, prices):
+    """Positions d'un clearinghouseState : (actif, enregistrement WhaleTable)
+
+    Le notionnel est recalculé au prix mark live ; le prix d'entrée vient de
+    l'API et, à défaut, du prix mark.
+    """
+    for item in (state or {}).get('assetPositions', []):
+        position = item.get('position', item)
+        size = float(position.get('szi') or 0)
+        if size == 0:
+            continue
+        asset = position['coin']
+        entry_price = float(position['entryPx']) if position.get('entryPx') else prices.get(asset)
+        mark = prices.get(asset, entry_price)
+        if mark is None:
+            continue
+        leverage = position.get('leverage') or {}
+        leverage = leverage.get('value', 1) if isinstance(leverage, dict) else leverage
+        yield asset, (
+            address,
+            size > 0,
+            abs(size) * mark,
+            max(1, int(round(float(leverage)))),
+            float(position.get('unrealizedPnl') or 0),
+            entry_price if entry_price is not None else mark,
+        )
+
+def fetch_states(client, addresses, concurrency, deadline, wallet_timeout, priority=BACKGROUND):
+    """Génère (adresse, clearinghouseState) au fil des réponses
+
+    Au plus `concurrency` requêtes en vol ; chaque wallet a son propre délai,
+    borné par l'échéance du cycle. Les wallets en échec (API, réseau) sont
+    comptés et ignorés.
+    `priority` : rang des requêtes dans le budget amont (voir governor.py).
+    """
+    def fetch(address):
+        # Le délai démarre quand la requête sort de la file
+        wallet_deadline = min(deadline, time.monotonic() + wallet_timeout)
+        payload = {"type": "clearinghouseState", "user": '0x' + address.hex()}
+        return client.info(payload, deadline=wallet_deadline, priority=priority)
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ingest')
+    # Fenêtre glissante : au plus 2 × concurrency requêtes soumises et non lues, la
+    # mémoire des états décodés ne dépend pas du nombre de wallets
+    window = 2 * concurrency
+    remaining = iter(addresses)
+    futures = {}
+    handled = failed = 0
+    try:
+        while True:
+            for address in itertools.islice(remaining, window - len(futures)):
+                futures[executor.submit(fetch, address)] = address
+            timeout = deadline - time.monotonic()
+            if not futures or timeout <= 0:
+                break
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                # Retiré dès sa réponse : l'état n'est plus référencé une fois lu
+                address = futures.pop(future)
+                handled += 1
+                try:
+                    state = future.result()
+                except (HyperliquidError, requests.RequestException):
+                    failed += 1
+                    continue
+                yield address, state
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if handled < len(addresses) and time.monotonic() >= deadline:
+            print(f"Budget de temps épuisé : {len(addresses) - handled} wallets abandonnés")
+        if failed:
+            print(f"{failed} wallets en échec sur {len(addresses)}")
+
+def collect_positions(client, addresses, prices, concurrency, deadline, wallet_timeout, priority=BACKGROUND):
+    """Flux de (actif, enregistrement) sur tous les wallets candidats
+
+    Un état inattendu (champ manquant, valeur non numérique) n'écarte que son
+    wallet, jamais le balayage.
+    """
+    malformed = 0
+    try:
+        for address, state in fetch_states(client, addresses, concurrency, deadline, wallet_timeout, priority):
+            try:
+                records = list(parse_positions(address, state, prices))
+            except (AttributeError, KeyError, TypeError, ValueError):
+                malformed += 1
+                continue
+            yield from records
+    finally:
+        if malformed:
+            print(f"{malformed} wallets ignorés : état illisible")
@@ -0,0 +1,224 @@
+"""Carte de chaleur des liquidations estimées, par actif
+
+Pour chaque position suivie (WhaleTable), le prix de liquidation est estimé
+depuis le prix d'entrée et le levier, comme une position isolée :
+
+    long    entrée × (1 - 1/levier) / (1 - mm)
+    short   entrée × (1 + 1/levier) / (1 + mm)
+
+avec mm = 1 / (2 × levier max de l'actif), la marge de maintenance de
+Hyperliquid. Les positions en marge croisée tiennent en réalité plus
+longtemps (tout le compte sert de marge) : c'est une borne prudente.
+
+Les notionnels sont ensuite répartis sur une grille de prix (des milliers de
+buckets, ± `span` autour d'un prix d'ancrage). Tout est vectorisé et découpé
+pour que les mouvements de prix coûtent peu :
+
+    positions changées   prix de liquidation triés + sommes cumulées, puis
+                         buckets par searchsorted sur la grille (O(B log n))
+    prix qui bouge       même grille, mêmes buckets : seuls les cumuls « à
+                         risque » depuis le prix courant sont refaits (O(B)) ;
+                         la grille n'est recentrée que si le prix s'éloigne de
+                         plus de `recenter` × `span` de son ancrage
+
+Les calculs tournent dans un thread dédié ; les requêtes lisent la dernière
+réponse sérialisée.
+"""
+import threading
+import time
+
+import numpy as np
+
+def maintenance_rate(max_leverage):
+    """Marge de maintenance : la moitié de la marge initiale au levier maximal"""
+    return 0.5 / max(float(max_leverage), 1.0)
+
+def liquidation_prices(is_long, leverage, entry_price, maintenance):
+    """Prix de liquidation estimés (vectorisé, voir la docstring du module)"""
+    inverse = 1.0 / np.maximum(leverage.astype(np.float64), 1.0)
+    return np.where(
+        is_long,
+        entry_price * (1.0 - inverse) / (1.0 - maintenance),
+        entry_price * (1.0 + inverse) / (1.0 + maintenance),
+    )
+
+class LiquidationBook:
+    """Prix de liquidation d'un actif, triés par côté, avec notionnels cumulés"""
+
+    __slots__ = ('table', 'maintenance', 'positions', 'long_prices', 'long_cumsum',
+                 'short_prices', 'short_cumsum')
+
+    def __init__(self, table, max_leverage=None):
+        self.table = table
+        self.positions = len(table)
+        # Levier max inconnu : celui des positions ne peut pas le dépasser
+        if not max_leverage:
+            max_leverage = int(table.leverage.max()) if len(table) else 1
+        self.maintenance = maintenance_rate(max_leverage)
+        prices = liquidation_prices(table.is_long, table.leverage, table.entry_price, self.maintenance)
+        self.long_prices, self.long_cumsum = self._sorted(prices[table.is_long], table.size[table.is_long])
+        self.short_prices, self.short_cumsum = self._sorted(prices[~table.is_long], table.size[~table.is_long])
+
+    @staticmethod
+    def _sorted(prices, notional):
+        """(prix croissants, cumul des notionnels précédé de 0)"""
+        order = np.argsort(prices, kind='stable')
+        return prices[order], np.concatenate(([0.0], np.cumsum(notional[order])))
+
+    def long_below(self, levels):
+        """Notionnel long dont la liquidation est sous chaque niveau"""
+        return self.long_cumsum[np.searchsorted(self.long_prices, levels)]
+
+    def short_below(self, levels):
+        """Notionnel short dont la liquidation est sous chaque niveau"""
+        return self.short_cumsum[np.searchsorted(self.short_prices, levels)]
+
+class HeatmapGrid:
+    """Grille de prix fixe et notionnels par bucket pour un LiquidationBook"""
+
+    __slots__ = ('book', 'anchor', 'edges', 'long_at_edges', 'short_at_edges', 'long', 'short')
+
+    def __init__(self, book, anchor, buckets, span):
+        self.book = book
+        self.anchor = anchor
+        self.edges = anchor * np.linspace(1.0 - span, 1.0 + span, buckets + 1)
+        self.long_at_edges = book.long_below(self.edges)
+        self.short_at_edges = book.short_below(self.edges)
+        self.long = np.diff(self.long_at_edges)
+        self.short = np.diff(self.short_at_edges)
+
+    def payload(self, asset, price, version, peaks=5):
+        """Vue au prix `price` : buckets, cumuls à risque depuis le prix, totaux"""
+        book = self.book
+        long_below_price = float(book.long_below(price))
+        short_below_price = float(book.short_below(price))
+        # Longs liquidés si le prix descend jusqu'au bas du bucket,
+        # shorts liquidés s'il monte jusqu'à son haut
+        long_cumulative = np.clip(long_below_price - self.long_at_edges[:-1], 0.0, None)
+        short_cumulative = np.clip(self.short_at_edges[1:] - short_below_price, 0.0, None)
+        return {
+            'asset': asset,
+            'version': version,
+            'mark_price': price,
+            'anchor_price': self.anchor,
+            'price_min': float(self.edges[0]),
+            'price_max': float(self.edges[-1]),
+            'bucket_width': float(self.edges[1] - self.edges[0]),
+            'buckets': len(self.long),
+            'maintenance_rate': book.maintenance,
+            'long': np.round(self.long, 2).tolist(),
+            'short': np.round(self.short, 2).tolist(),
+            'long_cumulative': np.round(long_cumulative, 2).tolist(),
+            'short_cumulative': np.round(short_cumulative, 2).tolist(),
+            'peaks': {
+                'long': self._peaks(self.long, peaks),
+                'short': self._peaks(self.short, peaks),
+            },
+            'totals': {
+                'positions': book.positions,
+                'long_at_risk': long_below_price,
+                'short_at_risk': float(book.short_cumsum[-1]) - short_below_price,
+                'long_in_range': float(self.long_at_edges[-1] - self.long_at_edges[0]),
+                'short_in_range': float(self.short_at_edges[-1] - self.short_at_edges[0]),
+            },
+            'computed_at': int(time.time()),
+        }
+
+    def _peaks(self, notional, count):
+        """Buckets les plus chargés : [{price (centre), notional}]"""
+        top = np.argsort(notional)[::-1][:count]
+        top = top[notional[top] > 0]
+        centers = (self.edges[top] + self.edges[top + 1]) / 2
+        return [{'price': round(float(price), 6), 'notional': round(float(value), 2)}
+                for price, value in zip(centers, notional[top])]
+
+class LiquidationEngine:
+    """Cartes de chaleur de tous les actifs, recalculées dans un thread dédié
+
+    `render(payload)` transforme le dict calculé en réponse servie (appelé dans
+    le thread de calcul) ; `get(asset)` renvoie le dernier résultat.
+    """
+
+    def __init__(self, render, buckets=2000, span=0.5, recenter=0.25):
+        self.render = render
+        self.buckets = buckets
+        self.span = span
+        self.recenter = recenter
+        self._books = {}
+        self._grids = {}
+        self._versions = {}
+        self._prices = {}
+        self._results = {}
+        self._pending = {}  # actif -> {'data': dict d'actif, 'version': n, 'price': p}
+        self._cond = threading.Condition()
+        self._worker = None
+        self.computed_total = 0
+        self.rebinned_total = 0
+
+    def update(self, assets, version):
+        """Positions (et prix mark) publiées : {actif: dict d'actif}"""
+        with self._cond:
+            for asset, data in assets.items():
+                entry = self._pending.setdefault(asset, {})
+                entry.update(data=data, version=version)
+                if data.get('mark_price'):
+                    entry['price'] = data['mark_price']
+            self._wake()
+
+    def update_prices(self, prices):
+        """Prix mark seuls (rafraîchissements chauds) : recalcul incrémental"""
+        with self._cond:
+            for asset, price in prices.items():
+                if price and (asset in self._books or asset in self._pending):
+                    self._pending.setdefault(asset, {})['price'] = price
+            self._wake()
+
+    def tracks(self, asset):
+        return asset in self._books or asset in self._pending
+
+    def get(self, asset):
+        return self._results.get(asset)
+
+    def _wake(self):
+        if self._pending:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='liquidations', daemon=True)
+                self._worker.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Les mises à jour arrivées pendant un calcul sont fusionnées
+                pending, self._pending = self._pending, {}
+            for asset, entry in pending.items():
+                try:
+                    self._compute(asset, entry)
+                except Exception as e:
+                    print(f"Erreur de carte des liquidations ({asset}): {e}")
+
+    def _compute(self, asset, entry):
+        data = entry.get('data')
+        if data is not None and data.get('whales') is not None:
+            book = self._books.get(asset)
+            if book is None or book.table is not data['whales']:
+                self._books[asset] = LiquidationBook(data['whales'], data.get('max_leverage'))
+            self._versions[asset] = entry['version']
+        book = self._books.get(asset)
+        price = entry.get('price') or self._prices.get(asset)
+        if book is None or not price:
+            return
+        self._prices[asset] = price
+
+        grid = self._grids.get(asset)
+        if grid is None or abs(price / grid.anchor - 1) > self.span * self.recenter:
+            grid = self._grids[asset] = HeatmapGrid(book, price, self.buckets, self.span)
+            self.rebinned_total += 1
+        elif grid.book is not book:
+            # Nouvelles positions : même grille, les clients gardent leurs repères
+            grid = self._grids[asset] = HeatmapGrid(book, grid.anchor, self.buckets, self.span)
+            self.rebinned_total += 1
+        self._results[asset] = self.render(grid.payload(asset, price, self._versions.get(asset)))
+        self.computed_total += 1
@@ -0,0 +1,218 @@
+"""Métriques internes au format texte Prometheus (/metrics)
+
+Compteurs, jauges et histogrammes à buckets fixes, sans dépendance : une
+observation coûte un verrou et une recherche dichotomique, assez peu pour
+rester actif en production. Jauges et compteurs peuvent être calculés au
+moment de l'export (fonction) plutôt que tenus à jour sur le chemin chaud :
+un total déjà tenu ailleurs (cache, disjoncteur) reste un compteur.
+
+Plusieurs processus (workers gunicorn) : chacun exporte ses valeurs
+(Registry.export, sérialisable en JSON) et l'export de tous est fusionné au
+rendu. Compteurs et histogrammes s'additionnent ; une jauge précise comment
+se combiner (`merge`) :
+
+    sum       total des processus (abonnés SSE par worker)
+    max       plus grande valeur
+    leader    valeur du seul processus fetcher (budget amont, planification)
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Secondes : de la réponse en cache (~0.1 ms) au cycle complet (~1 min)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _function_values(function):
+    values = function()
+    return values.items() if isinstance(values, dict) else [((), values)]
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def values(self):
+        """[(labels, valeur)] de ce processus"""
+        if self.function is not None:
+            return [(key, value) for key, value in _function_values(self.function) if value is not None]
+        with self._lock:
+            return list(self._values.items())
+
+    def export(self):
+        return [[[str(label) for label in key], value] for key, value in self.values()]
+
+    def merge(self, exports):
+        """Valeurs combinées de plusieurs exports [(export, leader)] : somme par défaut"""
+        merged = {}
+        for export, _ in exports:
+            for key, value in export:
+                merged[tuple(key)] = merged.get(tuple(key), 0) + value
+        return merged.items()
+
+    def render(self, values=None):
+        values = self.values() if values is None else values
+        return self.header() + [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+                                for key, value in values]
+
+class Counter(Metric):
+    """Total croissant ; `function` lit un total tenu ailleurs ({labels: valeur} ou un nombre)"""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    """Valeur instantanée ; `function` renvoie {labels: valeur} ou un nombre
+
+    `merge` : combinaison entre processus (sum, max ou leader).
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), function=None, merge='sum'):
+        super().__init__(name, documentation, labels, function)
+        self.merge_mode = merge
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def merge(self, exports):
+        if self.merge_mode == 'leader':
+            return super().merge([(export, leader) for export, leader in exports if leader])
+        if self.merge_mode == 'max':
+            merged = {}
+            for export, _ in exports:
+                for key, value in export:
+                    merged[tuple(key)] = max(merged.get(tuple(key), value), value)
+            return merged.items()
+        return super().merge(exports)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [comptes par bucket (+Inf en dernier), somme]
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def values(self):
+        with self._lock:
+            return [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+
+    def export(self):
+        return [[[str(label) for label in key], counts, total] for key, counts, total in self.values()]
+
+    def merge(self, exports):
+        merged = {}
+        for export, _ in exports:
+            for key, counts, total in export:
+                series = merged.setdefault(tuple(key), [[0] * len(counts), 0.0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+        return [(key, counts, total) for key, (counts, total) in merged.items()]
+
+    def render(self, series=None):
+        series = self.values() if series is None else series
+        lines = self.header()
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=(), function=None):
+        return self.register(Counter(name, documentation, labels, function))
+
+    def gauge(self, name, documentation, labels=(), function=None, merge='sum'):
+        return self.register(Gauge(name, documentation, labels, function, merge))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def export(self):
+        """{nom: valeurs} de ce processus, sérialisable en JSON (voir render)"""
+        exported = {}
+        for metric in self._metrics:
+            try:
+                exported[metric.name] = metric.export()
+            except Exception as e:
+                print(f"Métrique {metric.name} non exportée: {e}")
+        return exported
+
+    def render(self, exports=None):
+        """Texte d'exposition Prometheus (version 0.0.4)
+
+        `exports` : [(Registry.export(), leader)] de tous les processus, ce
+        dernier compris ; sans, les valeurs de ce processus seul.
+        """
+        lines = []
+        for metric in self._metrics:
+            try:
+                if exports is None:
+                    lines.extend(metric.render())
+                else:
+                    lines.extend(metric.render(metric.merge(
+                        [(export.get(metric.name, []), leader) for export, leader in exports])))
+            except Exception as e:
+                lines.append(f'# {metric.name} indisponible: {e}')
+        return '\n'.join(lines) + '\n'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -0,0 +1,109 @@
+"""Stockage colonnaire compact des positions de whales
+
+Une WhaleTable garde les positions d'un actif sous forme de colonnes NumPy
+(une par champ) au lieu d'une liste de dicts : environ 50 octets par position
+au lieu de ~600, et les agrégats (comptes, sommes) sont des réductions
+vectorisées.
+
+Conversion vers le format JSON de l'API (une ligne par whale) :
+
+    rank         position dans la table + 1 (implicite, non stocké)
+    address      20 octets binaires -> "0x<8 premiers octets>...<2 derniers>"
+    wallet       20 octets binaires -> "0x<40 caractères hex>" (clé de /api/wallet)
+    side         booléen is_long -> "LONG" / "SHORT"
+    size         float64 (notionnel en $)
+    leverage     uint16 -> int
+    pnl          float64
+    entry_price  float64
+
+`WhaleTable.to_rows()` produit exactement cette liste ; `asset_to_json()`
+applique la conversion à un dict d'actif complet.
+"""
+import numpy as np
+
+ADDRESS_BYTES = 20
+
+def format_address(raw):
+    """Adresse binaire -> forme abrégée affichée par l'API"""
+    return f"0x{raw[:8].hex()}...{raw[-2:].hex()}"
+
+def parse_address(text):
+    """Adresse hexadécimale complète (0x + 40 caractères) -> 20 octets"""
+    raw = bytes.fromhex(text[2:] if text.startswith('0x') else text)
+    if len(raw) != ADDRESS_BYTES:
+        raise ValueError(f"adresse invalide: {text}")
+    return raw
+
+class WhaleTable:
+    """Positions d'un actif, une colonne NumPy par champ, triées par rang"""
+
+    __slots__ = ('addresses', 'is_long', 'size', 'leverage', 'pnl', 'entry_price')
+
+    def __init__(self, addresses, is_long, size, leverage, pnl, entry_price):
+        self.addresses = np.asarray(addresses, dtype=np.uint8).reshape(-1, ADDRESS_BYTES)
+        self.is_long = np.asarray(is_long, dtype=np.bool_)
+        self.size = np.asarray(size, dtype=np.float64)
+        self.leverage = np.asarray(leverage, dtype=np.uint16)
+        self.pnl = np.asarray(pnl, dtype=np.float64)
+        self.entry_price = np.asarray(entry_price, dtype=np.float64)
+
+    @classmethod
+    def from_records(cls, records):
+        """Construit la table depuis des tuples
+        (adresse 20 octets, is_long, size, leverage, pnl, entry_price)"""
+        records = list(records)
+        addresses = np.frombuffer(b''.join(r[0] for r in records), dtype=np.uint8)
+        columns = list(zip(*(r[1:] for r in records))) or [()] * 5
+        return cls(addresses, *columns)
+
+    def __len__(self):
+        return len(self.size)
+
+    def address(self, i):
+        return self.addresses[i].tobytes()
+
+    # Agrégats vectorisés
+    @property
+    def long_count(self):
+        return int(np.count_nonzero(self.is_long))
+
+    @property
+    def short_count(self):
+        return len(self) - self.long_count
+
+    @property
+    def total_long_size(self):
+        return float(self.size[self.is_long].sum())
+
+    @property
+    def total_short_size(self):
+        return float(self.size[~self.is_long].sum())
+
+    def to_rows(self):
+        """Lignes au format JSON de l'API (voir la docstring du module)"""
+        sides = np.where(self.is_long, 'LONG', 'SHORT').tolist()
+        return [
+            {
+                'rank': i + 1,
+                'address': format_address(self.address(i)),
+                'wallet': '0x' + self.address(i).hex(),
+                'side': side,
+                'size': size,
+                'leverage': leverage,
+                'pnl': pnl,
+                'entry_price': entry_price
+            }
+            for i, (side, size, leverage, pnl, entry_price) in enumerate(zip(
+                sides, self.size.tolist(), self.leverage.tolist(),
+                self.pnl.tolist(), self.entry_price.tolist()))
+        ]
+
+def as_rows(whales):
+    """Liste de lignes JSON, que `whales` soit une WhaleTable ou déjà une liste"""
+    return whales.to_rows() if isinstance(whales, WhaleTable) else whales
+
+def asset_to_json(data):
+    """Dict d'actif avec sa WhaleTable convertie en lignes JSON"""
+    if data is None or not isinstance(data.get('whales'), WhaleTable):
+        return data
+    return {**data, 'whales': data['whales'].to_rows()}
@@ -0,0 +1,61 @@
+"""Limitation de débit par seau à jetons"""
+import threading
+import time
+from collections import OrderedDict
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons par seconde, au plus `capacity` en réserve"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Prend `tokens` jetons si possible ; sinon renvoie l'attente nécessaire (s)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) / self.rate
+
+    def set_rate(self, rate):
+        """Change le débit ; les jetons acquis à l'ancien débit sont conservés"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def drain(self):
+        """Vide la réserve : le prochain jeton n'arrivera qu'au débit courant"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = 0
+
+class ClientRateLimiter:
+    """Un seau par client (adresse IP), les clients inactifs les plus anciens sont oubliés"""
+
+    def __init__(self, rate, capacity, max_clients=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client):
+        """0 si la requête passe, sinon le délai à respecter (Retry-After)"""
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.capacity)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+        return bucket.try_acquire()
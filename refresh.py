@@ -0,0 +1,114 @@
+"""Rafraîchissements en arrière-plan avec coalescence (single-flight)
+
+Un seul rafraîchissement tourne à la fois. Tout déclenchement pendant qu'il
+tourne (bouton, API, job planifié) rejoint le job en cours au lieu d'en lancer
+un second qui referait les mêmes appels à l'API. Un déclenchement interactif
+qui rejoint un balayage planifié relève sa priorité dans le budget amont : il
+n'attend pas derrière les actifs chauds comme le ferait le job de fond.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from governor import BACKGROUND, INTERACTIVE, PRIORITY_NAMES, Priority
+
+def source_priority(source):
+    """Le job planifié passe en fond, tout déclenchement explicite en interactif"""
+    return BACKGROUND if source == 'scheduler' else INTERACTIVE
+
+class RefreshJob:
+    """Un passage de update_all_data, suivi via /api/refresh/<id>"""
+
+    def __init__(self, source):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.status = 'pending'
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.version = None
+        self.error = None
+        self.joined = 0  # déclenchements coalescés dans ce job
+        self.priority = Priority(source_priority(source))
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source': self.source,
+            'status': self.status,
+            'created_at': self.created_at.strftime('%H:%M:%S'),
+            'finished_at': self.finished_at.strftime('%H:%M:%S') if self.finished_at else None,
+            'version': self.version,
+            'joined': self.joined,
+            'priority': PRIORITY_NAMES.get(self.priority.level, self.priority.level),
+            'error': self.error
+        }
+
+class RefreshCoordinator:
+    """Lance `refresh_fn(source, priority)` dans un thread, jamais deux fois en parallèle
+
+    `governor` : budget amont où relever la priorité d'un job rejoint.
+    """
+
+    def __init__(self, refresh_fn, keep=50, governor=None):
+        self.refresh_fn = refresh_fn
+        self.keep = keep
+        self.governor = governor
+        self._jobs = OrderedDict()
+        self._current = None
+        self._lock = threading.Lock()
+
+    def trigger(self, source='manual'):
+        """Renvoie (job, created) : le job en cours s'il existe, sinon un nouveau"""
+        with self._lock:
+            if self._current is not None:
+                self._current.joined += 1
+                self._escalate(self._current, source_priority(source))
+                return self._current, False
+            job = self._current = RefreshJob(source)
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job,), name=f'refresh-{job.id}', daemon=True).start()
+        return job, True
+
+    def run(self, source='scheduler', timeout=None):
+        """Déclenche (ou rejoint) un rafraîchissement et attend sa fin"""
+        job, _ = self.trigger(source)
+        job.done.wait(timeout)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """{id: to_dict()} des `keep` derniers jobs (publiés aux workers)"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {job.id: job.to_dict() for job in jobs}
+
+    def _escalate(self, job, level):
+        if self.governor is not None:
+            self.governor.raise_priority(job.priority, level)
+        elif level < job.priority.level:
+            job.priority.level = level
+
+    @property
+    def running(self):
+        return self._current is not None
+
+    def _run(self, job):
+        job.status = 'running'
+        try:
+            job.version = self.refresh_fn(job.source, job.priority)
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"Erreur de rafraîchissement ({job.source}): {e}")
+        finally:
+            job.finished_at = datetime.now()
+            with self._lock:
+                self._current = None
+            job.done.set()
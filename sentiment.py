@@ -0,0 +1,168 @@
+"""Sentiment et agrégats des positions, calculés côté serveur
+
+Un seul passage vectorisé sur les WhaleTable de tous les actifs : chaque
+position tombe dans une case (actif, côté) et np.bincount cumule, par case,
+le nombre de positions, le notionnel, le notionnel × levier et le PnL. Il en
+sort, par actif et pour l'ensemble :
+
+    ratios          part long (%) pondérée par le nombre de positions
+                    (count), le notionnel (notional) ou le notionnel × levier
+                    (leverage)
+    net_exposure    notionnel long - notionnel short ($) et sa part du total
+    pnl_skew        (PnL long - PnL short) / (|PnL long| + |PnL short|), de -1
+                    (les shorts gagnent) à +1 (les longs gagnent)
+
+Le libellé de sentiment vient d'une table de paliers (SentimentScale) sur le
+ratio de la pondération choisie ; seuils et pondération se configurent.
+"""
+import numpy as np
+
+WEIGHTINGS = ('count', 'notional', 'leverage')
+
+# (ratio long minimal, libellé, classe CSS, emoji), du palier le plus haut au plus bas
+ASSET_LEVELS = (
+    (75, 'TRÈS BULLISH', 'very-bullish', '🚀'),
+    (60, 'BULLISH', 'bullish', '📈'),
+    (45, 'NEUTRE', 'neutral', '➖'),
+    (30, 'BEARISH', 'bearish', '📉'),
+    (None, 'TRÈS BEARISH', 'very-bearish', '💀'),
+)
+GLOBAL_LEVELS = (
+    (65, 'BULLISH', 'very-bullish', '🚀'),
+    (55, 'HAUSSIER', 'bullish', '📈'),
+    (45, 'NEUTRE', 'neutral', '➖'),
+    (35, 'BAISSIER', 'bearish', '📉'),
+    (None, 'BEARISH', 'very-bearish', '💀'),
+)
+# Global : bornes de l'ancien calcul du front-end, sur le ratio affiché (arrondi
+# à 0,1) ; à partir de NEUTRE le seuil doit être dépassé (45 % est BAISSIER, 35 % BEARISH)
+GLOBAL_STRICT_FROM = 2
+GLOBAL_DECIMALS = 1
+
+class SentimentScale:
+    """Paliers de sentiment ; le dernier (seuil None) prend tout le reste
+
+    Un palier est atteint à partir de son seuil (ratio >= seuil), sauf depuis
+    l'index `strict_from` où il faut le dépasser (ratio > seuil). `decimals` :
+    arrondi du ratio avant classement (None : ratio exact).
+    """
+
+    def __init__(self, levels, strict_from=None, decimals=None):
+        self.levels = tuple(levels)
+        self.strict_from = strict_from
+        self.decimals = decimals
+        thresholds = [level[0] for level in self.levels[:-1]]
+        if any(high <= low for high, low in zip(thresholds, thresholds[1:])):
+            raise ValueError(f"seuils non décroissants: {thresholds}")
+        bounds = np.array(thresholds, dtype=np.float64)
+        if strict_from is not None:
+            # « > seuil » revient à « >= plus petit flottant au-dessus du seuil »
+            bounds[strict_from:] = np.nextafter(bounds[strict_from:], np.inf)
+        self._ascending = bounds[::-1].copy()
+
+    def with_thresholds(self, text):
+        """Même table avec d'autres seuils, ex. "75,60,45,30" (None/vide : inchangée)"""
+        if not text:
+            return self
+        thresholds = [float(value) for value in text.split(',')]
+        if len(thresholds) != len(self.levels) - 1:
+            raise ValueError(f"{len(self.levels) - 1} seuils attendus, reçu: {text}")
+        return SentimentScale([(threshold, *level[1:]) for threshold, level
+                               in zip(thresholds + [None], self.levels)], self.strict_from, self.decimals)
+
+    def classify(self, ratios):
+        """Index du palier atteint par chaque ratio (vectorisé)"""
+        if self.decimals is not None:
+            ratios = np.round(ratios, self.decimals)
+        reached = np.searchsorted(self._ascending, ratios, side='right')
+        return len(self._ascending) - reached
+
+    def level(self, ratio):
+        """(libellé, classe CSS, emoji) pour un ratio"""
+        return self.levels[int(self.classify(ratio))][1:]
+
+class SentimentEngine:
+    """Agrégats par actif et globaux, sentiment selon la pondération choisie"""
+
+    def __init__(self, asset_scale, global_scale, weighting='count'):
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"pondération inconnue: {weighting} (attendu: {', '.join(WEIGHTINGS)})")
+        self.asset_scale = asset_scale
+        self.global_scale = global_scale
+        self.weighting = weighting
+
+    def summarize(self, tables):
+        """{'assets': {actif: agrégats}, 'global': agrégats} pour {actif: WhaleTable}"""
+        names = list(tables)
+        columns = list(tables.values())
+        slots = 2 * len(names)
+        if any(len(table) for table in columns):
+            index = np.repeat(np.arange(len(names)), [len(table) for table in columns])
+            is_long = np.concatenate([table.is_long for table in columns])
+            size = np.concatenate([table.size for table in columns])
+            leverage = np.concatenate([table.leverage for table in columns]).astype(np.float64)
+            pnl = np.concatenate([table.pnl for table in columns])
+            # Case 2 × actif pour les longs, 2 × actif + 1 pour les shorts
+            slot = 2 * index + ~is_long
+            sums = np.stack([
+                np.bincount(slot, minlength=slots),
+                np.bincount(slot, weights=size, minlength=slots),
+                np.bincount(slot, weights=size * leverage, minlength=slots),
+                np.bincount(slot, weights=pnl, minlength=slots),
+            ]).reshape(4, -1, 2)
+        else:
+            sums = np.zeros((4, len(names), 2))
+        # sums[mesure, actif, côté] ; le global est la somme sur les actifs
+        per_asset = self._metrics(sums)
+        overall = self._metrics(sums.sum(axis=1, keepdims=True))
+        return {
+            'assets': {name: self._row(per_asset, i, self.asset_scale) for i, name in enumerate(names)},
+            'global': self._row(overall, 0, self.global_scale),
+        }
+
+    @staticmethod
+    def _ratio(long, short):
+        total = long + short
+        return np.divide(long * 100, total, out=np.full_like(total, 50.0, dtype=np.float64), where=total > 0)
+
+    def _metrics(self, sums):
+        counts, notional, levered, pnl = sums
+        net = notional[:, 0] - notional[:, 1]
+        total = notional.sum(axis=1)
+        swing = np.abs(pnl).sum(axis=1)
+        return {
+            'long_count': counts[:, 0].astype(np.int64),
+            'short_count': counts[:, 1].astype(np.int64),
+            'long_size': notional[:, 0],
+            'short_size': notional[:, 1],
+            'count': self._ratio(counts[:, 0], counts[:, 1]),
+            'notional': self._ratio(notional[:, 0], notional[:, 1]),
+            'leverage': self._ratio(levered[:, 0], levered[:, 1]),
+            'net_exposure': net,
+            'net_exposure_ratio': np.divide(net * 100, total, out=np.zeros_like(net), where=total > 0),
+            'long_pnl': pnl[:, 0],
+            'short_pnl': pnl[:, 1],
+            'pnl_skew': np.divide(pnl[:, 0] - pnl[:, 1], swing, out=np.zeros_like(swing), where=swing > 0),
+        }
+
+    def _row(self, metrics, i, scale):
+        ratio = float(metrics[self.weighting][i])
+        label, css_class, emoji = scale.level(ratio)
+        return {
+            'positions': int(metrics['long_count'][i] + metrics['short_count'][i]),
+            'long_count': int(metrics['long_count'][i]),
+            'short_count': int(metrics['short_count'][i]),
+            'long_size': float(metrics['long_size'][i]),
+            'short_size': float(metrics['short_size'][i]),
+            'ratios': {weighting: round(float(metrics[weighting][i]), 1) for weighting in WEIGHTINGS},
+            'weighting': self.weighting,
+            'ratio': round(ratio, 1),
+            'net_exposure': float(metrics['net_exposure'][i]),
+            'net_exposure_ratio': round(float(metrics['net_exposure_ratio'][i]), 1),
+            'long_pnl': float(metrics['long_pnl'][i]),
+            'short_pnl': float(metrics['short_pnl'][i]),
+            'pnl_skew': round(float(metrics['pnl_skew'][i]), 3),
+            'sentiment': label,
+            'sentiment_class': css_class,
+            'emoji': emoji,
+        }
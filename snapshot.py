@@ -0,0 +1,143 @@
+"""État publié du tracker : un objet immuable remplacé d'un seul coup
+
+Les lecteurs (routes Flask, SSE) prennent une référence au snapshot courant
+et n'ont besoin d'aucun verrou : un snapshot publié ne change plus jamais,
+et le rafraîchissement en publie un nouveau par simple réaffectation.
+"""
+import os
+import pickle
+import threading
+from datetime import timezone
+
+from positions import asset_to_json
+from universe import AssetUniverse
+
+class Snapshot:
+    """Tous les actifs, l'heure de mise à jour et la version, figés
+
+    `assets` est un dict {actif: données} dont les whales sont des
+    WhaleTable (voir positions.py) ; il ne doit jamais être modifié :
+    chaque rafraîchissement construit un nouveau dict. Les rendus dérivés
+    (HTML, JSON, deltas) sont mis en cache sur le snapshot lui-même.
+    `universe` : résumés et tables top N de tous les actifs du dernier
+    balayage (voir universe.py).
+    """
+
+    __slots__ = ('assets', 'last_update', 'version', 'stale', 'universe', '_cache', '_lock')
+
+    def __init__(self, assets, last_update=None, version=0, stale=False, universe=None):
+        object.__setattr__(self, 'assets', dict(assets))
+        object.__setattr__(self, 'universe', universe or AssetUniverse())
+        object.__setattr__(self, 'last_update', last_update)
+        object.__setattr__(self, 'version', version)
+        # Rechargé depuis le disque, en attente du premier rafraîchissement live
+        object.__setattr__(self, 'stale', stale)
+        object.__setattr__(self, '_cache', {})
+        # Réentrant : un rendu peut s'appuyer sur une autre valeur dérivée du snapshot
+        object.__setattr__(self, '_lock', threading.RLock())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot est immuable")
+
+    @property
+    def last_update_label(self):
+        return self.last_update.strftime('%H:%M:%S') if self.last_update else None
+
+    @property
+    def last_modified(self):
+        """Heure de mise à jour en UTC, pour l'en-tête Last-Modified"""
+        return self.last_update.astimezone(timezone.utc) if self.last_update else None
+
+    def json_assets(self):
+        """Actifs au format JSON de l'API (lignes de whales dépliées)
+
+        Non mis en cache : seules les réponses sérialisées le sont, les lignes
+        intermédiaires sont libérées aussitôt.
+        """
+        return {asset: asset_to_json(data) for asset, data in self.assets.items()}
+
+    def cached(self, key, build):
+        """Valeur dérivée calculée une seule fois pour ce snapshot"""
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = build()
+            return self._cache[key]
+
+    def evolve(self, updates, last_update, universe=None, stale=False):
+        """Nouveau snapshot (version + 1) avec les actifs mis à jour
+
+        L'ordre des actifs existants est conservé, les nouveaux vont à la fin.
+        L'univers n'est remplacé que par un balayage complet.
+        """
+        assets = dict(self.assets)
+        assets.update(updates)
+        return Snapshot(assets, last_update, self.version + 1, stale=stale,
+                        universe=universe or self.universe)
+
+# Persistance pour le démarrage à chaud
+SNAPSHOT_FORMAT = 1
+# Réponses gardées avec le snapshot ; une clé (nom, variante) compte pour son nom
+PERSISTED_RESPONSES = ('dashboard', 'api_data')
+
+def _persisted(key):
+    return (key[0] if isinstance(key, tuple) else key) in PERSISTED_RESPONSES
+
+def dumps_snapshot(snapshot, **extra):
+    """Snapshot et réponses pré-rendues sérialisés (disque, store partagé)
+
+    `extra` : données annexes transportées avec le snapshot (relues par
+    loads_snapshot).
+    """
+    state = {
+        'format': SNAPSHOT_FORMAT,
+        'version': snapshot.version,
+        'last_update': snapshot.last_update,
+        'assets': snapshot.assets,
+        'universe': snapshot.universe,
+        'stale': snapshot.stale,
+        'responses': {key: value for key, value in list(snapshot._cache.items()) if _persisted(key)},
+        'extra': extra,
+    }
+    return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+def loads_snapshot(data, stale=False):
+    """(snapshot, extra) depuis dumps_snapshot, ou (None, {}) si le format diffère
+
+    Les données ne viennent que de l'application elle-même (store partagé :
+    signature vérifiée par cluster.py avant l'appel). Un snapshot publié
+    périmé le reste chez qui le relit.
+    """
+    state = pickle.loads(data)
+    if state.get('format') != SNAPSHOT_FORMAT:
+        return None, {}
+    snapshot = Snapshot(state['assets'], state['last_update'], state['version'],
+                        stale=stale or state.get('stale', False), universe=state.get('universe'))
+    # Les réponses pré-rendues sont servies telles quelles : aucun rendu au chargement
+    snapshot._cache.update(state['responses'])
+    return snapshot, state.get('extra', {})
+
+def save_snapshot(snapshot, path):
+    """Écrit le snapshot et ses réponses pré-rendues (remplacement atomique)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps_snapshot(snapshot))
+    os.replace(tmp_path, path)
+
+def load_snapshot(path):
+    """Snapshot persisté, marqué périmé, ou None s'il est absent ou illisible
+
+    Le fichier n'est écrit que par l'application elle-même (save_snapshot).
+    """
+    try:
+        with open(path, 'rb') as f:
+            snapshot, _ = loads_snapshot(f.read(), stale=True)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Snapshot persisté illisible ({path}): {e}")
+        return None
+    return snapshot
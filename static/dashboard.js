@@ -0,0 +1,253 @@
+// Tableau de bord : rendu incrémental, deltas /api/data et flux SSE
+// Chargé en defer : le DOM est prêt quand ce script s'exécute.
+
+// Données des whales, embarquées dans la page (script #whale-data)
+const boot = JSON.parse(document.getElementById('whale-data').textContent);
+let whaleData = boot.data;
+let dataVersion = boot.version;
+let currentAsset = Object.keys(whaleData)[0];
+const refreshInterval = boot.refresh_interval;
+
+// Tout texte venu de l'API passe par escapeHtml avant innerHTML ; les noms
+// d'actifs voyagent en data-asset, jamais dans un attribut onclick
+function escapeHtml(value) {
+    return String(value).replace(/[&<>"']/g, char => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[char]);
+}
+
+function onAssetClick(container, handler) {
+    container.addEventListener('click', event => {
+        const target = event.target.closest('[data-asset]');
+        if (target && container.contains(target)) handler(target.dataset.asset);
+    });
+}
+
+// Timer (remis à zéro à chaque nouvelle version reçue)
+let seconds = refreshInterval;
+function updateTimer() {
+    const mins = Math.floor(seconds / 60);
+    const secs = seconds % 60;
+    document.getElementById('timer').textContent = 
+        `${mins.toString().padStart(2, '0')}:${secs.toString().padStart(2, '0')}`;
+
+    if (seconds > 0) {
+        seconds--;
+    }
+}
+setInterval(updateTimer, 1000);
+
+// Sentiment global : calculé par le serveur, mêmes chiffres pour tous les clients
+function renderGlobal(summary) {
+    if (!summary || !summary.positions) return;
+    document.getElementById('global-long').textContent = summary.ratio.toFixed(1) + '%';
+    document.getElementById('global-sentiment').textContent = `${summary.emoji} ${summary.sentiment}`;
+    document.getElementById('whale-count').textContent = summary.positions;
+}
+renderGlobal(boot.global);
+
+// Tous les marchés : résumés via /api/assets, top des whales via /api/asset/<actif>
+let lazyData = {};
+let universeVisible = false;
+
+async function loadUniverse() {
+    const response = await fetch('/api/assets', {cache: 'no-cache'});
+    if (!response.ok) return;
+    const universe = await response.json();
+    document.getElementById('universe-count').textContent = `(${universe.assets.length})`;
+    document.getElementById('universe-tbody').innerHTML = universe.assets.map(summary => `
+        <tr class="universe-row" data-asset="${escapeHtml(summary.asset)}">
+            <td>
+                <div class="asset-name">
+                    <div class="asset-icon ${escapeHtml(summary.asset.toLowerCase())}">${escapeHtml(summary.asset[0])}</div>
+                    ${escapeHtml(summary.asset)}${summary.pinned ? ' 📌' : ''}
+                </div>
+            </td>
+            <td>${summary.mark_price != null ? '$' + summary.mark_price.toLocaleString('en-US', {maximumSignificantDigits: 6}) : '-'}</td>
+            <td>${summary.ratio.toFixed(1)}%</td>
+            <td><span class="sentiment-badge ${escapeHtml(summary.sentiment_class)}">${escapeHtml(summary.emoji)} ${escapeHtml(summary.sentiment)}</span></td>
+            <td>$${(summary.scanned_size / 1000000).toFixed(1)}M</td>
+            <td>${summary.scanned_positions}</td>
+        </tr>`).join('');
+}
+
+function toggleUniverse() {
+    universeVisible = !universeVisible;
+    document.getElementById('universe-container').hidden = !universeVisible;
+    document.getElementById('universe-toggle').textContent = universeVisible ? 'Masquer' : 'Afficher';
+    if (universeVisible) loadUniverse();
+}
+
+// Actif non épinglé : table construite par le serveur à la première demande
+async function loadAsset(asset) {
+    if (!whaleData[asset] && !lazyData[asset]) {
+        const response = await fetch(`/api/asset/${encodeURIComponent(asset)}`);
+        if (!response.ok) return;
+        lazyData[asset] = (await response.json()).data;
+    }
+    showDetails(asset);
+    document.querySelector('.details-section').scrollIntoView({behavior: 'smooth'});
+}
+
+// Choix de l'utilisateur : seul signal de demande envoyé au serveur (pas les synchros SSE)
+function focusAsset(asset) {
+    fetch(`/api/focus/${encodeURIComponent(asset)}`, {method: 'POST'});
+    showDetails(asset);
+}
+
+// Afficher les détails
+function showDetails(asset) {
+    currentAsset = asset;
+
+    // Mettre à jour les tabs
+    document.querySelectorAll('.tab').forEach(tab => {
+        tab.classList.remove('active');
+        if (tab.dataset.asset === asset) {
+            tab.classList.add('active');
+        }
+    });
+
+    // Mettre à jour la table
+    const data = whaleData[asset] || lazyData[asset];
+    if (!data) return;
+
+    const tbody = document.getElementById('whale-tbody');
+    tbody.innerHTML = data.whales.map(whale => `
+        <tr>
+            <td><span class="rank ${whale.rank <= 3 ? 'top3' : ''}">${whale.rank}</span></td>
+            <td class="address">${escapeHtml(whale.address)}</td>
+            <td><span class="side-badge ${escapeHtml(whale.side.toLowerCase())}">${escapeHtml(whale.side)}</span></td>
+            <td>$${whale.size.toLocaleString('en-US', {maximumFractionDigits: 0})}</td>
+            <td><span class="leverage">${whale.leverage}x</span></td>
+            <td class="pnl ${whale.pnl >= 0 ? 'positive' : 'negative'}">
+                ${whale.pnl >= 0 ? '+' : ''}$${whale.pnl.toLocaleString('en-US', {maximumFractionDigits: 0})}
+            </td>
+            <td>$${whale.entry_price.toLocaleString('en-US', {minimumFractionDigits: 2, maximumFractionDigits: 2})}</td>
+        </tr>
+    `).join('');
+}
+
+// Carte d'un actif (même rendu que le template serveur)
+function renderCard(asset, data) {
+    const name = escapeHtml(asset);
+    return `
+    <div class="indicator-card" id="card-${name}" data-asset="${name}">
+        <div class="indicator-header">
+            <div class="asset-name">
+                <div class="asset-icon ${escapeHtml(asset.toLowerCase())}">${escapeHtml(asset[0])}</div>
+                ${name}
+            </div>
+            <span class="sentiment-badge ${escapeHtml(data.sentiment_class)}">
+                ${escapeHtml(data.emoji)} ${escapeHtml(data.sentiment)}
+            </span>
+        </div>
+
+        <div class="ratio-bar-container">
+            <div class="ratio-labels" title="Pondération : ${escapeHtml(data.weighting)}">
+                <span class="long-label">Long ${data.long_ratio}%</span>
+                <span class="short-label">Short ${data.short_ratio}%</span>
+            </div>
+            <div class="ratio-bar">
+                <div class="ratio-fill" style="width: ${data.long_ratio}%"></div>
+            </div>
+        </div>
+
+        <div class="stats-row">
+            <span>🟢 ${data.long_count}</span>
+            <span>🔴 ${data.short_count}</span>
+            <span class="stat-value">$${(data.total_long_size / 1000000).toFixed(1)}M</span>
+        </div>
+    </div>`;
+}
+
+// Appliquer un delta de /api/data?since= (ou un snapshot complet)
+function applyDelta(delta) {
+    if (delta.full) {
+        whaleData = delta.data;
+        return Object.keys(whaleData);
+    }
+
+    delta.removed.forEach(asset => delete whaleData[asset]);
+    Object.entries(delta.changes).forEach(([asset, change]) => {
+        const previous = whaleData[asset] || {asset: asset, whales: []};
+        const removed = new Set(change.whales.removed);
+        const fresh = {};
+        change.whales.updated.concat(change.whales.added).forEach(whale => {
+            fresh[whale.address] = whale;
+        });
+
+        const whales = previous.whales
+            .filter(whale => !removed.has(whale.address))
+            .map(whale => fresh[whale.address] || whale);
+        const known = new Set(whales.map(whale => whale.address));
+        change.whales.added.forEach(whale => {
+            if (!known.has(whale.address)) whales.push(whale);
+        });
+        whales.sort((a, b) => a.rank - b.rank);
+
+        whaleData[asset] = Object.assign({}, previous, change.fields, {whales: whales});
+    });
+    return Object.keys(delta.changes);
+}
+
+// Patcher le DOM au lieu de recharger la page
+function renderChanges(changed) {
+    const grid = document.getElementById('indicators-grid');
+    const assets = Object.keys(whaleData);
+    const cards = Array.from(grid.children);
+    const sameLayout = cards.length === assets.length &&
+        cards.every((card, i) => card.id === `card-${assets[i]}`);
+
+    if (sameLayout) {
+        changed.forEach(asset => {
+            document.getElementById(`card-${asset}`).outerHTML = renderCard(asset, whaleData[asset]);
+        });
+    } else {
+        grid.innerHTML = assets.map(asset => renderCard(asset, whaleData[asset])).join('');
+    }
+
+    if (!whaleData[currentAsset]) currentAsset = assets[0];
+    document.getElementById('tabs').innerHTML = assets.map(asset => `
+        <button class="tab ${asset === currentAsset ? 'active' : ''}" data-asset="${escapeHtml(asset)}">
+            ${escapeHtml(asset)}
+        </button>`).join('');
+
+    if (changed.includes(currentAsset)) showDetails(currentAsset);
+}
+
+onAssetClick(document.getElementById('indicators-grid'), focusAsset);
+onAssetClick(document.getElementById('tabs'), focusAsset);
+onAssetClick(document.getElementById('universe-tbody'), loadAsset);
+
+async function syncData() {
+    // no-cache : revalider via ETag plutôt que réutiliser un delta périmé
+    const response = await fetch(`/api/data?since=${dataVersion}`, {cache: 'no-cache'});
+    if (!response.ok) return;
+    const delta = await response.json();
+    if (delta.version === dataVersion) return;
+
+    const changed = applyDelta(delta);
+    dataVersion = delta.version;
+    document.getElementById('last-update').textContent = delta.last_update || 'N/A';
+    renderChanges(changed);
+    renderGlobal(delta.global);
+    // Nouvelle version : les tables à la demande seront relues
+    lazyData = {};
+    if (universeVisible) loadUniverse();
+    seconds = refreshInterval;
+}
+
+// Mises à jour poussées par le serveur (SSE), polling en secours
+if (window.EventSource) {
+    const stream = new EventSource('/api/stream');
+    stream.addEventListener('version', event => {
+        const message = JSON.parse(event.data);
+        if (message.version !== dataVersion) syncData();
+    });
+    stream.onerror = () => {
+        // Connexion refusée (503 : trop d'abonnés) : le navigateur n'essaiera plus
+        if (stream.readyState === EventSource.CLOSED) setInterval(syncData, refreshInterval * 1000);
+    };
+} else {
+    setInterval(syncData, refreshInterval * 1000);
+}
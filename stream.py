@@ -0,0 +1,69 @@
+"""Canal de diffusion Server-Sent Events pour /api/stream
+
+Un seul message courant, encodé une fois, partagé par tous les abonnés : une
+publication coûte O(1) quel que soit le nombre de clients, et un abonné
+inactif ne fait qu'attendre sur une Condition commune. Sous un worker gevent
+cette attente est une greenlet, pas un thread système.
+"""
+import json
+import threading
+
+class TooManySubscribers(Exception):
+    """Nombre maximal d'abonnés atteint"""
+
+class Broadcaster:
+    """Diffuse le dernier événement publié à tous les abonnés SSE
+
+    Seul le dernier message compte : un client qui en rate un récupère de
+    toute façon l'état courant via /api/data?since=<sa version>.
+    """
+
+    def __init__(self, heartbeat=15, max_subscribers=1000):
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self._seq = 0
+        self._message = None
+        self._cond = threading.Condition()
+
+    def publish(self, event, data, event_id=None):
+        """Encode le message une fois et réveille tous les abonnés"""
+        lines = [f"event: {event}", f"data: {json.dumps(data)}"]
+        if event_id is not None:
+            lines.insert(0, f"id: {event_id}")
+        message = ('\n'.join(lines) + '\n\n').encode('utf-8')
+        with self._cond:
+            self._seq += 1
+            self._message = message
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """Générateur SSE : message courant, puis chaque nouveau message
+
+        Un commentaire est envoyé toutes les `heartbeat` secondes pour garder
+        la connexion ouverte à travers les proxys.
+        """
+        if self.subscribers >= self.max_subscribers:
+            raise TooManySubscribers()
+        return self._stream()
+
+    def _stream(self):
+        # Compté au premier yield : un générateur jamais démarré n'a rien à libérer
+        with self._cond:
+            self.subscribers += 1
+        try:
+            seen = None
+            yield f"retry: {self.heartbeat * 1000}\n\n".encode('utf-8')
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq != seen, timeout=self.heartbeat)
+                    changed = self._seq != seen
+                    seen = self._seq
+                    message = self._message
+                if changed and message is not None:
+                    yield message
+                else:
+                    yield b": ping\n\n"
+        finally:
+            with self._cond:
+                self.subscribers -= 1
@@ -0,0 +1,81 @@
+"""diff_data : appliquer le delta à l'ancienne version redonne la nouvelle"""
+import copy
+
+from delta import SUMMARY_FIELDS, diff_data
+from positions import WhaleTable, asset_to_json
+
+def address(n):
+    return bytes([n]) * 20
+
+def asset(positions, **fields):
+    """Données d'un actif : (n° d'adresse, is_long, taille) triés par taille décroissante"""
+    whales = WhaleTable.from_records(
+        (address(n), is_long, size, 10, size / 100, 1.0) for n, is_long, size in positions)
+    data = {field: None for field in SUMMARY_FIELDS}
+    data.update(long_count=sum(1 for _, is_long, _ in positions if is_long), whales=whales, **fields)
+    return data
+
+def apply_delta(data, delta):
+    """Même algorithme que applyDelta (static/dashboard.js), sur des lignes JSON"""
+    data = copy.deepcopy(data)
+    for name in delta['removed']:
+        del data[name]
+    for name, change in delta['changes'].items():
+        previous = data.get(name, {'whales': []})
+        removed = set(change['whales']['removed'])
+        fresh = {whale['address']: whale for whale in change['whales']['updated'] + change['whales']['added']}
+        whales = [fresh.get(whale['address'], whale) for whale in previous['whales']
+                  if whale['address'] not in removed]
+        known = {whale['address'] for whale in whales}
+        whales += [whale for whale in change['whales']['added'] if whale['address'] not in known]
+        whales.sort(key=lambda whale: whale['rank'])
+        data[name] = {**previous, **change['fields'], 'whales': whales}
+    return data
+
+def as_json(data):
+    return {name: asset_to_json(value) for name, value in data.items()}
+
+def round_trip(old, new):
+    assert apply_delta(as_json(old), diff_data(old, new)) == as_json(new)
+
+def test_unchanged_assets_produce_no_change():
+    btc = asset([(1, True, 500.0), (2, False, 400.0)], sentiment='Haussier')
+    delta = diff_data({'BTC': btc}, {'BTC': btc})
+    assert delta == {'changes': {}, 'removed': []}
+    rebuilt = asset([(1, True, 500.0), (2, False, 400.0)], sentiment='Haussier')
+    assert diff_data({'BTC': btc}, {'BTC': rebuilt}) == {'changes': {}, 'removed': []}
+
+def test_round_trip_with_reordered_added_and_removed_whales():
+    old = {
+        'BTC': asset([(1, True, 500.0), (2, False, 400.0), (3, True, 300.0)], sentiment='Haussier'),
+        'ETH': asset([(4, False, 200.0)], sentiment='Baissier'),
+    }
+    new = {
+        # 3 passe devant, 2 sort, 5 entre, 1 change de côté
+        'BTC': asset([(3, True, 700.0), (1, False, 500.0), (5, True, 100.0)], sentiment='Neutre'),
+        'ETH': old['ETH'],
+    }
+    delta = diff_data(old, new)
+    assert list(delta['changes']) == ['BTC']
+    assert delta['changes']['BTC']['fields'] == {'sentiment': 'Neutre'}
+    round_trip(old, new)
+
+def test_round_trip_with_new_and_removed_assets():
+    old = {'BTC': asset([(1, True, 500.0)]), 'SOL': asset([(2, False, 50.0)])}
+    new = {'BTC': asset([(1, True, 500.0)]), 'HYPE': asset([(3, True, 80.0), (4, False, 60.0)])}
+    delta = diff_data(old, new)
+    assert delta['removed'] == ['SOL']
+    assert list(delta['changes']) == ['HYPE']
+    round_trip(old, new)
+
+def test_round_trip_chain_matches_single_delta():
+    versions = [
+        {'BTC': asset([(1, True, 500.0), (2, False, 400.0)])},
+        {'BTC': asset([(2, False, 450.0), (1, True, 420.0)])},
+        {'BTC': asset([(2, True, 450.0)]), 'ETH': asset([(9, False, 10.0)])},
+    ]
+    data = as_json(versions[0])
+    for old, new in zip(versions, versions[1:]):
+        data = apply_delta(data, diff_data(old, new))
+    assert data == as_json(versions[-1])
+    round_trip(versions[0], versions[-1])
@@ -0,0 +1,94 @@
+"""Budget amont : ordre de service par priorité, relèvement en cours de route, AIMD"""
+import threading
+import time
+
+from governor import BACKGROUND, HOT, INTERACTIVE, Priority, RequestGovernor
+from refresh import RefreshCoordinator
+
+def serve_order(governor, waiters, promote=None):
+    """Lance un thread par (nom, priorité) sur un budget vide ; ordre des jetons obtenus"""
+    governor.bucket.drain()
+    order = []
+    threads = []
+    for name, priority in waiters:
+        thread = threading.Thread(target=lambda n=name, p=priority: governor.acquire(1, p) and order.append(n))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.02)  # ordre d'arrivée déterministe
+    if promote is not None:
+        promote()
+    for thread in threads:
+        thread.join(5)
+    return order
+
+def test_higher_priority_is_served_first():
+    governor = RequestGovernor(600, burst=1)  # un jeton toutes les 0,1 s
+    order = serve_order(governor, [('background', BACKGROUND), ('hot', HOT), ('interactive', INTERACTIVE)])
+    assert order == ['interactive', 'hot', 'background']
+
+def test_same_priority_is_first_come_first_served():
+    governor = RequestGovernor(600, burst=1)
+    order = serve_order(governor, [('first', HOT), ('second', HOT), ('third', HOT)])
+    assert order == ['first', 'second', 'third']
+
+def test_raise_priority_reorders_queued_requests():
+    governor = RequestGovernor(600, burst=1)
+    job = Priority(BACKGROUND)
+    order = serve_order(governor, [('job', job), ('hot', HOT)],
+                        promote=lambda: governor.raise_priority(job, INTERACTIVE))
+    assert order == ['job', 'hot']
+    assert job.level == INTERACTIVE
+    # Jamais abaissée
+    governor.raise_priority(job, BACKGROUND)
+    assert job.level == INTERACTIVE
+
+def test_deadline_gives_up_and_leaves_the_queue():
+    governor = RequestGovernor(60, burst=1)
+    governor.bucket.drain()
+    assert not governor.acquire(1, deadline=time.monotonic() + 0.05)
+    assert governor.timeouts_total == 1
+    assert sum(governor.stats()['queued'].values()) == 0
+
+def test_throttled_halves_rate_once_per_cooldown():
+    governor = RequestGovernor(1200, min_fraction=0.1, cooldown=60)
+    governor.throttled()
+    governor.throttled()  # réponse d'une requête déjà en vol : pas de seconde division
+    assert governor.stats()['rate_per_min'] == 600
+    assert governor.throttled_total == 2
+    assert governor.bucket.tokens < 1
+
+def test_throttled_never_goes_below_min_rate():
+    governor = RequestGovernor(1200, min_fraction=0.1, cooldown=0)
+    for _ in range(10):
+        governor.throttled()
+    assert governor.stats()['rate_per_min'] == 120
+
+def test_succeeded_recovers_additively_up_to_limit():
+    governor = RequestGovernor(1000, recovery=0.01, cooldown=0)
+    governor.throttled()
+    assert governor.stats()['rate_per_min'] == 500
+    for _ in range(10):
+        governor.succeeded()
+    assert governor.stats()['rate_per_min'] == 600
+    for _ in range(100):
+        governor.succeeded()
+    assert governor.stats()['rate_per_min'] == 1000
+
+def test_interactive_trigger_raises_joined_background_job():
+    governor = RequestGovernor(1200)
+    release = threading.Event()
+    seen = []
+
+    def refresh(source, priority):
+        release.wait(5)
+        seen.append(priority.level)
+
+    coordinator = RefreshCoordinator(refresh, governor=governor)
+    job, created = coordinator.trigger('scheduler')
+    assert created and job.priority.level == BACKGROUND
+    joined, created = coordinator.trigger('api')
+    assert joined is job and not created
+    release.set()
+    job.done.wait(5)
+    assert seen == [INTERACTIVE]
+    assert job.to_dict()['priority'] == 'interactive'
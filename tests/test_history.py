@@ -0,0 +1,88 @@
+"""Rollups : toute résolution, lue directement ou réagrégée, égale le calcul brut"""
+import pytest
+
+from history import HistoryStore
+from positions import WhaleTable
+
+DAY = 1_700_006_400  # minuit UTC : aligné sur toutes les résolutions
+STEP = 100  # un snapshot toutes les 100 s, donc plusieurs par bucket de 5 min
+
+def snapshot(i):
+    """Données d'un actif au i-ème snapshot : ratio, levier et PnL qui varient"""
+    ratio = 50 + (i * 37 % 41) - 20
+    leverage = [5 + i % 7, 10 + i % 3]
+    pnl = [1000.0 * ((i % 5) - 2), 250.0 * (i % 4)]
+    return {
+        'long_count': 1, 'short_count': 1, 'long_ratio': ratio, 'short_ratio': 100 - ratio,
+        'total_long_size': 1000.0 + i, 'total_short_size': 500.0 + 2 * i, 'sentiment_class': 'neutral',
+        'whales': WhaleTable.from_records([
+            (bytes([1]) * 20, True, 1000.0 + i, leverage[0], pnl[0], 1.0),
+            (bytes([2]) * 20, False, 500.0 + 2 * i, leverage[1], pnl[1], 1.0),
+        ]),
+    }
+
+def expected(samples, resolution):
+    """Buckets calculés directement depuis les snapshots bruts"""
+    buckets = {}
+    for ts, data in samples:
+        buckets.setdefault(ts - ts % resolution, []).append(data)
+    columns = {key: [] for key in ('t', 'long_ratio_open', 'long_ratio_high', 'long_ratio_low', 'long_ratio_close',
+                                   'mean_leverage', 'mean_pnl', 'mean_long_size', 'mean_short_size', 'samples')}
+    for t, rows in sorted(buckets.items()):
+        ratios = [row['long_ratio'] for row in rows]
+        columns['t'].append(t)
+        columns['long_ratio_open'].append(ratios[0])
+        columns['long_ratio_high'].append(max(ratios))
+        columns['long_ratio_low'].append(min(ratios))
+        columns['long_ratio_close'].append(ratios[-1])
+        columns['mean_leverage'].append(sum(float(row['whales'].leverage.mean()) for row in rows) / len(rows))
+        columns['mean_pnl'].append(sum(float(row['whales'].pnl.sum()) for row in rows) / len(rows))
+        columns['mean_long_size'].append(sum(row['total_long_size'] for row in rows) / len(rows))
+        columns['mean_short_size'].append(sum(row['total_short_size'] for row in rows) / len(rows))
+        columns['samples'].append(len(rows))
+    return columns
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    """Trois heures de snapshots, écrits dans le désordre en plusieurs lots"""
+    samples = [(DAY + i * STEP, snapshot(i)) for i in range(3 * 36)]
+    history = HistoryStore(str(tmp_path_factory.mktemp('history') / 'history.db'), maintenance_interval=3600)
+    # Lots inversés : open/close doivent suivre les timestamps, pas l'ordre d'écriture
+    for ts, data in reversed(samples):
+        history.record(ts, 1, {'BTC': data})
+    history.flush()
+    yield history, samples
+    history.close()
+
+def assert_columns(actual, wanted):
+    assert actual.keys() == wanted.keys()
+    for key in wanted:
+        assert actual[key] == pytest.approx(wanted[key]), key
+
+@pytest.mark.parametrize('resolution', [60, 300, 3600])
+def test_maintained_resolutions_match_raw_samples(store, resolution):
+    history, samples = store
+    assert_columns(history.rollup_range('BTC', resolution, DAY, DAY + 86400), expected(samples, resolution))
+
+@pytest.mark.parametrize('resolution', [120, 900, 1800, 7200, 14400])
+def test_merged_resolutions_match_raw_samples(store, resolution):
+    """15m depuis 5m, 2h et 4h depuis 1h, etc. : fusion des buckets de base"""
+    history, samples = store
+    assert_columns(history.rollup_range('BTC', resolution, DAY, DAY + 86400), expected(samples, resolution))
+
+def test_every_resolution_counts_every_sample(store):
+    history, samples = store
+    for resolution in (60, 300, 900, 3600, 14400, 86400):
+        assert sum(history.rollup_range('BTC', resolution, DAY, DAY + 86400)['samples']) == len(samples)
+
+def test_range_starts_on_a_bucket_boundary(store):
+    history, samples = store
+    start = DAY + 1000  # au milieu du 2e bucket de 15 min
+    result = history.rollup_range('BTC', 900, start, DAY + 86400)
+    assert result['t'][0] == DAY + 900
+    assert result['samples'][0] == len([ts for ts, _ in samples if DAY + 900 <= ts < DAY + 1800])
+
+def test_resolution_must_be_a_multiple_of_a_minute(store):
+    history, _ = store
+    with pytest.raises(ValueError):
+        history.rollup_range('BTC', 90, DAY, DAY + 3600)
@@ -0,0 +1,62 @@
+"""Disjoncteur : appel de test unique en semi-ouvert, libéré sans verdict"""
+import threading
+import time
+
+import pytest
+
+from hyperliquid import CircuitBreaker, HyperliquidClient, HyperliquidError
+
+def open_breaker(reset_timeout=0):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+def test_open_breaker_refuses_until_reset_timeout():
+    breaker = open_breaker(reset_timeout=60)
+    assert not breaker.allow()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_allows_a_single_probe():
+    breaker = open_breaker()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+def test_probe_verdict_closes_or_reopens():
+    breaker = open_breaker()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+    breaker = open_breaker(reset_timeout=0.05)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_released_probe_lets_another_caller_test():
+    breaker = open_breaker()
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+def test_only_the_probe_owner_releases_it():
+    breaker = open_breaker()
+    assert breaker.allow()
+    other = threading.Thread(target=breaker.release_probe)
+    other.start()
+    other.join()
+    assert not breaker.allow()
+
+def test_client_releases_probe_when_deadline_passes():
+    """Échéance dépassée avant tout essai : ni succès ni échec, le circuit reste testable"""
+    breaker = open_breaker()
+    client = HyperliquidClient(url='http://127.0.0.1:9/info', breaker=breaker)
+    with pytest.raises(HyperliquidError):
+        client.info({'type': 'meta'}, deadline=time.monotonic() - 1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
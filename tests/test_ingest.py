@@ -0,0 +1,83 @@
+"""Balayage complet (fetch_all_assets) contre le stub Hyperliquid local"""
+import copy
+import importlib
+import os
+import sys
+import threading
+
+import pytest
+
+import hl_stub
+
+TOP_WHALES = 5
+
+def expected_positions(fixtures):
+    """{actif: [(notionnel, is_long)]} calculés directement depuis les fixtures"""
+    meta, contexts = fixtures['metaAndAssetCtxs']
+    prices = {asset['name']: float(context['markPx']) for asset, context in zip(meta['universe'], contexts)}
+    addresses = {row['ethAddress'].lower() for row in fixtures['leaderboard']['leaderboardRows']}
+    positions = {}
+    for address, state in fixtures['clearinghouseState'].items():
+        if address.lower() not in addresses:
+            continue
+        for item in state['assetPositions']:
+            size = float(item['position']['szi'])
+            if size:
+                coin = item['position']['coin']
+                positions.setdefault(coin, []).append((abs(size) * prices[coin], size > 0))
+    return positions
+
+@pytest.fixture(scope='module')
+def sweep(tmp_path_factory):
+    """Un balayage, avec un wallet dont l'état est illisible"""
+    fixtures = copy.deepcopy(hl_stub.load_fixtures())
+    broken = fixtures['leaderboard']['leaderboardRows'][0]['ethAddress']
+    expected = expected_positions({**fixtures, 'clearinghouseState': {
+        address: state for address, state in fixtures['clearinghouseState'].items() if address != broken}})
+    del fixtures['clearinghouseState'][broken]['assetPositions'][0]['position']['coin']
+
+    server = hl_stub.make_server(fixtures=fixtures)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    workdir = tmp_path_factory.mktemp('ingest')
+    environ = dict(os.environ)
+    os.environ.pop('SHARED_STORE', None)
+    os.environ.update(
+        HYPERLIQUID_URL=f'http://127.0.0.1:{server.server_port}/info',
+        CANDIDATE_WALLETS=str(len(fixtures['leaderboard']['leaderboardRows'])),
+        TOP_WHALES=str(TOP_WHALES),
+        HISTORY_DB=str(workdir / 'history.db'),
+        SNAPSHOT_PATH=str(workdir / 'snapshot.pkl'),
+    )
+    try:
+        sys.modules.pop('app', None)
+        app = importlib.import_module('app')
+        results, universe = app.fetch_all_assets(app.ASSETS)
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        server.shutdown()
+    return app, results, universe, expected
+
+def test_top_k_per_asset(sweep):
+    app, results, _, expected = sweep
+    assert set(results) == set(app.ASSETS)
+    for asset, data in results.items():
+        sizes = sorted((size for size, _ in expected.get(asset, [])), reverse=True)[:TOP_WHALES]
+        assert data['whales'].size.tolist() == pytest.approx(sizes)
+
+def test_scanned_counters_cover_every_position(sweep):
+    _, results, _, expected = sweep
+    for asset, data in results.items():
+        positions = expected.get(asset, [])
+        scanned = data['scanned']
+        assert scanned['long_count'] == sum(1 for _, is_long in positions if is_long)
+        assert scanned['short_count'] == sum(1 for _, is_long in positions if not is_long)
+        assert scanned['long_size'] == pytest.approx(sum(size for size, is_long in positions if is_long))
+        assert scanned['short_size'] == pytest.approx(sum(size for size, is_long in positions if not is_long))
+
+def test_universe_summarizes_unpinned_assets(sweep):
+    app, _, universe, expected = sweep
+    assert set(universe.summaries) == set(expected)
+    for asset, summary in universe.summaries.items():
+        assert summary['pinned'] == (asset in app.ASSETS)
+        assert summary['scanned_positions'] == len(expected[asset])
@@ -0,0 +1,78 @@
+"""Paliers de sentiment : bornes incluses ou exclues, arrondi du ratio global"""
+import numpy as np
+import pytest
+
+from positions import WhaleTable
+from sentiment import (ASSET_LEVELS, GLOBAL_DECIMALS, GLOBAL_LEVELS, GLOBAL_STRICT_FROM, SentimentEngine,
+                       SentimentScale)
+
+ASSET_SCALE = SentimentScale(ASSET_LEVELS)
+GLOBAL_SCALE = SentimentScale(GLOBAL_LEVELS, strict_from=GLOBAL_STRICT_FROM, decimals=GLOBAL_DECIMALS)
+
+def reference_global(ratio):
+    """Ancien calcul du front-end : ratio affiché à 0,1 près, > à partir de NEUTRE"""
+    shown = float(f'{ratio:.1f}')
+    if shown >= 65:
+        return 'BULLISH'
+    if shown >= 55:
+        return 'HAUSSIER'
+    if shown > 45:
+        return 'NEUTRE'
+    if shown > 35:
+        return 'BAISSIER'
+    return 'BEARISH'
+
+@pytest.mark.parametrize('ratio, label', [
+    (100, 'TRÈS BULLISH'), (75, 'TRÈS BULLISH'), (74.999, 'BULLISH'),
+    (60, 'BULLISH'), (59.999, 'NEUTRE'),
+    (45, 'NEUTRE'), (44.999, 'BEARISH'),
+    (30, 'BEARISH'), (29.999, 'TRÈS BEARISH'), (0, 'TRÈS BEARISH'),
+])
+def test_asset_ladder_includes_each_threshold(ratio, label):
+    assert ASSET_SCALE.level(ratio)[0] == label
+
+@pytest.mark.parametrize('ratio, label', [
+    (65, 'BULLISH'), (64.96, 'BULLISH'), (64.94, 'HAUSSIER'),
+    (55, 'HAUSSIER'), (54.94, 'NEUTRE'),
+    (45.06, 'NEUTRE'), (45, 'BAISSIER'), (45.04, 'BAISSIER'),
+    (35.06, 'BAISSIER'), (35, 'BEARISH'), (35.04, 'BEARISH'), (0, 'BEARISH'),
+])
+def test_global_ladder_rounds_then_excludes_lower_thresholds(ratio, label):
+    assert GLOBAL_SCALE.level(ratio)[0] == label
+
+def test_global_ladder_matches_former_front_end():
+    ratios = np.round(np.linspace(0, 100, 100001), 3)
+    labels = [GLOBAL_LEVELS[i][1] for i in GLOBAL_SCALE.classify(ratios)]
+    assert labels == [reference_global(ratio) for ratio in ratios.tolist()]
+
+def test_vectorized_classify_matches_level():
+    ratios = np.array([0, 29.999, 30, 44.999, 45, 59.999, 60, 74.999, 75, 100])
+    assert [ASSET_LEVELS[i][1] for i in ASSET_SCALE.classify(ratios)] == \
+        [ASSET_SCALE.level(ratio)[0] for ratio in ratios]
+
+def test_custom_thresholds_keep_strictness_and_rounding():
+    scale = GLOBAL_SCALE.with_thresholds('70,60,50,40')
+    assert scale.level(70)[0] == 'BULLISH'
+    assert scale.level(50)[0] == 'BAISSIER'
+    assert scale.level(50.06)[0] == 'NEUTRE'
+    assert scale.level(40)[0] == 'BEARISH'
+    with pytest.raises(ValueError):
+        GLOBAL_SCALE.with_thresholds('70,60')
+    with pytest.raises(ValueError):
+        SentimentScale([(50, 'A', 'a', ''), (60, 'B', 'b', ''), (None, 'C', 'c', '')])
+
+def table(longs, shorts):
+    records = [(bytes([i]) * 20, i < longs, 1000.0, 10, 0.0, 1.0) for i in range(longs + shorts)]
+    return WhaleTable.from_records(records)
+
+@pytest.mark.parametrize('longs, shorts, asset_label, global_label', [
+    (9, 11, 'NEUTRE', 'BAISSIER'),     # 45 % pile : inclus par actif, exclu au global
+    (11, 9, 'NEUTRE', 'HAUSSIER'),     # 55 %
+    (3, 1, 'TRÈS BULLISH', 'BULLISH'),  # 75 %
+    (0, 0, 'NEUTRE', 'NEUTRE'),        # aucune position : 50 % par défaut
+])
+def test_summarize_applies_each_scale(longs, shorts, asset_label, global_label):
+    engine = SentimentEngine(ASSET_SCALE, GLOBAL_SCALE)
+    summary = engine.summarize({'BTC': table(longs, shorts)})
+    assert summary['assets']['BTC']['sentiment'] == asset_label
+    assert summary['global']['sentiment'] == global_label
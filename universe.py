@@ -0,0 +1,83 @@
+"""Univers d'actifs découvert depuis metaAndAssetCtxs, en deux niveaux
+
+Le balayage des wallets voit les positions de tous les perps listés, pas
+seulement des actifs épinglés. Chaque cycle en tire :
+
+    résumé      une ligne par actif ayant des positions (prix, ratios,
+                sentiment, notionnels) : toujours calculé, quelques
+                centaines d'octets par actif
+    top N       la WhaleTable de l'actif, gardée telle quelle ; les données
+                complètes (lignes JSON, agrégats) ne sont construites qu'à la
+                demande, puis gardées dans un cache LRU
+
+Les actifs épinglés (ASSETS) ont en plus leurs données complètes dans le
+snapshot à chaque cycle : cartes du tableau de bord, deltas, historique,
+rafraîchissements chauds.
+"""
+import threading
+from collections import OrderedDict
+
+def universe_assets(prices, restrict=None, pinned=()):
+    """Actifs suivis : tous ceux de metaAndAssetCtxs (ou `restrict`), épinglés d'abord"""
+    pinned = list(pinned)
+    known = set(pinned)
+    return pinned + [asset for asset in prices if asset not in known and (restrict is None or asset in restrict)]
+
+class AssetUniverse:
+    """Résumés et tables top N d'un balayage ; immuable une fois construit"""
+
+    __slots__ = ('sweep', 'summaries', 'tables')
+
+    def __init__(self, sweep=0, summaries=None, tables=None):
+        self.sweep = sweep  # identifiant du balayage (clé du cache LRU)
+        self.summaries = summaries or {}  # actif -> résumé, plus gros notionnel d'abord
+        self.tables = tables or {}  # actif -> (WhaleTable, compteurs scanned)
+
+    @classmethod
+    def build(cls, sweep, tops, engine, prices, max_leverage, pinned):
+        """Depuis {actif: (WhaleTable, scanned)} : résumés en un seul passage vectorisé"""
+        tables = {asset: entry for asset, entry in tops.items() if len(entry[0])}
+        rows = engine.summarize({asset: table for asset, (table, _) in tables.items()})['assets']
+        summaries = {}
+        for asset, row in rows.items():
+            scanned = tables[asset][1]
+            summaries[asset] = {
+                'asset': asset,
+                'pinned': asset in pinned,
+                'mark_price': prices.get(asset),
+                'max_leverage': max_leverage.get(asset),
+                'scanned_positions': scanned['long_count'] + scanned['short_count'],
+                'scanned_size': scanned['long_size'] + scanned['short_size'],
+                **row,
+            }
+        order = sorted(summaries, key=lambda asset: summaries[asset]['scanned_size'], reverse=True)
+        return cls(sweep, {asset: summaries[asset] for asset in order}, tables)
+
+class LRUCache:
+    """Cache borné : l'entrée la moins récemment lue sort la première"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        # Construit hors du verrou : deux lecteurs simultanés calculent au pire en double
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
@@ -0,0 +1,159 @@
+"""Index des wallets suivis, tous actifs et cycles confondus
+
+Chaque adresse (20 octets) pointe vers un WalletState : positions courantes
+par actif, historique récent et dates de première/dernière apparition. La
+mise à jour ne parcourt que les actifs du cycle et compare chaque classement
+au précédent, ce qui produit aussi le flux d'événements :
+
+    entered_top   une adresse entre dans le top N d'un actif
+    flipped       une adresse du classement passe de LONG à SHORT (ou l'inverse)
+
+Les identifiants d'événements croissent sans jamais resservir : un worker
+avance son compteur sur les événements reçus du fetcher, pour continuer la
+série s'il est élu à son tour (voir reseed).
+"""
+import threading
+from collections import deque
+
+from positions import format_address
+
+class WalletState:
+    """Ce que l'on sait d'une adresse"""
+
+    __slots__ = ('address', 'first_seen', 'last_seen', 'positions', 'history')
+
+    def __init__(self, address, first_seen, history_size):
+        self.address = address
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.positions = {}  # actif -> position courante
+        self.history = deque(maxlen=history_size)  # (ts, actif, rang, side, taille)
+
+    def to_dict(self):
+        return {
+            'address': '0x' + self.address.hex(),
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'positions': dict(self.positions),
+            'recent': [
+                {'ts': ts, 'asset': asset, 'rank': rank, 'side': side, 'size': size}
+                for ts, asset, rank, side, size in self.history
+            ],
+        }
+
+class WalletIndex:
+    """Dictionnaire adresse -> WalletState, mis à jour par cycle"""
+
+    def __init__(self, top_n=10, history_size=100, max_events=1000):
+        self.top_n = top_n
+        self.history_size = history_size
+        self.events = deque(maxlen=max_events)
+        self._wallets = {}
+        self._ranking = {}  # actif -> {adresse: (rang, is_long)} du cycle précédent
+        self._last_event_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._wallets)
+
+    def get(self, address):
+        """État d'une adresse (20 octets) en O(1), copié pour la sérialisation"""
+        with self._lock:
+            wallet = self._wallets.get(address)
+            return wallet.to_dict() if wallet is not None else None
+
+    def events_since(self, event_id=0):
+        with self._lock:
+            return [event for event in self.events if event['id'] > event_id]
+
+    def update(self, ts, assets, emit=True):
+        """Intègre les classements d'un cycle ; renvoie (wallets touchés, événements)
+
+        `emit=False` : positions seulement, les événements viennent d'ailleurs
+        (worker qui reçoit ceux du fetcher, voir replace_events).
+        """
+        touched = []
+        new_events = []
+        with self._lock:
+            for asset, data in assets.items():
+                table = data['whales']
+                previous = self._ranking.get(asset)
+                ranking = {}
+                sides = table.is_long.tolist()
+                sizes = table.size.tolist()
+                leverages = table.leverage.tolist()
+                pnls = table.pnl.tolist()
+                entries = table.entry_price.tolist()
+
+                for i in range(len(table)):
+                    address = table.address(i)
+                    rank = i + 1
+                    is_long = sides[i]
+                    side = 'LONG' if is_long else 'SHORT'
+                    ranking[address] = (rank, is_long)
+
+                    wallet = self._wallets.get(address)
+                    if wallet is None:
+                        wallet = self._wallets[address] = WalletState(address, ts, self.history_size)
+                    wallet.last_seen = ts
+                    wallet.positions[asset] = {
+                        'rank': rank, 'side': side, 'size': sizes[i],
+                        'leverage': leverages[i], 'pnl': pnls[i], 'entry_price': entries[i],
+                    }
+                    wallet.history.append((ts, asset, rank, side, sizes[i]))
+                    touched.append(wallet)
+
+                    # Premier cycle pour cet actif : pas d'événements, tout serait "nouveau"
+                    if previous is None or not emit:
+                        continue
+                    before = previous.get(address)
+                    if rank <= self.top_n and (before is None or before[0] > self.top_n):
+                        new_events.append(self._event('entered_top', ts, asset, address, rank, side))
+                    if before is not None and before[1] != is_long:
+                        new_events.append(self._event('flipped', ts, asset, address, rank, side))
+
+                # Sortis du classement : plus de position suivie sur cet actif
+                for address in (previous or {}).keys() - ranking.keys():
+                    self._wallets[address].positions.pop(asset, None)
+                self._ranking[asset] = ranking
+
+            self.events.extend(new_events)
+        return touched, new_events
+
+    def _event(self, kind, ts, asset, address, rank, side):
+        self._last_event_id += 1
+        return {
+            'id': self._last_event_id,
+            'type': kind,
+            'ts': ts,
+            'asset': asset,
+            'address': '0x' + address.hex(),
+            'short_address': format_address(address),
+            'rank': rank,
+            'side': side,
+        }
+
+    def replace_events(self, events):
+        """Remplace le flux d'événements par celui publié par le fetcher"""
+        with self._lock:
+            self.events.clear()
+            self.events.extend(events)
+            self._reseed(max((event['id'] for event in events), default=0))
+
+    def reseed(self, last_id):
+        """Les prochains événements seront numérotés après `last_id` (élection)"""
+        with self._lock:
+            self._reseed(last_id)
+
+    def _reseed(self, last_id):
+        self._last_event_id = max(self._last_event_id, last_id or 0)
+
+    def restore(self, wallets, events):
+        """Recharge les dates connues et les derniers événements (démarrage)"""
+        with self._lock:
+            for address, first_seen, last_seen in wallets:
+                wallet = WalletState(address, first_seen, self.history_size)
+                wallet.last_seen = last_seen
+                self._wallets[address] = wallet
+            self.events.extend(events)
+            self._reseed(max((event['id'] for event in events), default=0))